@@ -0,0 +1,297 @@
+#!/usr/bin/python3
+"""Benchmark the Graphical Datasheet pipeline of tagscript.py.
+
+Syntax: `python benchmark.py [--sizes N [N ...]] [--json <filename>]`
+Every CSV file under Datasheets/ and a set of generated stress CSV files
+(1k, 10k and 100k rows by default, with Right, Left, Top and Text
+sections across 13 columns) are run through the same stages as
+tagscript.py:
+    layout: read_csv() + layout_csv_data()
+    embed_style: embed_style() (with a fixed, local font payload so no
+        network access is made)
+    render: render_layout()
+    write_svg: write_svg() (to a temporary directory)
+
+For each CSV the wall time of each stage, the peak memory (measured in a
+second, traced run), the memory held by the Layout (the intermediate
+data model kept between the layout and render stages) and its number of
+distinct texts, the number of SVG elements and the output bytes (and,
+with '--style-mode class', the bytes of the same SVG with inline
+styling) are reported as JSON (on
+stdout or to the '--json' file) so that results can be compared across
+versions.  A human readable table is printed on stderr.  Note that the
+100k row case takes several minutes (and a few GB of memory in the
+traced run) with the default svgwrite backend.
+    e.g., `python benchmark.py --json bench.json`
+    e.g., `python benchmark.py --sizes 1000 10000 --backend stream`
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import tagscript
+from tagscript import GDConfig, Layout, StylePayload
+
+STAGES = ('layout', 'embed_style', 'render', 'write_svg')
+
+# Size of the stand-in font embedded instead of a downloaded Google font.
+FONT_STUB_SIZE = 64 * 1024
+
+
+def generate_stress_csv(filename, rows, columns=13):
+    """Write a synthetic pin table with mixed sections.
+
+    Args:
+        filename: (str) CSV filename to write.
+        rows: (int) Number of pin rows.
+        columns: (int Default=13) Number of columns.
+    """
+    sections = ('Right', 'Left', 'Top', 'Right', 'Left', 'Text')
+    section_rows = max(rows // 20, 1)
+    with open(filename, 'w', newline='') as csv_file:
+        csv_file.write(','.join(['Name'] + ['Col{}'.format(i)
+                                            for i in range(1, columns)]))
+        csv_file.write('\n')
+        for row in range(rows):
+            if row % section_rows == 0:
+                section = sections[(row // section_rows) % len(sections)]
+                csv_file.write(section + ',' * (columns - 1) + '\n')
+            if section == 'Text':
+                fields = ['Pin {} note'.format(row)] + [''] * (columns - 1)
+            else:
+                # Leave some cells empty so that the tag packing varies.
+                fields = ['P{}'.format(row)] + [
+                    '' if (row + i) % 4 == 0 else 'F{}_{}'.format(i, row % 97)
+                    for i in range(1, columns)]
+            csv_file.write(','.join(fields) + '\n')
+        csv_file.write('EOF' + ',' * (columns - 1) + '\n')
+
+
+def element_count(layout, cfg=GDConfig()):
+    """Returns the number of SVG elements rendered for a Layout."""
+    tags = sum(1 for kind in layout.kinds if kind == Layout.TAG)
+    count = len(layout) + tags
+    if cfg.tag_symbols:
+        count += len({column for kind, column in zip(layout.kinds,
+                                                     layout.columns)
+                      if kind == Layout.TAG})
+    return count
+
+
+def layout_memory(csv_filename, cfg):
+    """Returns the bytes held by the Layout of a CSV file (traced)."""
+    tracemalloc.start()
+    try:
+        layout = tagscript.layout_csv_data(
+            tagscript.read_csv(csv_filename)[1], cfg)
+        # Measured while 'layout' is still referenced.
+        held = tracemalloc.get_traced_memory()[0]
+        del layout
+        return held
+    finally:
+        tracemalloc.stop()
+
+
+def run_pipeline(csv_filename, out_dir, cfg, payload):
+    """Run every stage once for a CSV file.
+
+    Returns:
+        A (stage seconds dict, Layout, SVG filename) tuple.
+    """
+    times = {}
+    start = time.perf_counter()
+    filename_root, records = tagscript.read_csv(csv_filename)
+    layout = tagscript.layout_csv_data(records, cfg)
+    times['layout'] = time.perf_counter() - start
+
+    svg_root = os.path.join(out_dir, os.path.basename(filename_root))
+    dwg = tagscript.new_drawing(svg_root + '.svg', cfg)
+    start = time.perf_counter()
+    tagscript.embed_style(dwg, filename_root, cfg, payload)
+    times['embed_style'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tagscript.render_layout(dwg, layout, cfg)
+    times['render'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    svg_filename = tagscript.write_svg(dwg, svg_root, cfg)
+    times['write_svg'] = time.perf_counter() - start
+    return times, layout, svg_filename
+
+
+def benchmark_csv(name, source, csv_filename, out_dir, cfg, payload,
+                  repeat=1, memory=True):
+    """Benchmark one CSV file.
+
+    Args:
+        name: (str) Name of the benchmark case.
+        source: (str) 'corpus' or 'synthetic'.
+        csv_filename: (str) CSV filename.
+        out_dir: (str) Directory for the SVG files.
+        cfg: (GDConfig) Graphical Datasheet configuration to use.
+        payload: (StylePayload) Fonts and stylesheets to embed.
+        repeat: (int Default=1) Number of timed runs (the fastest run of
+            each stage is reported).
+        memory: (bool Default=True) Measure the peak memory and the
+            Layout memory in extra traced runs.
+
+    Returns:
+        A dict of results.
+    """
+    best = {}
+    for _ in range(repeat):
+        times, layout, svg_filename = run_pipeline(csv_filename, out_dir,
+                                                   cfg, payload)
+        for stage in STAGES:
+            best[stage] = min(best.get(stage, times[stage]), times[stage])
+
+    peak_memory = None
+    layout_bytes = None
+    if memory:
+        layout_bytes = layout_memory(csv_filename, cfg)
+        tracemalloc.start()
+        try:
+            run_pipeline(csv_filename, out_dir, cfg, payload)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    result = {
+        'name': name,
+        'source': source,
+        'rows': sum(1 for _ in tagscript.read_csv(csv_filename)[1]),
+        'columns': layout.column_count,
+        'stages': best,
+        'total': sum(best.values()),
+        'peak_memory': peak_memory,
+        'layout_memory': layout_bytes,
+        'distinct_texts': len(layout.strings),
+        'elements': element_count(layout, cfg),
+        'output_bytes': os.path.getsize(svg_filename),
+    }
+    if cfg.style_mode == 'class':
+        # Size of the same SVG with inline styling, for comparison.
+        result['inline_bytes'] = tagscript.svg_size(
+            layout, os.path.splitext(csv_filename)[0], cfg, payload,
+            style_mode='inline')
+    return result
+
+
+def corpus_csv_files(directory='Datasheets'):
+    """Returns (name, CSV filename) tuples for the bundled datasheets."""
+    return [(os.path.relpath(csv_filename, directory), csv_filename)
+            for csv_filename in tagscript.find_csv_files(directory)]
+
+
+TABLE_HEADER = ('{:<44s}{:>8s}' + '{:>12s}' * len(STAGES)
+                + '{:>11s}{:>11s}{:>10s}{:>11s}')
+TABLE_ROW = ('{:<44s}{:>8d}' + '{:>11.4f}s' * len(STAGES)
+             + '{:>10.1f}M{:>10.1f}M{:>10d}{:>11d}')
+
+
+def print_table_header(stream=sys.stderr):
+    """Print the header of the human readable summary."""
+    print(TABLE_HEADER.format('name', 'rows', *STAGES, 'peak mem',
+                              'layout mem', 'elements',
+                              'bytes'),
+          file=stream)
+
+
+def print_table_row(result, stream=sys.stderr):
+    """Print the results of one CSV file in the human readable summary."""
+    print(TABLE_ROW.format(result['name'][-44:], result['rows'],
+                           *[result['stages'][stage] for stage in STAGES],
+                           (result['peak_memory'] or 0) / 2 ** 20,
+                           (result['layout_memory'] or 0) / 2 ** 20,
+                           result['elements'], result['output_bytes']),
+          file=stream)
+
+
+def parse_args(args=None):
+    """Parse the command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark the Graphical Datasheet pipeline.')
+    parser.add_argument('--sizes', type=int, nargs='*',
+                        default=[1000, 10000, 100000],
+                        help='rows of the generated stress CSV files')
+    parser.add_argument('--columns', type=int, default=13,
+                        help='columns of the generated stress CSV files')
+    parser.add_argument('--no-corpus', action='store_true',
+                        help='skip the CSV files under Datasheets/')
+    parser.add_argument('--backend', choices=('svgwrite', 'stream'),
+                        default='svgwrite', help='SVG output backend')
+    parser.add_argument('--style-mode', choices=('inline', 'class'),
+                        default='inline', help='tag styling mode')
+    parser.add_argument('--tag-symbols', action='store_true',
+                        help='use <symbol>/<use> tag backgrounds')
+    parser.add_argument('--vectorized', action='store_true',
+                        help='compute the tag positions with NumPy')
+    parser.add_argument('--pretty', action='store_true',
+                        help='save indented SVG files (svgwrite backend)')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='timed runs per CSV (the fastest is reported)')
+    parser.add_argument('--no-memory', action='store_true',
+                        help='skip the traced run measuring peak memory')
+    parser.add_argument('--json', metavar='FILENAME',
+                        help='write the JSON results to FILENAME instead of '
+                             'stdout')
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    """Run the benchmarks and report the results."""
+    options = parse_args(args)
+    cfg = GDConfig(backend=options.backend, style_mode=options.style_mode,
+                   tag_symbols=options.tag_symbols, pretty=options.pretty,
+                   vectorized_layout=options.vectorized, overwrite=True,
+                   font_cache=None)
+    payload = StylePayload(
+        fonts=[(cfg.font, bytes(FONT_STUB_SIZE), 'application/x-font-ttf')])
+    if os.access('default.css', os.R_OK):
+        with open('default.css', 'r') as css_file:
+            payload.stylesheets['default.css'] = css_file.read()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cases = [] if options.no_corpus else [
+            (name, 'corpus', csv_filename)
+            for name, csv_filename in corpus_csv_files()]
+        for rows in options.sizes:
+            csv_filename = os.path.join(tmp_dir, 'stress_{}.csv'.format(rows))
+            generate_stress_csv(csv_filename, rows, options.columns)
+            cases.append(('stress_{}'.format(rows), 'synthetic',
+                          csv_filename))
+
+        print_table_header()
+        for name, source, csv_filename in cases:
+            results.append(benchmark_csv(
+                name, source, csv_filename, tmp_dir, cfg, payload,
+                options.repeat, not options.no_memory))
+            print_table_row(results[-1])
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'config': {'backend': cfg.backend, 'style_mode': cfg.style_mode,
+                   'tag_symbols': cfg.tag_symbols, 'pretty': cfg.pretty,
+                   'vectorized_layout': cfg.vectorized_layout},
+        'results': results,
+    }
+    if options.json:
+        with open(options.json, 'w') as json_file:
+            json.dump(report, json_file, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+
+
+if __name__ == '__main__':
+    main()
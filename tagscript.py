@@ -2,6 +2,7 @@
 """Create a Graphical Datasheet SVG file from a formatted CSV file.
 
 Syntax: `python tagscript.py [[<CSV filename>] [<SVG filename>]]
+        `python tagscript.py <directory or glob> [--workers N]`
 A comma-separated values (CSV) filename can be supplied to the script as
 an argument:
     e.g., `python tagscript.py ProMini.csv`
@@ -13,6 +14,27 @@ So `ProMini.csv` will result in a `ProMini.svg`.  A different SVG
 filename can be specified by entering a SVG filename with the second
 parameter:
     e.g., `python tagscript.py ProMini.csv foo.svg`
+A '.svgz' filename (or `--svgz`) saves a gzip compressed SVG, and `-`
+writes the SVG to the standard output.  `--archive` saves every file of
+the run into a zip or tar archive (see OutputSink):
+    e.g., `python tagscript.py Datasheets --archive datasheets.tar.gz`
+`--page-height` splits long sheets into an SVG per page (rendered in
+parallel) and a multi-page PDF (see paginate_layout()):
+    e.g., `python tagscript.py BigFPGA.csv --page-height 1123 --pdf`
+
+Batch mode
+A directory or a glob pattern can be supplied instead of a CSV filename.
+Every CSV file found (directories are searched recursively) is rendered
+next to its CSV in a pool of worker processes, and a summary of the
+per-file timings and failures is printed at the end:
+    e.g., `python tagscript.py Datasheets --workers 4`
+    e.g., `python tagscript.py "Datasheets/SAM*/*.csv"`
+
+Validation
+`--lint` checks the CSV file(s) without rendering and reports errors and
+warnings with their line and column (see validate_csv()).  With
+`--validate` files with errors are rejected before any font is fetched:
+    e.g., `python tagscript.py Datasheets --lint`
 
 -------------------------------------------------------------------------------
 Basics to CSV formatting:
@@ -49,11 +71,77 @@ The following were used as resources for creating the script:
 * <https://pypi.python.org/pypi/svgwrite/>  svgwrite library
 """
 
+import argparse
+import base64
+import bisect
+import codecs
+import collections
+import contextlib
+import copy
+import csv
+import difflib
+import filecmp
+import glob
+import gzip
+import hashlib
+import json
+import io
+import itertools
+import logging
 import os
-from sys import argv, exit as sys_exit
+import re
+import socket
+import socketserver
+import stat
+import struct
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from array import array
+from math import ceil, isfinite, pi
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor,
+                                TimeoutError as FutureTimeoutError)
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from sys import argv, exit as sys_exit, stderr, stdin, stdout
 from urllib.error import HTTPError, URLError
+from urllib.parse import parse_qs, urlsplit
+from urllib.request import urlopen
 
 from svgwrite import Drawing
+from svgwrite.container import FONT_TEMPLATE
+from svgwrite.utils import base64_data, find_first_url, font_mimetype
+
+try:
+    import cairo
+except ImportError:
+    cairo = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from fontTools import subset as font_subset
+except ImportError:
+    font_subset = None
+
+DEFAULT_FONT_CACHE = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.join('~', '.cache')),
+    'graphical_datasheets', 'fonts')
+
+# Progress messages are logged at INFO level, missing images and fonts
+# at WARNING level.  create_gd() logs them to the standard output.
+logger = logging.getLogger('tagscript')
+logger.addHandler(logging.NullHandler())
 
 
 class GDConfig(object):
@@ -112,8 +200,126 @@ class GDConfig(object):
             indented file.  If False, the resulting SVG will not have
             indentation and multiple elements per line.  Setting it to
             False will thereby result in a smaller file size.
+        font_cache: (str, Default: '~/.cache/graphical_datasheets/fonts')
+            Directory used to cache downloaded Google fonts.  The cache
+            is consulted before any network fetch.  If None, fonts are
+            always downloaded.
+        font_cache_ttl: (int, Default: 2592000) Seconds before a cached
+            font is downloaded again (30 days).  Seeded fonts never
+            expire.  If None, cached fonts never expire.
+        font_cache_size: (int, Default: 52428800) Maximum number of bytes
+            kept in the font cache (least recently used fonts are
+            evicted first).  If None, the cache size is not limited.
+        incremental: (bool, Default: False) Only render SVGs whose
+            inputs (CSV, stylesheets, images and configuration) changed
+            since they were last rendered.  Up-to-date SVGs are skipped
+            and the files written by an earlier build are overwritten
+            in place; other existing files are kept (see
+            BuildManifest.output_filename()).
+        manifest: (str, Default: '.gd_manifest.json') Build manifest
+            recording the inputs of each rendered SVG (see
+            'incremental').
+        backend: (str, Default: 'svgwrite') SVG output backend.
+            'svgwrite' builds the whole document with svgwrite before
+            saving it.  'stream' writes each element to a spool file as
+            it is added (without svgwrite's attribute validation), which
+            is faster and uses less memory for very large sheets.  The
+            'stream' output is identical to the 'svgwrite' output with
+            pretty=False ('pretty' is ignored).
+        themes: (list, Default: None) List of Theme objects.  If set,
+            the CSV is parsed and laid out once and an SVG is saved for
+            each theme ('<root>_<theme name>.svg') instead of a single
+            '<root>.svg'.
+        style_mode: (str, Default: 'inline') 'inline' writes the colors,
+            font and font size as attributes of every tag and text
+            element.  'class' only writes the class attributes and
+            embeds the font rules of class_stylesheet() before
+            'default.css' and the tag color rules of
+            tag_color_stylesheet() after 'default.css' and '<root>.css',
+            which makes much smaller SVG files.  Note that the tag
+            colors take precedence over the colors of those
+            stylesheets.
+        tag_symbols: (bool, Default: False) Define one tag background
+            <symbol> per column in the <defs> section and place each
+            background with a <use> element rather than a <rect>.  This
+            makes large sheets smaller and faster to load, but the
+            backgrounds are harder to edit individually in Inkskape.
+        profiler: (Profiler, Default: None) Records the duration of
+            each rendering stage and counters such as the number of
+            tags per section and the bytes written (see Profiler).  If
+            None, nothing is recorded.
+        exports: (tuple/list, Default: ()) Also save the layout as a
+            vector PDF ('pdf') and/or a PNG image ('png') next to each
+            SVG (see export_layout()).  Requires pycairo.
+        dpi: (int, Default: 96) Resolution of exported PNG images.  At
+            96 DPI one SVG pixel is one PNG pixel.
+        embed_images: (bool, Default: False) Embed the 'Extras' images
+            as base64 data URIs instead of linking 'Images/<value>.png',
+            so the SVG can be moved.  Images are scaled to fit in
+            'image_size' with their true aspect ratio and placed side by
+            side (the row height and document width follow the scaled
+            images).
+        downscale_images: (bool, Default: False) Downscale embedded
+            images that are larger than their displayed size (requires
+            Pillow; without it the images are embedded unchanged).
+        autofit_tags: (bool, Default: False) Widen the tags of each
+            column to fit its widest label (measured with the metrics
+            of the Google font 'font', see text_measurer()).  'tag_size'
+            is the minimum tag size.  The whole CSV is read before the
+            layout is computed.
+        vectorized_layout: (bool, Default: False) Compute the tag
+            positions of each Right/Left/Top section with NumPy, in
+            blocks of rows, instead of one tag at a time (see
+            layout_tag_rows()).  The Layout is identical, but huge pin
+            tables are laid out faster.  Requires NumPy.
+        validate: (bool, Default: False) Check each CSV file with
+            validate_csv() before any font is fetched.  Files with
+            errors are not rendered.
+        font_timeout: (int/float, Default: 30) Seconds allowed for
+            fetching all of the Google fonts, which are downloaded
+            concurrently (see StyleFetch).  Fonts that are not fetched
+            in time are not embedded.  If None, there is no limit.
+        svgz: (bool, Default: False) Save gzip compressed '.svgz' files
+            instead of '.svg' files.
+        svgz_level: (int, Default: 9) gzip compression level of '.svgz'
+            files (1 is fastest, 9 is smallest).
+        sink: (OutputSink, Default: None) Where the SVG, PDF and PNG
+            files are saved: FileSink (files, the default if None),
+            StreamSink (e.g., the standard output), BufferSink (memory)
+            or ArchiveSink (a tar or zip file, e.g., for a batch).
+        subset_fonts: (bool, Default: False) Embed the Google fonts
+            reduced to the glyphs of the characters used by the tags and
+            text lines of each sheet (see FontSubsets).  Requires
+            fontTools.
+        deterministic: (bool, Default: False) Make identical inputs
+            give identical bytes: Google fonts are only taken from the
+            font cache (never downloaded, see FontCache.seed()) and
+            PDF creation dates are fixed ('SOURCE_DATE_EPOCH' or 1970).
+            A file that is replaced (see 'overwrite' and 'incremental')
+            is only written when its content changed (see
+            OutputSink.save()).  Element ids need no change: they are
+            always named explicitly (e.g., 'tag1_bkg').
+        page_height: (int/float, Default: None) Split the sheet into
+            pages of this height, between rows (see paginate_layout()).
+            Each page is saved as '<root>_p01.svg', '<root>_p02.svg',
+            ..., the PDF export is a single multi-page PDF and the PNG
+            export is one image per page.  The pages are as wide as the
+            document ('document_size' width if it is set).  If None, a
+            single SVG is saved.  render_csv() and the render server
+            always render a single SVG.
+        page_workers: (int, Default: None) Number of worker processes
+            rendering the pages (see PagePool), started once per run.
+            If None, the number of CPUs is used.  If 1, the pages are
+            rendered in the current process, as they are in the worker
+            processes of a batch run.
     """
 
+    # Options that do not change the content of the rendered SVG.
+    _build_neutral = {'overwrite', 'font_cache', 'font_cache_ttl',
+                      'font_cache_size', 'incremental', 'manifest',
+                      'profiler', 'vectorized_layout', 'validate',
+                      'font_timeout', 'sink', 'page_workers'}
+
     def __init__(
                  self,
                  font='Varta',
@@ -130,6 +336,31 @@ class GDConfig(object):
                  link_stylesheet=False,
                  overwrite=False,
                  pretty=True,
+                 font_cache=DEFAULT_FONT_CACHE,
+                 font_cache_ttl=30 * 24 * 60 * 60,
+                 font_cache_size=50 * 1024 * 1024,
+                 incremental=False,
+                 manifest='.gd_manifest.json',
+                 backend='svgwrite',
+                 themes=None,
+                 style_mode='inline',
+                 tag_symbols=False,
+                 profiler=None,
+                 exports=(),
+                 dpi=96,
+                 embed_images=False,
+                 downscale_images=False,
+                 autofit_tags=False,
+                 vectorized_layout=False,
+                 validate=False,
+                 font_timeout=30,
+                 deterministic=False,
+                 subset_fonts=False,
+                 svgz=False,
+                 svgz_level=9,
+                 sink=None,
+                 page_height=None,
+                 page_workers=None,
                 ):
         """Initializes a GDConfig object.
 
@@ -173,6 +404,31 @@ class GDConfig(object):
         self.link_stylesheet = link_stylesheet
         self.overwrite = overwrite
         self.pretty = pretty
+        self.font_cache = font_cache
+        self.font_cache_ttl = font_cache_ttl
+        self.font_cache_size = font_cache_size
+        self.incremental = incremental
+        self.manifest = manifest
+        self.backend = backend
+        self.themes = themes
+        self.style_mode = style_mode
+        self.tag_symbols = tag_symbols
+        self.profiler = profiler
+        self.exports = list(exports)
+        self.dpi = dpi
+        self.embed_images = embed_images
+        self.downscale_images = downscale_images
+        self.autofit_tags = autofit_tags
+        self.vectorized_layout = vectorized_layout
+        self.validate = validate
+        self.font_timeout = font_timeout
+        self.deterministic = deterministic
+        self.subset_fonts = subset_fonts
+        self.svgz = svgz
+        self.svgz_level = svgz_level
+        self.sink = sink
+        self.page_height = page_height
+        self.page_workers = page_workers
 
     def get_colors(self, new_colors):
         """Alters the default tag color scheme.
@@ -215,23 +471,22 @@ class GDConfig(object):
         if new_colors is None and not isinstance(new_colors, (list, tuple)):
             return default_colors
 
-        if isinstance(new_colors, tuple):
-            new_colors = [*new_colors]
+        new_colors = [*new_colors]
 
         for i, value in enumerate(new_colors):
             new_colors[i] = None
-            if isinstance(new_colors[i], str):
+            if isinstance(value, str):
                 new_colors[i] = [value,
                                  value,
                                  self.tag_txt_color]
-            elif isinstance(new_colors[i], (list, tuple)):
-                if len(new_colors[i]) == 3:
-                    new_colors[i] = list(new_colors[i])
-                elif len(new_colors[i]) == 2:
+            elif isinstance(value, (list, tuple)):
+                if len(value) == 3:
+                    new_colors[i] = list(value)
+                elif len(value) == 2:
                     new_colors[i] = [value[0],
                                      value[1],
                                      self.tag_txt_color]
-                elif len(new_colors[i]) == 1:
+                elif len(value) == 1:
                     new_colors[i] = [value[0],
                                      value[0],
                                      self.tag_txt_color]
@@ -247,10 +502,440 @@ class GDConfig(object):
 
         return final_colors
 
+    def fingerprint(self):
+        """Returns a str identifying every option that affects the SVG."""
+        options = {}
+        for name, value in vars(self).items():
+            if name in self._build_neutral:
+                continue
+            options[name] = sorted(value) if isinstance(value, set) else value
+        return json.dumps(options, sort_keys=True, default=repr)
+
+
+class Theme(object):
+    """A color scheme rendered as its own SVG (see GDConfig 'themes').
+
+    Attributes:
+        name: (str) Theme name, appended to the SVG filename root
+            (e.g., 'dark' saves 'ProMini_dark.svg').
+        tag_colors: (list, Default: None) Tag colors of the theme, in
+            the same format as GDConfig 'tag_colors'.  If None, the
+            configured tag colors are used.
+        stylesheet: (str, Default: None) CSS file embedded (or linked)
+            after 'default.css' and '<root>.css'.
+    """
+
+    def __init__(self, name, tag_colors=None, stylesheet=None):
+        """Initializes a Theme object."""
+        self.name = name
+        self.tag_colors = tag_colors
+        self.stylesheet = stylesheet
+
+    def __repr__(self):
+        return 'Theme({!r}, tag_colors={!r}, stylesheet={!r})'.format(
+            self.name, self.tag_colors, self.stylesheet)
+
+    def configure(self, cfg):
+        """Returns a copy of 'cfg' using the colors of the theme."""
+        theme_cfg = copy.copy(cfg)
+        if self.tag_colors is not None:
+            theme_cfg.tag_colors = cfg.get_colors(self.tag_colors)
+        return theme_cfg
+
+
+class Profiler(object):
+    """Per-stage timings and counters of Graphical Datasheet renders.
+
+    Set GDConfig 'profiler' to a Profiler to record how long each stage
+    of create_gd(), render_csv_file() and batch_create_gd() takes
+    ('layout', 'fetch_style', 'embed_style', 'render' and 'write_svg').
+    Stages that run several times (e.g., once per theme or per CSV file
+    in batch mode) are summed.  The following counters are kept:
+        '<section>.tags', '<section>.text_lines', '<section>.images':
+            Elements added in each CSV section ('Right', 'Text', ...).
+            'Default' is the section before the first section keyword.
+        'bytes_written': Size of the saved SVG files.
+        'network_seconds': Time spent waiting for Google font downloads.
+        'font_cache_hits', 'font_downloads': Google font lookups.
+
+    Attributes:
+        stages: (dict) Seconds spent in each stage.
+        counters: (dict) Counter values.
+        hooks: (list) Callables called as hook(event, name, value) when
+            a stage ends (event 'stage', value in seconds) and when a
+            counter is incremented (event 'count', value is the
+            increment).
+    """
+
+    def __init__(self, hooks=None):
+        """Initializes an empty Profiler."""
+        self.stages = {}
+        self.counters = {}
+        self.hooks = list(hooks or [])
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Context manager timing a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        """Add 'seconds' to the duration of a stage."""
+        self.stages[name] = self.stages.get(name, 0) + seconds
+        for hook in self.hooks:
+            hook('stage', name, seconds)
+
+    def count(self, name, value=1):
+        """Increment a counter."""
+        self.counters[name] = self.counters.get(name, 0) + value
+        for hook in self.hooks:
+            hook('count', name, value)
+
+    def count_layout(self, layout):
+        """Count the tags, text lines and images of each layout section."""
+        names = {Layout.TAG: 'tags', Layout.TEXT: 'text_lines',
+                 Layout.IMAGE: 'images'}
+        bounds = layout.sections + [(None, len(layout))]
+        for (mode, start), (_, end) in zip(bounds, bounds[1:]):
+            totals = dict.fromkeys(names.values(), 0)
+            for kind in layout.kinds[start:end]:
+                totals[names[kind]] += 1
+            for name, value in totals.items():
+                if value:
+                    self.count('{}.{}'.format(mode or 'Default', name), value)
+
+    def merge(self, report):
+        """Add the stages and counters of another Profiler's report()."""
+        for name, seconds in report['stages'].items():
+            self.add_time(name, seconds)
+        for name, value in report['counters'].items():
+            self.count(name, value)
+
+    def report(self):
+        """Returns a dict of the stages and counters (JSON serializable)."""
+        return {'stages': dict(self.stages), 'counters': dict(self.counters)}
+
+    def format_table(self):
+        """Returns the stages and counters as a human readable table."""
+        total = sum(self.stages.values())
+        lines = ['{:<32s}{:>12s}{:>8s}'.format('stage', 'seconds', '%')]
+        for name, seconds in self.stages.items():
+            lines.append('{:<32s}{:>12.4f}{:>8.1%}'.format(
+                name, seconds, seconds / total if total else 0))
+        lines.append('{:<32s}{:>12.4f}'.format('total', total))
+        lines.append('')
+        lines.append('{:<32s}{:>12s}'.format('counter', 'value'))
+        for name in sorted(self.counters):
+            value = self.counters[name]
+            lines.append('{:<32s}{:>12}'.format(
+                name, '{:.4f}'.format(value) if isinstance(value, float)
+                else '{:,d}'.format(value)))
+        return '\n'.join(lines)
+
+
+class _NoStage(object):
+    """Context manager used for stages when profiling is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+def profile_stage(cfg, name):
+    """Returns a context manager timing a stage with cfg.profiler.
+
+    If profiling is disabled, a shared no-op context manager is returned.
+    """
+    if cfg.profiler is None:
+        return _NO_STAGE
+    return cfg.profiler.stage(name)
+
+
+def _escape_text(text):
+    """Escape XML character data the way ElementTree does."""
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+
+def _escape_attrib(text):
+    """Escape an XML attribute value the way ElementTree does."""
+    text = _escape_text(text)
+    if '"' in text:
+        text = text.replace('"', '&quot;')
+    if '\r' in text:
+        text = text.replace('\r', '&#13;')
+    if '\n' in text:
+        text = text.replace('\n', '&#10;')
+    if '\t' in text:
+        text = text.replace('\t', '&#09;')
+    return text
+
+
+class _StreamContainer(object):
+    """A container element (e.g., <defs> or <symbol>) of a StreamDrawing.
+
+    Attributes:
+        name: (str) Element name.
+        attribs: (dict) Element attributes.
+        elements: (list) Serialized child elements.
+    """
+
+    def __init__(self, name, attribs):
+        """Initializes a _StreamContainer object."""
+        self.name = name
+        self.attribs = attribs
+        self.elements = []
+
+    def add(self, element):
+        """Add a serialized child element."""
+        self.elements.append(element)
+        return element
+
+    def __str__(self):
+        if not self.elements:
+            return StreamDrawing._element(self.name, self.attribs)
+        return '<{0}{1}>{2}</{0}>'.format(
+            self.name, StreamDrawing._attributes(self.attribs),
+            ''.join(str(element) for element in self.elements))
+
+
+class StreamDrawing(object):
+    """A svgwrite Drawing stand-in that streams elements to a spool file.
+
+    Only the Drawing methods used by this script are provided.  Element
+    methods (rect(), text(), image(), use()) return serialized XML
+    strings, and add() writes them to a spool file immediately rather
+    than keeping an element tree in memory.  The <svg> header (whose
+    size is only known once every element has been added), the <defs>
+    and the spooled elements are combined when the drawing is saved.
+    Attributes are serialized in the same order and with the same
+    escaping as svgwrite (with pretty=False), so the output is
+    byte-for-byte identical.
+
+    Attributes:
+        filename: (str) Filename used by save().
+        attribs: (dict) Attributes of the <svg> element.
+        defs: (_StreamContainer) The <defs> section.
+    """
+
+    spool_size = 1024 * 1024
+
+    def __init__(self, filename='noname.svg', size=('100%', '100%')):
+        """Initializes a StreamDrawing object."""
+        self.filename = filename
+        self.attribs = {
+            'baseProfile': 'full',
+            'height': size[1],
+            'version': '1.1',
+            'width': size[0],
+            'xmlns': 'http://www.w3.org/2000/svg',
+            'xmlns:ev': 'http://www.w3.org/2001/xml-events',
+            'xmlns:xlink': 'http://www.w3.org/1999/xlink',
+        }
+        self._stylesheets = []
+        self.defs = _StreamContainer('defs', {})
+        self._body = tempfile.SpooledTemporaryFile(
+            max_size=self.spool_size, mode='w+', encoding='utf-8')
+
+    @staticmethod
+    def _attributes(attribs):
+        """Serialize attributes with svgwrite's naming and ordering rules."""
+        parts = []
+        for key, value in sorted(
+                (key.rstrip('_').replace('_', '-'), value)
+                for key, value in attribs.items()):
+            if value is None:
+                continue
+            value = str(value)
+            if value:
+                parts.append(' {}="{}"'.format(key, _escape_attrib(value)))
+        return ''.join(parts)
+
+    @classmethod
+    def _element(cls, name, attribs, text=None):
+        """Serialize an element without children."""
+        if text:
+            return '<{0}{1}>{2}</{0}>'.format(
+                name, cls._attributes(attribs), _escape_text(text))
+        return '<{}{} />'.format(name, cls._attributes(attribs))
 
-def add_tag(dwg, i, value, position, cfg=GDConfig()):
+    def rect(self, insert=(0, 0), size=(1, 1), **extra):
+        """Returns a serialized <rect> element."""
+        extra.update(x=insert[0], y=insert[1], width=size[0], height=size[1])
+        return self._element('rect', extra)
+
+    def text(self, text, insert=None, **extra):
+        """Returns a serialized <text> element."""
+        if insert is not None:
+            extra.update(x=insert[0], y=insert[1])
+        return self._element('text', extra, str(text))
+
+    def image(self, href, insert=None, size=None, **extra):
+        """Returns a serialized <image> element."""
+        extra['xlink:href'] = href
+        if insert is not None:
+            extra.update(x=insert[0], y=insert[1])
+        if size is not None:
+            extra.update(width=size[0], height=size[1])
+        return self._element('image', extra)
+
+    def symbol(self, **extra):
+        """Returns a <symbol> container."""
+        return _StreamContainer('symbol', extra)
+
+    def use(self, href, insert=None, **extra):
+        """Returns a serialized <use> element."""
+        extra['xlink:href'] = href
+        if insert is not None:
+            extra.update(x=insert[0], y=insert[1])
+        return self._element('use', extra)
+
+    def add(self, element):
+        """Write a serialized element to the spool file."""
+        self._body.write(str(element))
+        return element
+
+    def update(self, attribs):
+        """Update the attributes of the <svg> element."""
+        for key, value in attribs.items():
+            self.attribs[key.rstrip('_').replace('_', '-')] = value
+
+    def add_stylesheet(self, href, title, alternate='no', media='screen'):
+        """Add a stylesheet reference."""
+        self._stylesheets.append((href, title, alternate, media))
+
+    def embed_stylesheet(self, content):
+        """Add a <style> element to the <defs> section."""
+        self.defs.add('<style type="text/css"><![CDATA[{}]]></style>'
+                      .format(content))
+
+    def write(self, fileobj, pretty=False, indent=2):
+        """Write the SVG to 'fileobj' ('pretty' and 'indent' are ignored)."""
+        fileobj.write('<?xml version="1.0" encoding="utf-8" ?>\n')
+        for stylesheet in self._stylesheets:
+            fileobj.write('<?xml-stylesheet href="%s" type="text/css" '
+                          'title="%s" alternate="%s" media="%s"?>\n'
+                          % stylesheet)
+        fileobj.write('<svg{}>'.format(self._attributes(self.attribs)))
+        fileobj.write(str(self.defs))
+        self._body.seek(0)
+        while True:
+            chunk = self._body.read(self.spool_size)
+            if not chunk:
+                break
+            fileobj.write(chunk)
+        fileobj.write('</svg>')
+
+    def save(self, pretty=False, indent=2):
+        """Write the SVG to 'self.filename'."""
+        with open(self.filename, 'w', encoding='utf-8') as svg_file:
+            self.write(svg_file, pretty, indent)
+
+    def saveas(self, filename, pretty=False, indent=2):
+        """Write the SVG to 'filename'."""
+        self.filename = filename
+        self.save(pretty, indent)
+
+
+def new_drawing(filename, cfg=GDConfig()):
+    """Create a drawing using the backend selected by 'cfg.backend'.
+
+    Args:
+        filename: (str) SVG filename.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+
+    Returns:
+        A svgwrite Drawing or a StreamDrawing.
+    """
+    if cfg.style_mode not in ('inline', 'class'):
+        raise ValueError('Unknown style_mode: {!r}'.format(cfg.style_mode))
+    if cfg.backend == 'stream':
+        return StreamDrawing(filename=filename)
+    if cfg.backend != 'svgwrite':
+        raise ValueError('Unknown backend: {!r}'.format(cfg.backend))
+    return Drawing(filename=filename)
+
+
+SECTION_KEYWORDS = ('Left', 'Right', 'Top', 'Text', 'Extras')
+
+
+def record_marker(record):
+    """Identify section heading and 'EOF' lines.
+
+    Some repository CSV files have a '1' in the last column.  This '1'
+    is ignored for determining the marker.
+
+    Args:
+        record: (list) The fields of a CSV line.
+
+    Returns:
+        The section keyword or 'EOF' if the line only contains one of
+        them in the first field, otherwise None.
+    """
+    if record[0] in SECTION_KEYWORDS + ('EOF',) and (
+            record[0] == ''.join(record).rstrip('1')):
+        return record[0]
+    return None
+
+
+def _tag_styles(i, cfg=GDConfig()):
+    """Returns the (background, text) style attributes of tag 'i'."""
+    if cfg.style_mode == 'class':
+        return {}, {}
+    color_bkg, color_outline, color_txt = cfg.tag_colors[i]
+    return ({'stroke': color_outline, 'fill': color_bkg},
+            {'font_size': cfg.font_size, 'font_family': cfg.font,
+             'fill': color_txt})
+
+
+def add_tag_symbols(dwg, columns, cfg=GDConfig(), widths=None):
+    """Define the tag background symbols used with 'cfg.tag_symbols'.
+
+    A '<symbol id="tag<#>_bkg">' holding the tag background is added to
+    the <defs> section for each column.
+
+    Args:
+        dwg: (svg.drawing.Drawing) A svgwrite Drawing instance to amend.
+        columns: (iterable) Indexes of the tag columns.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+        widths: (dict Default=None) Tag width of each column (see
+            GDConfig 'autofit_tags').  If None, 'cfg.tag_size' is used.
+    """
+    for i in sorted(columns):
+        symbol = dwg.symbol(id='tag{:d}_bkg'.format(i), overflow='visible')
+        symbol.add(dwg.rect(
+            insert=(0, 0),
+            size=(cfg.tag_size[0] if widths is None else widths[i],
+                  cfg.tag_size[1]),
+            rx=1,
+            ry=1,
+            class_='tag{:d} tag_bkg'.format(i),
+            **_tag_styles(i, cfg)[0]
+        ))
+        dwg.defs.add(symbol)
+
+
+def add_tag(dwg, i, value, position, cfg=GDConfig(), size=None):
     """Add tags comprised of colored blocks and text.
 
+    If 'cfg.tag_symbols' is set, the background is a <use> of the
+    column's symbol (see add_tag_symbols()).
+
     Args:
         dwg: (svg.drawing.Drawing) A svgwrite Drawing instance to amend.
         i: (int) The index of the tag element.
@@ -258,31 +943,35 @@ def add_tag(dwg, i, value, position, cfg=GDConfig()):
         y: (int) The vertical position to add the tag in the SVG.
         cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
             configuration to use.
+        size: (tuple Default=None) Width, Height of the tag background.
+            If None, 'cfg.tag_size' is used.
 
     Returns:
         An int, providing the amount of vertical space used.
     """
-    color_bkg, color_outline, color_txt = cfg.tag_colors[i]
+    bkg_style, txt_style = _tag_styles(i, cfg)
     position_x, position_y = position
+    width, height = cfg.tag_size if size is None else size
 
-    dwg.add(dwg.rect(
-        insert=(position_x, position_y),
-        size=(cfg.tag_size[0], cfg.tag_size[1]),
-        rx=1,
-        ry=1,
-        stroke=color_outline,
-        fill=color_bkg,
-        class_='tag{:d} tag_bkg'.format(i)
-    ))
+    if cfg.tag_symbols:
+        dwg.add(dwg.use('#tag{:d}_bkg'.format(i),
+                        insert=(position_x, position_y)))
+    else:
+        dwg.add(dwg.rect(
+            insert=(position_x, position_y),
+            size=(width, height),
+            rx=1,
+            ry=1,
+            class_='tag{:d} tag_bkg'.format(i),
+            **bkg_style
+        ))
 
     dwg.add(dwg.text(
         value,
         insert=(position_x + cfg.tag_txt_margins[0],
-                position_y + cfg.tag_size[1] - cfg.tag_txt_margins[1]),
-        font_size=cfg.font_size,
-        font_family=cfg.font,
-        fill=color_txt,
-        class_='tag{:d} tag_txt'.format(i)
+                position_y + height - cfg.tag_txt_margins[1]),
+        class_='tag{:d} tag_txt'.format(i),
+        **txt_style
     ))
 
     return cfg.tag_size[1] + cfg.tag_margins[1]
@@ -302,15 +991,72 @@ def add_text(dwg, i, value, ystart, cfg=GDConfig()):
     Returns:
         An int, providing the amount of vertical space used.
     """
+    text_style = {} if cfg.style_mode == 'class' else {
+        'font_size': 12, 'font_family': cfg.font, 'fill': 'black'}
     dwg.add(dwg.text(str(value),
                      insert=(0, ystart),
-                     font_size=12,
-                     font_family=cfg.font,
-                     fill='black',
-                     class_='text_line{:d} text'.format(i)))
+                     class_='text_line{:d} text'.format(i),
+                     **text_style))
     return cfg.text_line_height
 
 
+def class_stylesheet(cfg=GDConfig()):
+    """Generate the font rules used with GDConfig(style_mode='class').
+
+    The rules hold the font and font size that are otherwise written as
+    attributes of every tag and text element.  Like those attributes,
+    they are overridden by 'default.css'.  The tag colors are embedded
+    next (see tag_color_stylesheet()).
+
+    Args:
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+
+    Returns:
+        A str of CSS rules.
+    """
+    rules = [
+        '.tag_txt {{ font-family: "{}"; font-size: {}px; }}'.format(
+            cfg.font, cfg.font_size),
+        '.text {{ font-family: "{}"; font-size: 12px; fill: black; }}'.format(
+            cfg.font),
+    ]
+    return '\n'.join(rules) + '\n'
+
+
+def tag_color_stylesheet(tag_colors, defaults=()):
+    """Generate the CSS rules giving each tag column its colors.
+
+    In the 'class' style mode, the rules replace the color attributes
+    of the tags.  Like those attributes, they are embedded before
+    'default.css' and '<root>.css', whose '.tag<#>.tag_bkg' rules
+    override them.  The colors of themes are embedded after these
+    stylesheets instead.
+
+    Args:
+        tag_colors: (list) Tag colors (see GDConfig 'tag_colors').
+        defaults: (list Default=()) Tag colors left out: a column
+            whose colors are those of 'defaults' gets no rules.
+
+    Returns:
+        A str of CSS rules.
+    """
+    rules = []
+    for i, colors in enumerate(tag_colors):
+        if i < len(defaults) and tuple(colors) == tuple(defaults[i]):
+            continue
+        color_bkg, color_outline, color_txt = colors
+        rules.append('.tag{0}.tag_bkg {{ fill: {1}; stroke: {2}; }}\n'
+                     '.tag{0}.tag_txt {{ fill: {3}; }}'.format(
+                         i, color_bkg, color_outline, color_txt))
+    return '\n'.join(rules) + '\n'
+
+
+def image_filename(value):
+    """Returns the PNG filename used for an 'Extras' value."""
+    return os.path.join('Images', value + '.png')
+
+
 def add_images(dwg, i, value, ystart, cfg=GDConfig()):
     """Adds PNG images to the SVG.
 
@@ -325,27 +1071,303 @@ def add_images(dwg, i, value, ystart, cfg=GDConfig()):
     Returns:
         An int, providing the amount of vertical space used.
     """
-    currentimage = os.path.join('Images', value + '.png')
+    currentimage = image_filename(value)
     if os.access(currentimage, os.R_OK):
-        print('Adding {}'.format(currentimage))
+        logger.info('Adding {}'.format(currentimage))
         dwg.add(dwg.image(href=currentimage,
                           insert=(i*cfg.image_size[0], ystart),
                           size=(cfg.image_size[0], cfg.image_size[1])))
         return cfg.image_size[1]
 
-    print('Could not find {}'.format(currentimage))
+    logger.warning('Could not find {}'.format(currentimage))
     return 0
 
 
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def png_size(filename):
+    """Returns the (width, height) in pixels of a PNG file.
+
+    Only the IHDR chunk at the start of the file is read.  Returns None
+    if the file is not a PNG.
+    """
+    with open(filename, 'rb') as png_file:
+        header = png_file.read(24)
+    if header[:8] != PNG_SIGNATURE or header[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', header[16:24])
+
+
+def fit_image(filename, box):
+    """Returns the size of an image scaled to fit in 'box'.
+
+    The aspect ratio of the image is kept (as an SVG <image> does by
+    default).  If 'box' holds integers, the size is rounded to whole
+    pixels.
+
+    Args:
+        filename: (str) PNG filename.
+        box: (tuple/list) Maximum (width, height).
+
+    Returns:
+        A (width, height) tuple ('box' if the file is not a PNG).
+    """
+    size = png_size(filename)
+    if size is None or not size[0] or not size[1]:
+        return tuple(box)
+    scale = min(box[0] / size[0], box[1] / size[1])
+    width, height = size[0] * scale, size[1] * scale
+    if isinstance(box[0], int) and isinstance(box[1], int):
+        return max(int(round(width)), 1), max(int(round(height)), 1)
+    return width, height
+
+
+class ImageCache(object):
+    """Base64 data URIs of the embedded images, keyed by content hash.
+
+    Identical images (e.g., the same header graphic copied for several
+    boards) are encoded once, and each file is only hashed again when
+    it changes.  An ImageCache is part of the StylePayload, so it is
+    shared by every SVG of a batch or render server.
+
+    Attributes:
+        uris: (dict) Data URIs keyed by (SHA-256 hex digest, size) where
+            'size' is the (width, height) the image was downscaled to, or
+            None.
+        digests: (dict) SHA-256 hex digests keyed by (filename, mtime,
+            file size).
+    """
+
+    def __init__(self):
+        """Initializes an empty ImageCache."""
+        self.uris = {}
+        self.digests = {}
+
+    def data_uri(self, filename, size=None):
+        """Returns the data URI of a PNG file.
+
+        Args:
+            filename: (str) PNG filename.
+            size: (tuple Default=None) (width, height) to downscale the
+                image to (it is never enlarged).  Requires Pillow.  If
+                None, the file is embedded unchanged.
+
+        Returns:
+            A 'data:image/png;base64,...' str.
+
+        Raises:
+            ImportError: 'size' is given and Pillow is not installed.
+        """
+        data = None
+        stamp_key = (filename,) + (_file_stamp(filename) or ())
+        digest = self.digests.get(stamp_key)
+        if digest is None:
+            with open(filename, 'rb') as png_file:
+                data = png_file.read()
+            digest = hashlib.sha256(data).hexdigest()
+            self.digests[stamp_key] = digest
+
+        key = (digest, None if size is None else tuple(size))
+        if key not in self.uris:
+            if data is None:
+                with open(filename, 'rb') as png_file:
+                    data = png_file.read()
+            if size is not None:
+                data = downscale_png(data, size)
+            self.uris[key] = 'data:image/png;base64,' + base64.b64encode(
+                data).decode('ascii')
+        return self.uris[key]
+
+    def prefetch(self, filenames, cfg):
+        """Encode images before they are needed (e.g., before a batch).
+
+        Args:
+            filenames: (iterable) PNG filenames.
+            cfg: (GDConfig) Graphical Datasheet configuration to use.
+        """
+        for filename in filenames:
+            if os.access(filename, os.R_OK):
+                self.data_uri(filename, embedded_image_size(filename, cfg))
+
+
+def downscale_png(data, size):
+    """Downscale PNG data to fit in 'size' with Pillow.
+
+    Args:
+        data: (bytes) PNG file contents.
+        size: (tuple) Maximum (width, height) in pixels.
+
+    Returns:
+        The PNG data of the smaller image ('data' if it already fits).
+
+    Raises:
+        ImportError: Pillow is not installed.
+    """
+    if Image is None:
+        raise ImportError('Downscaling images requires Pillow '
+                          '(pip install Pillow)')
+    image = Image.open(io.BytesIO(data))
+    box = (max(int(ceil(size[0])), 1), max(int(ceil(size[1])), 1))
+    if image.width <= box[0] and image.height <= box[1]:
+        return data
+    image.thumbnail(box, Image.LANCZOS)
+    png_file = io.BytesIO()
+    image.save(png_file, 'PNG', optimize=True)
+    return png_file.getvalue()
+
+
+# Warnings already logged by this process (each one is logged once).
+_LOGGED_WARNINGS = set()
+
+
+def embedded_image_size(filename, cfg=GDConfig()):
+    """Returns the size an embedded image is downscaled to (or None).
+
+    If Pillow is not installed, the downscale is skipped (with a
+    warning) and None is returned.
+    """
+    if not cfg.downscale_images:
+        return None
+    if Image is None:
+        message = ('Pillow is not installed (pip install Pillow); images '
+                   'are embedded without downscaling')
+        if message not in _LOGGED_WARNINGS:
+            _LOGGED_WARNINGS.add(message)
+            logger.warning(message)
+        return None
+    return fit_image(filename, cfg.image_size)
+
+
+def _legacy_decode(exc):
+    """Codec error handler decoding invalid UTF-8 bytes as Windows-1252.
+
+    Older CSV files in the repository were exported from spreadsheets
+    using the Windows-1252 encoding.  Bytes undefined in Windows-1252
+    are decoded as Latin-1.
+    """
+    if not isinstance(exc, UnicodeDecodeError):
+        raise exc
+    chars = []
+    for byte in exc.object[exc.start:exc.end]:
+        try:
+            chars.append(bytes((byte,)).decode('cp1252'))
+        except UnicodeDecodeError:
+            chars.append(chr(byte))
+    return ''.join(chars), exc.end
+
+
+codecs.register_error('gd_legacy', _legacy_decode)
+
+
+def open_csv_text(binary_file):
+    """Wrap a binary CSV file in a text file with encoding detection.
+
+    UTF-16 and UTF-8 byte order marks are honoured.  Otherwise the file
+    is decoded as UTF-8 with any invalid bytes decoded as Windows-1252,
+    so the encoding is detected without reading the whole file.
+
+    Args:
+        binary_file: (io.BufferedReader) CSV file opened in binary mode.
+
+    Returns:
+        An io.TextIOWrapper suitable for csv.reader().
+    """
+    head = binary_file.peek(4)[:4] if hasattr(binary_file, 'peek') else b''
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        encoding = 'utf-16'
+    elif head.startswith(codecs.BOM_UTF8):
+        encoding = 'utf-8-sig'
+    else:
+        encoding = 'utf-8'
+    return io.TextIOWrapper(binary_file, encoding=encoding,
+                            errors='gd_legacy', newline='')
+
+
+def sniff_delimiter(sample):
+    """Returns the field delimiter (',', ';' or tab) used in 'sample'."""
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=',;\t').delimiter
+    except csv.Error:
+        return ','
+
+
+def iter_records(lines, delimiter=','):
+    """Parse CSV lines lazily, stopping at the 'EOF' line.
+
+    Quoted fields (e.g., '"SDA, SCL"') are handled with the csv module.
+
+    Args:
+        lines: (iterable) CSV lines (e.g., a text file object).
+        delimiter: (str Default=',') Field delimiter.
+
+    Yields:
+        Records, each a list of field strings.  Empty lines yield [''].
+    """
+    for record in csv.reader(lines, delimiter=delimiter):
+        if not record:
+            record = ['']
+        if record_marker(record) == 'EOF':
+            return
+        yield record
+
+
+def sniff_records(lines):
+    """Parse CSV lines lazily with their sniffed delimiter.
+
+    The lines are read ahead until 4096 characters are buffered to
+    sniff the delimiter (see sniff_delimiter()); the rest is parsed as
+    it is consumed.
+
+    Args:
+        lines: (iterable) CSV lines (e.g., a text file object).
+
+    Returns:
+        An iterator of records (see iter_records()).
+    """
+    lines = iter(lines)
+    head = []
+    size = 0
+    for line in lines:
+        head.append(line)
+        size += len(line)
+        if size >= 4096:
+            break
+    return iter_records(itertools.chain(head, lines),
+                        sniff_delimiter(''.join(head)[:4096]))
+
+
+def _stream_records(binary_file, close=True):
+    """Yield the records of a binary CSV file (closing it at the end)."""
+    try:
+        for record in sniff_records(open_csv_text(binary_file)):
+            yield record
+    finally:
+        if close:
+            binary_file.close()
+
+
 def read_csv(infile):
     """Gets data from a CSV file for processing into an SVG file.
 
     If 'infile' is None the user is prompted to enter the root of a CSV
-    filename.
+    filename.  If 'infile' is '-' the CSV data is read from the standard
+    input (and 'stdin' is used as the filename root).
+
+    The records are parsed lazily as they are consumed, so only one
+    line of the file is held in memory at a time.
 
     Args:
         infile: (str) CSV filename to read
+
+    Returns:
+        A (filename_root, records) tuple where 'records' is an iterator
+        of field lists (see iter_records()).
     """
+    if infile == '-':
+        logger.info('Reading CSV data from the standard input')
+        return 'stdin', _stream_records(stdin.buffer, close=False)
+
     if infile is None:
         print('Make sure the python script is in the same folder as the file.')
         filename_root = input(
@@ -357,148 +1379,3613 @@ def read_csv(infile):
         csv_filename = infile
 
     if os.access(csv_filename, os.R_OK):
-        with open(csv_filename, 'r') as csv_file:
-            print('"{}" opened'.format(csv_filename))
-            lines = csv_file.read().splitlines()
-            return filename_root, lines
+        csv_file = open(csv_filename, 'rb')
+        logger.info('"{}" opened'.format(csv_filename))
+        return filename_root, _stream_records(csv_file)
     else:
-        print('CSV data file not found. Please try again. '
-              'See README.md for details.')
+        logger.error('CSV data file not found. Please try again. '
+                     'See README.md for details.')
         sys_exit(0)
 
 
-def embed_style(dwg, filename_root, cfg=GDConfig()):
-    """Embed any necessary google fonts and stylesheets.
+class Diagnostic(object):
+    """A problem found in a CSV file by validate_csv().
 
-    Args:
-        dwg: (svg.drawing.Drawing) A svgwrite Drawing instance to amend.
-        filename_root: (str) root of the CSV file to embed.
-        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
-            configuration to use.
+    Attributes:
+        severity: (str) Diagnostic.ERROR (the datasheet will be wrong)
+            or Diagnostic.WARNING (it may look odd).
+        filename: (str) CSV filename.
+        line: (int) Line number (1 for the header) or None if the
+            diagnostic applies to the whole file.
+        column: (int) Column number (1 for the first field) or None if
+            the diagnostic applies to the whole line.
+        message: (str) Description of the problem.
     """
-    embed_fonts = []
-    if cfg.font in cfg.default_google_fonts:
-        embed_fonts.append(cfg.font)
-    if cfg.google_font is not None:
-        embed_fonts.append(cfg.google_font)
 
-    for embed_font in embed_fonts:
-        print('Embedding Google Font: "{:s}"'.format(embed_font))
-        try:
-            dwg.embed_google_web_font(
-                embed_font,
-                ('https://fonts.googleapis.com/css?family='
-                 + embed_font.replace(' ', '+')))
-        except (HTTPError, URLError) as exc:
-            print('\t' + str(type(exc)), exc)
-            print('\tSorry, unable to embed "{:s}"'.format(embed_font))
+    ERROR, WARNING = 'error', 'warning'
 
-    style_filename = filename_root + '.css'
-    if cfg.link_stylesheet:
-        print('Linking "{}" stylesheet'.format('default.css'))
-        dwg.add_stylesheet('default.css', 'Default SVG Theme')
-        print('Linking "{}" stylesheet'.format(style_filename))
-        dwg.add_stylesheet(style_filename,
-                           '{} Theme'.format(filename_root))
-    else:
-        if os.access('default.css', os.R_OK):
-            print('Embedding "{}" stylesheet'.format('default.css'))
-            with open('default.css', 'r') as css_file:
-                dwg.embed_stylesheet(css_file.read())
-        if os.access(style_filename, os.R_OK):
-            print('Embedding "{}" stylesheet'.format(style_filename))
-            with open(style_filename, 'r') as css_file:
-                dwg.embed_stylesheet(css_file.read())
+    def __init__(self, severity, filename, line, column, message):
+        self.severity = severity
+        self.filename = filename
+        self.line = line
+        self.column = column
+        self.message = message
 
+    def __repr__(self):
+        return 'Diagnostic({!r}, {!r}, {!r}, {!r}, {!r})'.format(
+            self.severity, self.filename, self.line, self.column,
+            self.message)
+
+    def __str__(self):
+        """Returns a 'filename[:line[:column]]: severity: message' str."""
+        location = self.filename
+        if self.line is not None:
+            location += ':{}'.format(self.line)
+            if self.column is not None:
+                location += ':{}'.format(self.column)
+        return '{}: {}: {}'.format(location, self.severity, self.message)
+
+
+def _misspelled_marker(field):
+    """Returns the section keyword 'field' is probably a misspelling of.
+
+    Case and whitespace variants (e.g., 'right', 'Text ') are always
+    reported.  Longer fields are also compared loosely (e.g., 'Rigth',
+    'Extra'), but short pin names such as 'TP' are not.
+    """
+    keywords = SECTION_KEYWORDS + ('EOF',)
+    folded = field.strip().lower()
+    for keyword in keywords:
+        if folded == keyword.lower():
+            return keyword
+    if len(folded) < 4:
+        return None
+    matches = difflib.get_close_matches(
+        folded, [keyword.lower() for keyword in keywords], 1, 0.8)
+    if not matches:
+        return None
+    return keywords[[keyword.lower() for keyword in keywords].index(
+        matches[0])]
 
-def process_csv_data(dwg, lines, cfg=GDConfig()):
-    """Parse data and call add_field(), add_text(), and add_images().
+
+def validate_lines(lines, filename='stdin', delimiter=',', cfg=GDConfig()):
+    """Check CSV lines in a single streaming pass.
+
+    The following problems are reported:
+        * errors: no data, fields beyond the header columns and
+          misspelled section keywords (the line would be rendered as a
+          tag).
+        * warnings: lines with fewer fields (or extra empty fields)
+          than the header, more columns than 'cfg.tag_colors' (the last
+          color is repeated), stray columns only holding '1' (each '1'
+          is rendered as a tag) and missing 'Extras' images (left out,
+          as when rendering).
 
     Args:
-        dwg: (svg.drawing.Drawing) A svgwrite Drawing instance to amend.
-        lines: (list) CSV file lines in a list of strings.
+        lines: (iterable) CSV lines (e.g., a text file object).
+        filename: (str Default='stdin') Filename used in the
+            diagnostics.
+        delimiter: (str Default=',') Field delimiter.
         cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
             configuration to use.
+
+    Yields:
+        Diagnostic objects, in line order (the stray column warnings
+        come last).
     """
-    cursor = cfg.tag_size[1] + cfg.tag_margins[1]
+    reader = csv.reader(lines, delimiter=delimiter)
+    header = next(reader, None)
+    if header is None:
+        yield Diagnostic(Diagnostic.ERROR, filename, 1, None, 'No CSV data')
+        return
+    column_count = len(header)
+    if column_count > len(cfg.tag_colors):
+        yield Diagnostic(
+            Diagnostic.WARNING, filename, 1, len(cfg.tag_colors) + 1,
+            '{} columns but only {} tag colors (the last color is '
+            'repeated)'.format(column_count, len(cfg.tag_colors)))
+
+    # Columns holding nothing but '1' (and the lines they occur on).
+    ones = {i: 1 for i, field in enumerate(header) if i and field == '1'}
+    not_ones = {i for i, field in enumerate(header) if field not in ('', '1')}
     mode = None
+    end = reader.line_num
+    for record in reader:
+        line, end = end + 1, reader.line_num
+        if not record:
+            continue
+        marker = record_marker(record)
+        if marker == 'EOF':
+            break
+        if marker is not None:
+            mode = marker
+            continue
+        if record[0] and not ''.join(record[1:]).rstrip('1'):
+            keyword = _misspelled_marker(record[0])
+            if keyword is not None:
+                yield Diagnostic(
+                    Diagnostic.ERROR, filename, line, 1,
+                    'Unknown section keyword {!r} (did you mean {!r}?); the '
+                    'line is not a section heading'.format(record[0],
+                                                           keyword))
 
-    records = [line.split(',') for line in lines]
-    ribbon_width = (len(records[0]) + 1) * (cfg.tag_size[0]
-                                            + cfg.tag_margins[0])
-    images_width = 0
+        if len(record) > column_count and any(record[column_count:]):
+            yield Diagnostic(
+                Diagnostic.ERROR, filename, line, column_count + 1,
+                '{} fields but the header has {} columns'.format(
+                    len(record), column_count))
+        elif len(record) != column_count:
+            yield Diagnostic(
+                Diagnostic.WARNING, filename, line, None,
+                '{} fields but the header has {} columns'.format(
+                    len(record), column_count))
 
-    if len(records[0]) > len(cfg.tag_colors):
-        diff = len(records[0]) - len(cfg.tag_colors)
-        cfg.tag_colors = [*cfg.tag_colors + [cfg.tag_colors[-1]] * diff]
+        for i, field in enumerate(record):
+            if not field:
+                continue
+            if field == '1' and i in ones and i not in not_ones:
+                ones[i] += 1
+            elif mode == 'Extras':
+                if not os.access(image_filename(field), os.R_OK):
+                    yield Diagnostic(
+                        Diagnostic.WARNING, filename, line, i + 1,
+                        'Image {!r} not found'.format(image_filename(field)))
+            elif mode != 'Text':
+                if field == '1' and i:
+                    ones[i] = ones.get(i, 0) + 1
+                else:
+                    not_ones.add(i)
 
-    for record in records:
-        # Some repository CSV files have a '1' in the last column.  This
-        # '1' is ignored for determining mode.
-        if record[0] in ('Left', 'Right', 'Top', 'Text', 'Extras') and (
-                record[0] == ''.join(record).rstrip('1')):
-            mode = record[0]
-            cursor += 15
-            continue
+    for i in sorted(set(ones) - not_ones):
+        yield Diagnostic(
+            Diagnostic.WARNING, filename, 1, i + 1,
+            "Column {} only holds '1' values ({} of them); is it a stray "
+            "spreadsheet column?".format(i + 1, ones[i]))
 
-        if record[0] == 'EOF' and record[0] == ''.join(record).rstrip('1'):
-            break
 
-        if mode == 'Text':
-            cursor += cfg.tag_size[1] + cfg.tag_margins[1]
+def validate_csv(csv_filename, cfg=GDConfig()):
+    """Check a CSV file before it is rendered (see validate_lines()).
 
-        y_add = 0
-        label_index = 0
-        image_index = 0
+    Args:
+        csv_filename: (str) CSV filename, or '-' for the standard input.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+
+    Returns:
+        A list of Diagnostic objects.
+    """
+    if csv_filename == '-':
+        binary_file = stdin.buffer
+    else:
+        try:
+            binary_file = open(csv_filename, 'rb')
+        except OSError as exc:
+            return [Diagnostic(Diagnostic.ERROR, csv_filename, None, None,
+                               'Cannot read the file: {}'.format(
+                                   exc.strerror))]
+    try:
+        sample = binary_file.peek(4096)[:4096] if hasattr(
+            binary_file, 'peek') else b''
+        delimiter = sniff_delimiter(sample.decode('utf-8', 'gd_legacy'))
+        return list(validate_lines(
+            open_csv_text(binary_file), csv_filename, delimiter, cfg))
+    except csv.Error as exc:
+        return [Diagnostic(Diagnostic.ERROR, csv_filename, None, None,
+                           'Malformed CSV: {}'.format(exc))]
+    finally:
+        if binary_file is not stdin.buffer:
+            binary_file.close()
+
+
+def log_diagnostics(diagnostics):
+    """Log diagnostics and returns the number of errors."""
+    errors = 0
+    for diagnostic in diagnostics:
+        if diagnostic.severity == Diagnostic.ERROR:
+            logger.error(str(diagnostic))
+            errors += 1
+        else:
+            logger.warning(str(diagnostic))
+    return errors
+
+
+class FontCache(object):
+    """On-disk cache of downloaded font files.
+
+    Each font is stored under a key derived from its family name and the
+    CSS URL it is requested with: '<key>.font' holds the font data and
+    '<key>.json' holds its mimetype and bookkeeping information.  Fonts
+    seeded from local files are pinned, so they never expire, which
+    allows fully offline builds.
+
+    Attributes:
+        directory: (str) Directory holding the cached fonts.
+        ttl: (int) Seconds before an unpinned font expires (None for
+            never).
+        max_bytes: (int) Maximum size of the cached font data (None for
+            no limit).
+        clock: (callable) Returns the current time in seconds (e.g.,
+            time.time).  It dates the fetched and last used fonts.
+    """
+
+    def __init__(self, directory=DEFAULT_FONT_CACHE, ttl=None, max_bytes=None,
+                 clock=time.time):
+        """Initializes a FontCache object."""
+        self.directory = os.path.expanduser(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+
+    @classmethod
+    def from_config(cls, cfg):
+        """Returns the FontCache for 'cfg' (None if caching is disabled)."""
+        if cfg.font_cache is None:
+            return None
+        return cls(cfg.font_cache, cfg.font_cache_ttl, cfg.font_cache_size)
+
+    @staticmethod
+    def key(name, uri):
+        """Returns the cache key of the font 'name' requested from 'uri'."""
+        return hashlib.sha256(
+            '{}\n{}'.format(name, uri).encode('utf-8')).hexdigest()
+
+    def _paths(self, key):
+        """Returns the (data, metadata) filenames of 'key'."""
+        root = os.path.join(self.directory, key)
+        return root + '.font', root + '.json'
+
+    def _read_meta(self, key):
+        """Returns the metadata dict of 'key' (None if not cached)."""
+        data_path, meta_path = self._paths(key)
+        if not os.access(data_path, os.R_OK):
+            return None
+        try:
+            with open(meta_path, 'r') as meta_file:
+                return json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+
+    def _expired(self, meta):
+        """Returns True if the font described by 'meta' has expired."""
+        return (not meta.get('pinned') and self.ttl is not None
+                and self.clock() - meta.get('fetched', 0) > self.ttl)
+
+    def get(self, name, uri, ignore_ttl=False):
+        """Look up a cached font.
+
+        Args:
+            name: (str) Font family name.
+            uri: (str) URL of the font CSS.
+            ignore_ttl: (bool Default=False) Return expired fonts (e.g.,
+                when the network is unavailable).
+
+        Returns:
+            A (data, mimetype) tuple, or None if the font is not cached
+            (or has expired).
+        """
+        key = self.key(name, uri)
+        meta = self._read_meta(key)
+        if meta is None or (not ignore_ttl and self._expired(meta)):
+            return None
+
+        data_path = self._paths(key)[0]
+        try:
+            with open(data_path, 'rb') as data_file:
+                data = data_file.read()
+            now = self.clock()
+            os.utime(data_path, (now, now))
+        except OSError:
+            return None
+        return data, meta['mimetype']
+
+    def put(self, name, uri, data, mimetype, pinned=False):
+        """Store a font in the cache and evict fonts over the size limit.
+
+        Args:
+            name: (str) Font family name.
+            uri: (str) URL of the font CSS.
+            data: (bytes) Font file contents.
+            mimetype: (str) Font mimetype (e.g., 'application/x-font-ttf').
+            pinned: (bool Default=False) Never expire the font.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        key = self.key(name, uri)
+        data_path, meta_path = self._paths(key)
+        now = self.clock()
+        meta = {'name': name, 'uri': uri, 'mimetype': mimetype,
+                'fetched': now, 'pinned': pinned}
+        for path, mode, content in ((data_path, 'wb', data),
+                                    (meta_path, 'w', json.dumps(meta))):
+            tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+            with open(tmp_path, mode) as cache_file:
+                cache_file.write(content)
+            os.utime(tmp_path, (now, now))
+            os.replace(tmp_path, path)
+        self.evict()
+
+    def seed(self, name, filename):
+        """Pin a local font file as the cached copy of a Google font.
+
+        Args:
+            name: (str) Google font family name (e.g., 'Varta').
+            filename: (str) Local font file (.ttf, .otf, .woff, ...).
+        """
+        with open(filename, 'rb') as font_file:
+            data = font_file.read()
+        self.put(name, google_font_uri(name), data, font_mimetype(filename),
+                 pinned=True)
+
+    def evict(self):
+        """Remove expired fonts and the least recently used fonts."""
+        if not os.path.isdir(self.directory):
+            return
+
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.font'):
+                continue
+            key = filename[:-5]
+            meta = self._read_meta(key)
+            data_path = self._paths(key)[0]
+            try:
+                st = os.stat(data_path)
+            except OSError:
+                continue
+            if meta is not None and self._expired(meta):
+                self.remove(key)
+            else:
+                entries.append((st.st_mtime, st.st_size, key, meta))
+
+        if self.max_bytes is None:
+            return
+        total = sum(entry[1] for entry in entries)
+        for _, size, key, meta in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if meta is not None and meta.get('pinned'):
+                continue
+            self.remove(key)
+            total -= size
+
+    def remove(self, key):
+        """Remove the cached font 'key'."""
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def subset_font(data, chars, mimetype='application/x-font-ttf'):
+    """Returns a font reduced to the glyphs of some characters.
+
+    Args:
+        data: (bytes) TrueType, OpenType or WOFF font file.
+        chars: (str) Characters to keep.
+        mimetype: (str Default='application/x-font-ttf') Mimetype of
+            'data'.  WOFF fonts are subset to WOFF fonts, other fonts to
+            plain TrueType/OpenType fonts.
+
+    Returns:
+        The bytes of the font subset.
+
+    Raises:
+        ImportError: fontTools is not installed.
+    """
+    if font_subset is None:
+        raise ImportError('Font subsetting requires fontTools '
+                          '(pip install fonttools)')
+    options = font_subset.Options()
+    options.flavor = 'woff' if 'woff' in mimetype else None
+    font = font_subset.load_font(io.BytesIO(data), options)
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(text=chars)
+    subsetter.subset(font)
+    subset_file = io.BytesIO()
+    font_subset.save_font(font, subset_file, options)
+    return subset_file.getvalue()
+
+
+class FontSubsets(object):
+    """Font subsets keyed by font and character set.
+
+    Sheets using the same characters share one subset, and subsets are
+    also stored in the font cache (if any) so that other worker
+    processes and later runs reuse them.
+
+    Attributes:
+        subsets: (dict) (data, mimetype) tuples keyed by (font SHA-256
+            hex digest, sorted characters).
+    """
+
+    def __init__(self):
+        """Initializes an empty FontSubsets object."""
+        self.subsets = {}
+
+    def get(self, name, data, mimetype, chars, cache=None):
+        """Returns the subset of a font for some characters.
+
+        Args:
+            name: (str) Font family name.
+            data: (bytes) Font file contents.
+            mimetype: (str) Font mimetype.
+            chars: (str/set) Characters used on the sheet.
+            cache: (FontCache Default=None) Font cache to consult and
+                store the subset in.
+
+        Returns:
+            A (data, mimetype) tuple.
+        """
+        chars = ''.join(sorted(set(chars)))
+        digest = hashlib.sha256(data).hexdigest()
+        key = (digest, chars)
+        if key not in self.subsets:
+            uri = 'subset:{}:{}'.format(digest, hashlib.sha256(
+                chars.encode('utf-8')).hexdigest())
+            subset = None if cache is None else cache.get(name, uri)
+            if subset is None:
+                subset = subset_font(data, chars, mimetype), mimetype
+                if cache is not None:
+                    cache.put(name, uri, *subset)
+            self.subsets[key] = subset
+        return self.subsets[key]
+
+
+class StylePayload(object):
+    """Fonts and stylesheets fetched once and embedded in many SVGs.
+
+    Attributes:
+        fonts: (list) (name, data, mimetype) tuples of downloaded Google
+            fonts.
+        stylesheets: (dict) Stylesheet contents keyed by filename.
+        images: (ImageCache) Data URIs of embedded images (see GDConfig
+            'embed_images').
+        subsets: (FontSubsets) Subsets of the fonts (see GDConfig
+            'subset_fonts').
+        max_stylesheets: (int) Most stylesheets kept by
+            read_stylesheet(); the least recently used are dropped
+            first (the fetched 'default.css' is always kept).
+    """
+
+    max_stylesheets = 64
+
+    def __init__(self, fonts=None, stylesheets=None, images=None,
+                 subsets=None):
+        """Initializes a StylePayload object."""
+        self.fonts = [] if fonts is None else list(fonts)
+        self.stylesheets = {} if stylesheets is None else dict(stylesheets)
+        self.images = ImageCache() if images is None else images
+        self.subsets = FontSubsets() if subsets is None else subsets
+        self._read_order = collections.OrderedDict()
+
+    def read_stylesheet(self, filename):
+        """Returns the contents of a stylesheet, reading it only once.
+
+        Args:
+            filename: (str) CSS filename.
+
+        Returns:
+            A str, or None if the stylesheet cannot be read.
+        """
+        # Single dict operations only: render server threads share the
+        # payload.
+        if self._read_order.pop(filename, False):
+            self._read_order[filename] = True
+        try:
+            return self.stylesheets[filename]
+        except KeyError:
+            pass
+        content = None
+        if os.access(filename, os.R_OK):
+            with open(filename, 'r') as css_file:
+                content = css_file.read()
+        self.stylesheets[filename] = content
+        self._read_order[filename] = True
+        while len(self._read_order) > self.max_stylesheets:
+            try:
+                oldest, _ = self._read_order.popitem(last=False)
+            except KeyError:
+                break
+            self.stylesheets.pop(oldest, None)
+        return content
+
+
+def google_font_uri(name):
+    """Returns the CSS URL of the Google font 'name'."""
+    return ('https://fonts.googleapis.com/css?family='
+            + name.replace(' ', '+'))
+
+
+def fetch_google_font(name, cache=None, profiler=None, offline=False,
+                      timeout=None):
+    """Get a Google font from the font cache or download it.
+
+    Args:
+        name: (str) Name of the Google font (e.g., 'Roboto Condensed').
+        cache: (FontCache Default=None) Font cache to consult before
+            downloading the font (and to store a downloaded font in).
+        profiler: (Profiler Default=None) Profiler counting cache hits,
+            downloads and the time spent waiting for the network.
+        offline: (bool Default=False) Never download the font: the
+            cached copy is used even if it expired.
+        timeout: (int/float Default=None) Timeout in seconds of each
+            network operation.  If None, the default socket timeout is
+            used.
+
+    Returns:
+        A (data, mimetype) tuple with the bytes of the font file.
+
+    Raises:
+        HTTPError, URLError, socket.timeout: The font could not be
+            downloaded (and no cached copy exists), or it is not cached
+            and 'offline' is set.
+        ValueError: The font CSS did not reference a font file.
+    """
+    uri = google_font_uri(name)
+    if cache is not None:
+        cached = cache.get(name, uri, offline)
+        if cached is not None:
+            if profiler is not None:
+                profiler.count('font_cache_hits')
+            return cached
+    if offline:
+        raise URLError('"{}" is not in the font cache'.format(name))
+
+    options = {} if timeout is None else {'timeout': timeout}
+    start = time.perf_counter()
+    try:
+        font_info = urlopen(uri, **options).read()
+        font_url = find_first_url(font_info.decode())
+        if font_url is None:
+            raise ValueError("Got no font data from uri: '{}'".format(uri))
+        data = urlopen(font_url, **options).read()
+        mimetype = font_mimetype(font_url)
+    except (HTTPError, URLError, socket.timeout):
+        if profiler is not None:
+            profiler.count('network_seconds', time.perf_counter() - start)
+        stale = None if cache is None else cache.get(name, uri, True)
+        if stale is None:
+            raise
+        logger.warning('\tUsing expired cached copy of "{:s}"'.format(name))
+        return stale
+
+    if profiler is not None:
+        profiler.count('network_seconds', time.perf_counter() - start)
+        profiler.count('font_downloads')
+    if cache is not None:
+        cache.put(name, uri, data, mimetype)
+    return data, mimetype
+
+
+def _fetch_font_job(name, cache, cfg):
+    """Thread entry point of StyleFetch fetching one Google font.
+
+    Returns:
+        A (data, mimetype, profile) tuple, 'profile' being the report()
+        of the font's own Profiler (None if 'cfg.profiler' is None).
+    """
+    profiler = None if cfg.profiler is None else Profiler()
+    data, mimetype = fetch_google_font(name, cache, profiler,
+                                       cfg.deterministic, cfg.font_timeout)
+    return data, mimetype, None if profiler is None else profiler.report()
+
+
+def _read_default_css():
+    """Returns the content of 'default.css', or None if it is missing."""
+    if not os.access('default.css', os.R_OK):
+        return None
+    with open('default.css', 'r') as css_file:
+        return css_file.read()
+
+
+class StyleFetch(object):
+    """The Google fonts and 'default.css' being fetched in the background.
+
+    Every font is fetched (from the font cache or the network) in its
+    own thread as soon as the StyleFetch is created, so the downloads
+    run concurrently with each other and with the CSV layout.  result()
+    joins them when the SVG is about to be serialized, waiting at most
+    until 'cfg.font_timeout' seconds after the fetch started.
+        e.g., `style = StyleFetch(cfg)`
+              `layout = layout_csv_data(records, cfg)`
+              `render_svgs(layout, root, root, cfg, style.result())`
+
+    Attributes:
+        cfg: (GDConfig) Graphical Datasheet configuration used.
+        deadline: (float) time.monotonic() after which fonts that are
+            still downloading are given up (None for no limit).
+    """
+
+    def __init__(self, cfg=GDConfig()):
+        """Starts fetching the fonts and stylesheet.
+
+        Args:
+            cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+                configuration to use.
+        """
+        self.cfg = cfg
+        self.deadline = (None if cfg.font_timeout is None
+                         else time.monotonic() + cfg.font_timeout)
+        self._payload = None
+
+        embed_fonts = []
+        if cfg.font in cfg.default_google_fonts:
+            embed_fonts.append(cfg.font)
+        if cfg.google_font is not None:
+            embed_fonts.append(cfg.google_font)
+
+        cache = FontCache.from_config(cfg)
+        executor = ThreadPoolExecutor(max_workers=len(embed_fonts) + 1)
+        self._fonts = []
+        for embed_font in embed_fonts:
+            logger.info('Embedding Google Font: "{:s}"'.format(embed_font))
+            self._fonts.append((embed_font, executor.submit(
+                _fetch_font_job, embed_font, cache, cfg)))
+        self._stylesheet = (None if cfg.link_stylesheet
+                            else executor.submit(_read_default_css))
+        # The threads finish on their own; result() never waits for a
+        # font past the deadline.
+        executor.shutdown(wait=False)
+
+    def _remaining(self):
+        """Returns the seconds left before the deadline (None: no limit)."""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0)
+
+    def result(self):
+        """Wait for the fetches and returns the StylePayload.
+
+        Fonts that could not be fetched, or not before the deadline, are
+        reported and left out.  The payload is only built once.
+        """
+        if self._payload is not None:
+            return self._payload
+
+        payload = StylePayload()
+        for embed_font, future in self._fonts:
+            try:
+                data, mimetype, profile = future.result(self._remaining())
+            except FutureTimeoutError:
+                logger.warning('\tTimed out after {}s'.format(
+                    self.cfg.font_timeout))
+                logger.warning('\tSorry, unable to embed "{:s}"'.format(
+                    embed_font))
+            except (HTTPError, URLError, socket.timeout) as exc:
+                logger.warning('\t%s %s', type(exc), exc)
+                logger.warning('\tSorry, unable to embed "{:s}"'.format(
+                    embed_font))
+            else:
+                payload.fonts.append((embed_font, data, mimetype))
+                if profile is not None:
+                    self.cfg.profiler.merge(profile)
+
+        if self._stylesheet is not None:
+            content = self._stylesheet.result()
+            if content is not None:
+                payload.stylesheets['default.css'] = content
+
+        self._payload = payload
+        return payload
+
+
+def fetch_style(cfg=GDConfig()):
+    """Fetch the Google fonts and 'default.css' used by every SVG.
+
+    The fonts are fetched concurrently (see StyleFetch).
+
+    Args:
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+
+    Returns:
+        A StylePayload that can be shared by any number of embed_style()
+        calls.
+    """
+    return StyleFetch(cfg).result()
+
+
+def embed_style(dwg, filename_root, cfg=GDConfig(), payload=None,
+                theme=None, chars=None):
+    """Embed any necessary google fonts and stylesheets.
+
+    Args:
+        dwg: (svg.drawing.Drawing) A svgwrite Drawing instance to amend.
+        filename_root: (str) root of the CSV file to embed.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+        payload: (StylePayload Default=None) Previously fetched fonts
+            and stylesheets.  If None, they are fetched by calling
+            fetch_style().
+        theme: (Theme Default=None) Theme whose colors (see
+            tag_color_stylesheet()) and stylesheet are embedded after
+            the other stylesheets.
+        chars: (str/set Default=None) Characters used on the sheet (see
+            Layout.chars()).  If set and 'cfg.subset_fonts' is set, the
+            fonts are reduced to these characters.
+    """
+    if payload is None:
+        payload = fetch_style(cfg)
+
+    cache = None
+    if chars is not None and cfg.subset_fonts:
+        cache = FontCache.from_config(cfg)
+    for name, data, mimetype in payload.fonts:
+        if chars is not None and cfg.subset_fonts:
+            size = len(data)
+            data, mimetype = payload.subsets.get(name, data, mimetype,
+                                                 chars, cache)
+            logger.info('Subsetting "{}" to {} characters ({:,d} of '
+                        '{:,d} bytes)'.format(name, len(set(chars)),
+                                              len(data), size))
+        dwg.embed_stylesheet(FONT_TEMPLATE.format(
+            name=name, data=base64_data(data, mimetype)))
+
+    if cfg.style_mode == 'class':
+        dwg.embed_stylesheet(class_stylesheet(cfg))
+        if not cfg.link_stylesheet:
+            dwg.embed_stylesheet(tag_color_stylesheet(cfg.tag_colors))
+
+    style_filename = filename_root + '.css'
+    theme_filename = None if theme is None else theme.stylesheet
+    color_rules = theme is not None and theme.tag_colors is not None
+    if cfg.link_stylesheet:
+        logger.info('Linking "{}" stylesheet'.format('default.css'))
+        dwg.add_stylesheet('default.css', 'Default SVG Theme')
+        logger.info('Linking "{}" stylesheet'.format(style_filename))
+        dwg.add_stylesheet(style_filename,
+                           '{} Theme'.format(filename_root))
+        if theme_filename is not None:
+            logger.info('Linking "{}" stylesheet'.format(theme_filename))
+            dwg.add_stylesheet(theme_filename,
+                               '{} Theme'.format(theme.name))
+        # Embedded rules follow the linked stylesheets, so the colors
+        # of the 'class' style mode that 'default.css' already sets are
+        # left out.
+        if color_rules:
+            dwg.embed_stylesheet(tag_color_stylesheet(cfg.tag_colors))
+        elif cfg.style_mode == 'class':
+            dwg.embed_stylesheet(tag_color_stylesheet(
+                cfg.tag_colors, cfg.get_colors(None)))
+    else:
+        if 'default.css' in payload.stylesheets:
+            logger.info('Embedding "{}" stylesheet'.format('default.css'))
+            dwg.embed_stylesheet(payload.stylesheets['default.css'])
+        content = payload.read_stylesheet(style_filename)
+        if content is not None:
+            logger.info('Embedding "{}" stylesheet'.format(style_filename))
+            dwg.embed_stylesheet(content)
+        if color_rules:
+            dwg.embed_stylesheet(tag_color_stylesheet(cfg.tag_colors))
+        content = (None if theme_filename is None
+                   else payload.read_stylesheet(theme_filename))
+        if content is not None:
+            logger.info('Embedding "{}" stylesheet'.format(theme_filename))
+            dwg.embed_stylesheet(content)
+
+
+class FontMetrics(object):
+    """Horizontal advance widths read from a TrueType/OpenType font.
+
+    Only the 'head', 'hhea', 'hmtx' and 'cmap' tables are parsed (WOFF
+    files are decompressed first; WOFF2 is not supported).  Kerning is
+    ignored, which slightly overestimates most text widths.
+
+    Attributes:
+        units_per_em: (int) Font design units per em.
+        advances: (list) Advance width of each glyph in font units.
+    """
+
+    def __init__(self, data):
+        """Parses the font file contents 'data'.
+
+        Raises:
+            ValueError: The font format is not supported or the font is
+                missing a required table.
+        """
+        try:
+            tables = self._tables(data)
+            self.units_per_em = struct.unpack_from('>H', tables[b'head'],
+                                                   18)[0]
+            metric_count = struct.unpack_from('>H', tables[b'hhea'], 34)[0]
+            self.advances = [
+                struct.unpack_from('>H', tables[b'hmtx'], 4 * i)[0]
+                for i in range(metric_count)]
+            self._glyph = self._cmap(tables[b'cmap'])
+        except (KeyError, IndexError, struct.error, zlib.error) as exc:
+            raise ValueError('Unsupported font data ({})'.format(exc))
+        self._widths = {}
+
+    @staticmethod
+    def _tables(data):
+        """Returns the font tables keyed by tag."""
+        tables = {}
+        if data[:4] == b'wOFF':
+            count = struct.unpack_from('>H', data, 12)[0]
+            for i in range(count):
+                tag, offset, length, orig_length = struct.unpack_from(
+                    '>4sIII', data, 44 + 20 * i)
+                table = data[offset:offset + length]
+                tables[tag] = (table if length == orig_length
+                               else zlib.decompress(table))
+        elif data[:4] in (b'\x00\x01\x00\x00', b'OTTO', b'true'):
+            count = struct.unpack_from('>H', data, 4)[0]
+            for i in range(count):
+                tag, _, offset, length = struct.unpack_from(
+                    '>4sIII', data, 12 + 16 * i)
+                tables[tag] = data[offset:offset + length]
+        else:
+            raise ValueError('Unsupported font format')
+        return tables
+
+    @staticmethod
+    def _cmap(cmap):
+        """Returns a function mapping a code point to a glyph index."""
+        subtables = {}
+        for i in range(struct.unpack_from('>H', cmap, 2)[0]):
+            platform, encoding, offset = struct.unpack_from(
+                '>HHI', cmap, 4 + 8 * i)
+            subtables[(platform, encoding)] = offset
+
+        for key in ((3, 10), (0, 4), (0, 6)):
+            if key in subtables:
+                offset = subtables[key]
+                if struct.unpack_from('>H', cmap, offset)[0] == 12:
+                    count = struct.unpack_from('>I', cmap, offset + 12)[0]
+                    groups = [struct.unpack_from('>III', cmap,
+                                                 offset + 16 + 12 * i)
+                              for i in range(count)]
+                    starts = [group[0] for group in groups]
+
+                    def glyph12(code):
+                        i = bisect.bisect_right(starts, code) - 1
+                        if i >= 0 and code <= groups[i][1]:
+                            return groups[i][2] + code - groups[i][0]
+                        return 0
+                    return glyph12
+
+        for key in ((3, 1), (0, 3), (0, 2), (0, 1), (0, 0)):
+            if key in subtables:
+                offset = subtables[key]
+                if struct.unpack_from('>H', cmap, offset)[0] == 4:
+                    break
+        else:
+            raise ValueError('No supported cmap subtable')
+        count = struct.unpack_from('>H', cmap, offset + 6)[0] // 2
+        ends_at = offset + 14
+        starts_at = ends_at + 2 * count + 2
+        deltas_at = starts_at + 2 * count
+        range_offsets_at = deltas_at + 2 * count
+        ends = struct.unpack_from('>{}H'.format(count), cmap, ends_at)
+        starts = struct.unpack_from('>{}H'.format(count), cmap, starts_at)
+        deltas = struct.unpack_from('>{}H'.format(count), cmap, deltas_at)
+        range_offsets = struct.unpack_from('>{}H'.format(count), cmap,
+                                           range_offsets_at)
+
+        def glyph4(code):
+            i = bisect.bisect_left(ends, code)
+            if i == count or code < starts[i]:
+                return 0
+            if range_offsets[i] == 0:
+                return (code + deltas[i]) & 0xFFFF
+            glyph = struct.unpack_from(
+                '>H', cmap, range_offsets_at + 2 * i + range_offsets[i]
+                + 2 * (code - starts[i]))[0]
+            return (glyph + deltas[i]) & 0xFFFF if glyph else 0
+        return glyph4
+
+    def advance(self, char):
+        """Returns the advance width of a character in ems."""
+        width = self._widths.get(char)
+        if width is None:
+            glyph = self._glyph(ord(char))
+            width = self.advances[min(glyph, len(self.advances) - 1)]
+            width = self._widths[char] = width / self.units_per_em
+        return width
+
+
+def estimated_advance(char):
+    """Returns an estimate of the advance width of a character in ems.
+
+    Used when no font metrics are available.  The estimates are on the
+    wide side of typical sans-serif fonts so labels are not clipped.
+    """
+    if char in ' .,:;!|\'ilI':
+        return 0.3
+    if char in '()[]{}-/frtj':
+        return 0.38
+    if char in 'mwMW':
+        return 0.9
+    if char.isupper():
+        return 0.7
+    return 0.58
+
+
+class TextMeasurer(object):
+    """Measures text widths, memoizing the width of each string.
+
+    Attributes:
+        metrics: (FontMetrics) Metrics of the font.  If None, the widths
+            are estimated (see estimated_advance()).
+        widths: (dict) Text widths in ems keyed by text.
+    """
+
+    def __init__(self, metrics=None):
+        """Initializes a TextMeasurer object."""
+        self.metrics = metrics
+        self.widths = {}
+
+    def width(self, text, font_size):
+        """Returns the width of 'text' at 'font_size' (in pixels)."""
+        width = self.widths.get(text)
+        if width is None:
+            advance = (estimated_advance if self.metrics is None
+                       else self.metrics.advance)
+            width = self.widths[text] = sum(advance(char) for char in text)
+        return width * font_size
+
+
+# TextMeasurers keyed by font name, shared by every layout of a run.
+_TEXT_MEASURERS = {}
+
+
+def text_measurer(cfg=GDConfig()):
+    """Returns the (shared) TextMeasurer of 'cfg.font'.
+
+    The metrics are read from the Google font (using the font cache, so
+    the font is downloaded at most once).  If the font is not a Google
+    font or cannot be fetched, the widths are estimated.
+
+    Args:
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+    """
+    if cfg.font not in _TEXT_MEASURERS:
+        metrics = None
+        if cfg.font in cfg.default_google_fonts or cfg.font == cfg.google_font:
+            try:
+                data, _ = fetch_google_font(
+                    cfg.font, FontCache.from_config(cfg), cfg.profiler,
+                    cfg.deterministic, cfg.font_timeout)
+                metrics = FontMetrics(data)
+            except (HTTPError, URLError, socket.timeout, ValueError) as exc:
+                logger.warning('Estimating "{}" text widths ({})'.format(
+                    cfg.font, exc))
+        else:
+            logger.warning('Estimating "{}" text widths (not a Google '
+                           'font)'.format(cfg.font))
+        _TEXT_MEASURERS[cfg.font] = TextMeasurer(metrics)
+    return _TEXT_MEASURERS[cfg.font]
+
+
+def autofit_tag_widths(records, cfg=GDConfig()):
+    """Returns the tag width of each column fitting its widest label.
+
+    Args:
+        records: (list) CSV records (lists of fields).
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+
+    Returns:
+        A dict of tag widths keyed by column index.  Columns without a
+        label wider than 'cfg.tag_size' are not included.
+    """
+    measurer = text_measurer(cfg)
+    widths = {}
+    mode = None
+    for record in records:
+        marker = record_marker(record)
+        if marker == 'EOF':
+            break
+        if marker is not None:
+            mode = marker
+            continue
+        if mode not in ('Right', 'Left', 'Top', None):
+            continue
         for i, rec in enumerate(record):
-            if rec and mode in ('Right', 'Top', None):
-                x_start = label_index * (cfg.tag_size[0] + cfg.tag_margins[0])
-                y_add = add_tag(dwg, i, rec, (x_start, cursor), cfg)
-                label_index += 1
+            if rec:
+                width = measurer.width(rec, cfg.font_size) + (
+                    2 * cfg.tag_txt_margins[0])
+                if width > widths.get(i, cfg.tag_size[0]):
+                    widths[i] = width
+    if isinstance(cfg.tag_size[0], int):
+        widths = {i: int(ceil(width)) for i, width in widths.items()}
+    return widths
+
+
+class Layout(object):
+    """Geometry of every tag, text line and image of a datasheet.
+
+    The elements are stored column-wise in arrays, one entry per
+    element: its kind (Layout.TAG, Layout.TEXT or Layout.IMAGE), the
+    index of the CSV column it came from, its position and size, and its
+    text (the label, text line or image name).  A Layout is computed once
+    by layout_csv_data() and can be rendered any number of times (see
+    render_layout()).
+
+    Labels such as 'GND' or 'PWM' repeat heavily, so each distinct text
+    is stored once in 'strings' and the elements only hold its index.
+
+    Attributes:
+        kinds: (array) Element kinds.
+        columns: (array) CSV column index of each element.
+        xs, ys, widths, heights: (array) Element positions and sizes.
+        text_ids: (array) Index in 'strings' of the text of each element.
+        strings: (list) Distinct element texts.
+        sections: (list) (mode, index) tuples, the section keyword
+            (None before the first keyword) and the index of the first
+            element of each CSV section.
+        column_count: (int) Number of columns in the first CSV line.
+        width, height: Document size.
+    """
+
+    TAG, TEXT, IMAGE = 0, 1, 2
+
+    def __init__(self, typecode='l'):
+        """Initializes an empty Layout.
+
+        Args:
+            typecode: (str Default='l') Array typecode of the positions
+                and sizes ('l' for integers, 'd' for floats).
+        """
+        self.kinds = array('B')
+        self.columns = array('I')
+        self.xs = array(typecode)
+        self.ys = array(typecode)
+        self.widths = array(typecode)
+        self.heights = array(typecode)
+        self.text_ids = array('I')
+        self.strings = []
+        self._string_ids = {}
+        self.sections = [(None, 0)]
+        self.column_count = 0
+        self.width = 0
+        self.height = 0
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self):
+        """Yields (kind, column, x, y, width, height, text) tuples."""
+        return zip(self.kinds, self.columns, self.xs, self.ys, self.widths,
+                   self.heights, map(self.strings.__getitem__, self.text_ids))
+
+    def string_id(self, text):
+        """Returns the index of 'text' in 'strings', adding it if needed."""
+        i = self._string_ids.get(text)
+        if i is None:
+            i = self._string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return i
+
+    def append(self, kind, column, x, y, width, height, text):
+        """Add an element to the layout."""
+        self.kinds.append(kind)
+        self.columns.append(column)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.widths.append(width)
+        self.heights.append(height)
+        self.text_ids.append(self.string_id(text))
+
+    def chars(self):
+        """Returns the set of characters of the tags and text lines."""
+        chars = set()
+        for i in {i for kind, i in zip(self.kinds, self.text_ids)
+                  if kind != Layout.IMAGE}:
+            chars.update(self.strings[i])
+        return chars
+
+    def extend(self, kinds, columns, xs, ys, widths, heights, texts):
+        """Add elements to the layout from lists of equal length."""
+        self.kinds.extend(kinds)
+        self.columns.extend(columns)
+        self.xs.extend(xs)
+        self.ys.extend(ys)
+        self.widths.extend(widths)
+        self.heights.extend(heights)
+        new = [text for text in dict.fromkeys(texts)
+               if text not in self._string_ids]
+        self._string_ids.update(zip(new, itertools.count(len(self.strings))))
+        self.strings.extend(new)
+        self.text_ids.extend(map(self._string_ids.__getitem__, texts))
+
+
+# Rows of a tag section laid out at once by layout_tag_rows().
+VECTOR_BLOCK_ROWS = 8192
+
+
+def _typed_array(values, typecode):
+    """Copy NumPy values into a Layout array without boxing each one."""
+    return array(typecode, np.asarray(values).astype(typecode).tobytes())
+
+
+def layout_tag_rows(layout, rows, mode, cursor, ribbon_width,
+                    tag_widths=None, cfg=GDConfig()):
+    """Place the tags of consecutive rows of a tag section with NumPy.
+
+    This is the vectorized equivalent of the Right/Left/Top loop of
+    layout_csv_data(): a mask of the non-empty cells gives the packing
+    index of every tag within its row (from the left for Right and Top
+    sections, from the right for Left sections) and the rows holding at
+    least one tag advance the cursor.  Running sums are accumulated in
+    the same order as the scalar loop, so the coordinates are identical.
+
+    Args:
+        layout: (Layout) Layout to extend.
+        rows: (list) CSV records (lists of fields) of a single section.
+        mode: (str) Section keyword ('Right', 'Left', 'Top' or None).
+        cursor: (int/float) Y position of the first row.
+        ribbon_width: (int/float) Width of the tag ribbon.
+        tag_widths: (dict Default=None) Integer tag widths keyed by
+            column index (see autofit_tag_widths()).  If None,
+            'cfg.tag_size' is used.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+
+    Returns:
+        The cursor after the last row.
+    """
+    tag_space = cfg.tag_size[0] + cfg.tag_margins[0]
+    tag_height = cfg.tag_size[1] + cfg.tag_margins[1]
+    lengths = np.fromiter((len(row) for row in rows), np.intp, len(rows))
+    fields = np.array(list(itertools.chain.from_iterable(rows)), object)
+    filled = fields.astype(bool)
+    row_of = np.repeat(np.arange(len(rows)), lengths)
+    starts = np.cumsum(lengths) - lengths
+    cells = np.flatnonzero(filled)
+    tag_rows = row_of[cells]
+    columns = cells - starts[tag_rows]
+    tags_per_row = np.bincount(tag_rows, minlength=len(rows))
+    # Index of the first tag of the row of each tag, and of each tag
+    # within its row.
+    firsts = (np.cumsum(tags_per_row) - tags_per_row)[tag_rows]
+    label_index = np.arange(len(cells)) - firsts
+
+    # Integer coordinates stay integers, as in the scalar loop.
+    x_type = (np.int64 if all(isinstance(number, int) for number in (
+        tag_space, ribbon_width)) else np.float64)
+    if tag_widths is None:
+        widths = np.full(len(cells), cfg.tag_size[0])
+        xs = label_index.astype(x_type) * tag_space
+        if mode == 'Left':
+            xs = (ribbon_width - tag_space) - xs
+    else:
+        column_widths = np.array([tag_widths.get(i, cfg.tag_size[0])
+                                  for i in range(int(lengths.max()))],
+                                 np.int64)
+        steps = column_widths[columns] + cfg.tag_margins[0]
+        # Sum of the steps of the previous tags in the same row.
+        ends = np.cumsum(steps)
+        xs = ends - steps
+        xs -= xs[firsts]
+        if mode == 'Left':
+            xs = ribbon_width - (xs + steps)
+        widths = column_widths[columns]
+
+    y_type = (np.int64 if isinstance(cursor, int)
+              and isinstance(tag_height, int) else np.float64)
+    row_cursors = np.cumsum(np.concatenate((
+        np.array([cursor], y_type),
+        np.where(tags_per_row > 0, tag_height, 0).astype(y_type))))
+
+    typecode = layout.xs.typecode
+    layout.extend(_typed_array(np.full(len(cells), Layout.TAG), 'B'),
+                  _typed_array(columns, 'I'), _typed_array(xs, typecode),
+                  _typed_array(row_cursors[tag_rows], typecode),
+                  _typed_array(widths, typecode),
+                  _typed_array(np.full(len(cells), cfg.tag_size[1]),
+                               typecode),
+                  fields[cells].tolist())
+    return row_cursors[-1].item()
+
+
+def layout_csv_data(records, cfg=GDConfig()):
+    """Compute the position of every tag, text line and image.
+
+    Args:
+        records: (iterable) CSV records (lists of fields) as returned by
+            read_csv(), or CSV file lines (strings).  Records are
+            consumed one at a time.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+
+    Returns:
+        A Layout.
+
+    Raises:
+        ValueError: There are no records.
+    """
+    numbers = cfg.tag_size + cfg.tag_margins + cfg.image_size + [
+        cfg.text_line_height]
+    layout = Layout('l' if all(isinstance(number, int)
+                               for number in numbers) else 'd')
+    cursor = cfg.tag_size[1] + cfg.tag_margins[1]
+    mode = None
+
+    records = iter(records)
+    header = next(records, None)
+    if isinstance(header, str):
+        records = sniff_records(itertools.chain((header,), records))
+        header = next(records, None)
+    if header is None:
+        raise ValueError('No CSV data')
+
+    layout.column_count = len(header)
+    tag_space = cfg.tag_size[0] + cfg.tag_margins[0]
+    tag_height = cfg.tag_size[1] + cfg.tag_margins[1]
+    ribbon_width = (len(header) + 1) * tag_space
+    images_width = 0
+
+    tag_widths = None
+    records = itertools.chain((header,), records)
+    if cfg.autofit_tags:
+        # The column widths must be known before the first tag is placed,
+        # so the whole file is held in memory (with shared strings).
+        shared = {}
+        records = [[shared.setdefault(field, field) for field in record]
+                   for record in records]
+        tag_widths = autofit_tag_widths(records, cfg)
+        ribbon_width = tag_space + sum(
+            tag_widths.get(i, cfg.tag_size[0]) + cfg.tag_margins[0]
+            for i in range(len(header)))
+
+    block = None
+    if cfg.vectorized_layout:
+        if np is None:
+            raise ImportError('The vectorized layout requires NumPy')
+        # Float autofit widths are summed tag by tag to stay identical.
+        if tag_widths is None or isinstance(cfg.tag_size[0], int):
+            block = []
+
+    for record in records:
+        marker = record_marker(record)
+        if block and (marker is not None or len(block) == VECTOR_BLOCK_ROWS):
+            cursor = layout_tag_rows(layout, block, mode, cursor,
+                                     ribbon_width, tag_widths, cfg)
+            block = []
+        if marker == 'EOF':
+            break
+        if marker is not None:
+            mode = marker
+            layout.sections.append((mode, len(layout)))
+            cursor += 15
+            continue
+        if block is not None and mode in ('Right', 'Left', 'Top', None):
+            block.append(record)
+            continue
+
+        if mode == 'Text':
+            cursor += tag_height
+
+        y_add = 0
+        label_index = 0
+        label_x = 0
+        image_index = 0
+        images_x = 0
+        for i, rec in enumerate(record):
+            if rec and mode in ('Right', 'Top', None):
+                if tag_widths is None:
+                    width = cfg.tag_size[0]
+                    x_start = label_index * tag_space
+                else:
+                    width = tag_widths.get(i, cfg.tag_size[0])
+                    x_start = label_x
+                    label_x += width + cfg.tag_margins[0]
+                layout.append(Layout.TAG, i, x_start, cursor,
+                              width, cfg.tag_size[1], rec)
+                y_add = tag_height
+                label_index += 1
+
+            elif rec and mode == 'Left':
+                if tag_widths is None:
+                    width = cfg.tag_size[0]
+                    x_start = (ribbon_width - tag_space
+                               - (label_index * tag_space))
+                else:
+                    width = tag_widths.get(i, cfg.tag_size[0])
+                    label_x += width + cfg.tag_margins[0]
+                    x_start = ribbon_width - label_x
+                layout.append(Layout.TAG, i, x_start, cursor,
+                              width, cfg.tag_size[1], rec)
+                y_add = tag_height
+                label_index += 1
+
+            elif rec and mode == 'Text':
+                layout.append(Layout.TEXT, i, 0, cursor, 0,
+                              cfg.text_line_height, rec)
+                cursor += cfg.text_line_height
+
+            elif rec and mode == 'Extras':
+                currentimage = image_filename(rec)
+                if not os.access(currentimage, os.R_OK):
+                    logger.warning('Could not find {}'.format(currentimage))
+                elif cfg.embed_images:
+                    width, height = fit_image(currentimage, cfg.image_size)
+                    layout.append(Layout.IMAGE, i, images_x, cursor, width,
+                                  height, rec)
+                    images_x += width
+                    y_add = max(y_add, height)
+                else:
+                    layout.append(Layout.IMAGE, i, i * cfg.image_size[0],
+                                  cursor, cfg.image_size[0],
+                                  cfg.image_size[1], rec)
+                    y_add = cfg.image_size[1]
+                    image_index += 1
+
+        cursor += y_add
+        row_width = (images_x if cfg.embed_images
+                     else image_index * cfg.image_size[0])
+        if mode == 'Extras' and images_width < row_width:
+            images_width = row_width
+    if block:
+        cursor = layout_tag_rows(layout, block, mode, cursor, ribbon_width,
+                                 tag_widths, cfg)
+
+    min_width = ribbon_width if ribbon_width > images_width else images_width
+    layout.width = (min_width if cfg.document_size[0] is None
+                    else cfg.document_size[0])
+    layout.height = (cursor if cfg.document_size[1] is None
+                     else cfg.document_size[1])
+    return layout
+
+
+def page_root(name_root, number):
+    """Returns the filename root of page 'number' (from 1)."""
+    return '{}_p{:02d}'.format(name_root, number)
+
+
+def _page_layout(layout, start, end, offset, height):
+    """Returns elements 'start' to 'end' of a Layout moved up by 'offset'."""
+    page = Layout(layout.xs.typecode)
+    page.extend(layout.kinds[start:end], layout.columns[start:end],
+                layout.xs[start:end],
+                (y - offset for y in layout.ys[start:end]),
+                layout.widths[start:end], layout.heights[start:end],
+                [layout.strings[i] for i in layout.text_ids[start:end]])
+    mode = None
+    for section_mode, index in layout.sections:
+        if index <= start:
+            mode = section_mode
+    page.sections = [(mode, 0)] + [
+        (section_mode, index - start)
+        for section_mode, index in layout.sections if start < index < end]
+    page.column_count = layout.column_count
+    page.width = layout.width
+    page.height = height
+    return page
+
+
+def paginate_layout(layout, page_height, cfg=GDConfig()):
+    """Split a Layout into pages no taller than 'page_height'.
+
+    Pages only break between rows (the elements sharing a y position), so
+    a row of tags or images is never cut; a row taller than a page gets a
+    page of its own (and overflows it).  Sections carry on across pages.
+    Every page starts with the top margin of the first page and is as
+    wide as the document.
+
+    Args:
+        layout: (Layout) Layout computed by layout_csv_data().
+        page_height: (int/float) Height of each page.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+
+    Returns:
+        A list of Layouts, one per page (at least one).  Each page's
+        'sections' start with the section the page begins in.
+    """
+    top_margin = cfg.tag_size[1] + cfg.tag_margins[1]
+    kinds, ys, heights = layout.kinds, layout.ys, layout.heights
+    bounds = []
+    start = offset = 0
+    i = 0
+    while i < len(layout):
+        # Text lines are drawn above their baseline, the others below.
+        row_y = ys[i]
+        row_top, row_bottom = row_y, row_y
+        j = i
+        while j < len(layout) and ys[j] == row_y:
+            if kinds[j] == Layout.TEXT:
+                row_top = min(row_top, row_y - heights[j])
+            else:
+                row_bottom = max(row_bottom, row_y + heights[j])
+            j += 1
+        if row_bottom - offset > page_height and i > start:
+            bounds.append((start, i, offset))
+            start, offset = i, row_top - top_margin
+        if row_bottom - offset > page_height:
+            logger.warning('A row at y={} is taller than the {} page '
+                           'height'.format(row_y, page_height))
+        i = j
+    bounds.append((start, len(layout), offset))
+    return [_page_layout(layout, start, end, offset, page_height)
+            for start, end, offset in bounds]
+
+
+def extend_tag_colors(cfg, column_count):
+    """Repeat the last tag color so every column has a color."""
+    if column_count > len(cfg.tag_colors):
+        diff = column_count - len(cfg.tag_colors)
+        cfg.tag_colors = [*cfg.tag_colors + [cfg.tag_colors[-1]] * diff]
+
+
+def render_layout(dwg, layout, cfg=GDConfig(), images=None):
+    """Add the elements of a Layout to a drawing and set its size.
+
+    Args:
+        dwg: (svg.drawing.Drawing) A svgwrite Drawing instance to amend.
+        layout: (Layout) Layout computed by layout_csv_data().
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+        images: (ImageCache Default=None) Cache of the embedded images
+            (see GDConfig 'embed_images').  If None, a new cache is
+            used.
+    """
+    if cfg.embed_images and images is None:
+        images = ImageCache()
+    extend_tag_colors(cfg, layout.column_count)
+    if cfg.tag_symbols:
+        widths = {column: width for kind, column, width
+                  in zip(layout.kinds, layout.columns, layout.widths)
+                  if kind == Layout.TAG}
+        add_tag_symbols(dwg, widths, cfg,
+                        widths if cfg.autofit_tags else None)
+
+    for kind, column, x, y, width, height, text in layout:
+        if kind == Layout.TAG:
+            add_tag(dwg, column, text, (x, y), cfg,
+                    (width, height) if cfg.autofit_tags else None)
+        elif kind == Layout.TEXT:
+            add_text(dwg, column, text, y, cfg)
+        elif cfg.embed_images:
+            currentimage = image_filename(text)
+            logger.info('Embedding {}'.format(currentimage))
+            dwg.add(dwg.image(
+                href=images.data_uri(currentimage,
+                                     embedded_image_size(currentimage, cfg)),
+                insert=(x, y), size=(width, height)))
+        else:
+            add_images(dwg, column, text, y, cfg)
+
+    dwg.update({'width': str(layout.width), 'height': str(layout.height)})
+
+
+def process_csv_data(dwg, records, cfg=GDConfig()):
+    """Parse data and call add_field(), add_text(), and add_images().
+
+    Args:
+        dwg: (svg.drawing.Drawing) A svgwrite Drawing instance to amend.
+        records: (iterable) CSV records (lists of fields) as returned by
+            read_csv(), or CSV file lines (strings).  Records are
+            consumed one at a time.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+
+    Returns:
+        The Layout that was rendered.
+    """
+    layout = layout_csv_data(records, cfg)
+    render_layout(dwg, layout, cfg)
+    return layout
+
+
+# Basic CSS color names accepted by parse_color().
+NAMED_COLORS = {
+    'black': '#000000', 'silver': '#c0c0c0', 'gray': '#808080',
+    'grey': '#808080', 'white': '#ffffff', 'maroon': '#800000',
+    'red': '#ff0000', 'purple': '#800080', 'fuchsia': '#ff00ff',
+    'magenta': '#ff00ff', 'green': '#008000', 'lime': '#00ff00',
+    'olive': '#808000', 'yellow': '#ffff00', 'navy': '#000080',
+    'blue': '#0000ff', 'teal': '#008080', 'aqua': '#00ffff',
+    'cyan': '#00ffff', 'orange': '#ffa500',
+}
+
+
+def parse_color(color):
+    """Returns the (red, green, blue) components (0 to 1) of a color.
+
+    Args:
+        color: (str) A '#rgb' or '#rrggbb' color or a basic CSS color
+            name (see NAMED_COLORS).
+
+    Raises:
+        ValueError: The color is not supported.
+    """
+    value = NAMED_COLORS.get(color.strip().lower(), color.strip())
+    if len(value) == 4 and value.startswith('#'):
+        value = '#' + ''.join(digit * 2 for digit in value[1:])
+    if len(value) != 7 or not value.startswith('#'):
+        raise ValueError('Unsupported color: {!r}'.format(color))
+    return tuple(int(value[i:i + 2], 16) / 255 for i in (1, 3, 5))
+
+
+# Properties of the stylesheet rules applied by export_layout().
+EXPORT_PROPERTIES = ('fill', 'stroke', 'font-family', 'font-size',
+                     'font-weight', 'font-style')
+
+
+def parse_stylesheet(content):
+    """Returns the class selector rules of a stylesheet.
+
+    Only rules made of class selectors (e.g., '.tag1.tag_bkg' or
+    '.text, .text_line0') are returned; comments and other rules are
+    skipped.
+
+    Args:
+        content: (str) CSS text.
+
+    Returns:
+        A list of (classes, declarations) tuples in stylesheet order,
+        where 'classes' is a frozenset of class names and 'declarations'
+        a dict of property values.
+    """
+    content = re.sub(r'/\*.*?\*/', '', content, flags=re.DOTALL)
+    rules = []
+    for selectors, body in re.findall(r'([^{}]+)\{([^}]*)\}', content):
+        declarations = {}
+        for declaration in body.split(';'):
+            name, _, value = declaration.partition(':')
+            if value.strip():
+                declarations[name.strip().lower()] = value.strip()
+        for selector in selectors.split(','):
+            selector = selector.strip()
+            if re.fullmatch(r'(\.[-\w]+)+', selector):
+                rules.append((frozenset(selector[1:].split('.')),
+                              declarations))
+    return rules
+
+
+class StyleResolver(object):
+    """Resolves the stylesheet properties of elements by class names.
+
+    As in an SVG, any stylesheet rule overrides the style attributes of
+    an element, rules with more classes override rules with fewer, and
+    later rules override earlier ones with as many classes.
+
+    Attributes:
+        rules: (list) (classes, declarations) tuples in cascade order
+            (see parse_stylesheet()).
+    """
+
+    def __init__(self, stylesheets=()):
+        """Initializes a StyleResolver.
+
+        Args:
+            stylesheets: (iterable Default=()) CSS texts in the order
+                they are embedded (see cascade_stylesheets()).
+        """
+        self.rules = []
+        for content in stylesheets:
+            self.rules.extend(parse_stylesheet(content))
+        self._cache = {}
+
+    def resolve(self, classes, attributes):
+        """Returns the properties of an element.
+
+        Args:
+            classes: (str) Space separated class names of the element.
+            attributes: (dict) Properties set as attributes of the
+                element (e.g., {'fill': '#ff3333'}).
+
+        Returns:
+            A copy of 'attributes' updated with the EXPORT_PROPERTIES set
+            by the rules matching 'classes'.
+        """
+        if classes not in self._cache:
+            names = set(classes.split())
+            matching = sorted(
+                ((len(rule_classes), order, declarations)
+                 for order, (rule_classes, declarations)
+                 in enumerate(self.rules) if rule_classes <= names),
+                key=lambda match: match[:2])
+            properties = {}
+            for _, _, declarations in matching:
+                properties.update((name, value)
+                                  for name, value in declarations.items()
+                                  if name in EXPORT_PROPERTIES)
+            self._cache[classes] = properties
+        resolved = dict(attributes)
+        resolved.update(self._cache[classes])
+        return resolved
+
+
+def cascade_stylesheets(filename_root, cfg=GDConfig(), payload=None,
+                        theme=None):
+    """Returns the stylesheets embed_style() adds to an SVG, in order.
+
+    The rules that only restate the GDConfig settings (the 'class' style
+    mode rules) are left out.
+
+    Args:
+        filename_root: (str) root of the CSV file (used to find its
+            stylesheet).
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+        payload: (StylePayload Default=None) Previously fetched
+            stylesheets.  If None, the stylesheets are read from disk.
+        theme: (Theme Default=None) Theme whose colors and stylesheet
+            follow the other stylesheets.
+
+    Returns:
+        A list of CSS texts.
+    """
+    if payload is None:
+        payload = StylePayload()
+    stylesheets = [payload.read_stylesheet('default.css'),
+                   payload.read_stylesheet(filename_root + '.css')]
+    if theme is not None:
+        if theme.tag_colors is not None:
+            stylesheets.append(tag_color_stylesheet(cfg.tag_colors))
+        if theme.stylesheet is not None:
+            stylesheets.append(payload.read_stylesheet(theme.stylesheet))
+    return [content for content in stylesheets if content is not None]
+
+
+def _cairo_color(value, default):
+    """Returns the parse_color() components of a resolved color.
+
+    Returns None for 'none', and parse_color('default') (with a warning)
+    if the color is not supported.
+    """
+    if value.strip().lower() == 'none':
+        return None
+    if value == default:
+        return parse_color(value)
+    try:
+        return parse_color(value)
+    except ValueError:
+        logger.warning('Unsupported stylesheet color {!r} is not '
+                       'exported'.format(value))
+        return parse_color(default)
+
+
+def _cairo_font(properties, attributes):
+    """Returns the (family, slant, weight, size) of resolved properties."""
+    family = properties['font-family'].split(',')[0].strip().strip('"\'')
+    weight = properties.get('font-weight', 'normal').strip().lower()
+    bold = weight in ('bold', 'bolder') or (
+        weight.isdigit() and int(weight) >= 600)
+    slant = {'italic': cairo.FONT_SLANT_ITALIC,
+             'oblique': cairo.FONT_SLANT_OBLIQUE}.get(
+                 properties.get('font-style', '').strip().lower(),
+                 cairo.FONT_SLANT_NORMAL)
+    size = str(properties['font-size']).strip()
+    try:
+        size = float(size[:-2] if size.endswith('px') else size)
+    except ValueError:
+        logger.warning('Unsupported font size {!r} is not '
+                       'exported'.format(size))
+        size = attributes['font-size']
+    return (family or attributes['font-family'], slant,
+            cairo.FONT_WEIGHT_BOLD if bold else cairo.FONT_WEIGHT_NORMAL,
+            size)
+
+
+def _cairo_styles(styles, kind, column, cfg=GDConfig()):
+    """Returns the resolved style of a tag or text line for cairo.
+
+    Args:
+        styles: (StyleResolver) Stylesheet rules of the SVG.
+        kind: (int) Layout.TAG or Layout.TEXT.
+        column: (int) Tag column or text line index.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+
+    Returns:
+        A (background fill, background stroke, text fill, font) tuple
+        of parse_color() components (None if not painted) and
+        _cairo_font() settings.  The background colors of text lines
+        are None.
+    """
+    if kind == Layout.TAG:
+        color_bkg, color_outline, color_txt = cfg.tag_colors[column]
+        bkg = styles.resolve('tag{:d} tag_bkg'.format(column),
+                             {'fill': color_bkg, 'stroke': color_outline})
+        classes = 'tag{:d} tag_txt'.format(column)
+        attributes = {'fill': color_txt, 'font-family': cfg.font,
+                      'font-size': cfg.font_size}
+        fill = _cairo_color(bkg['fill'], color_bkg)
+        stroke = _cairo_color(bkg['stroke'], color_outline)
+    else:
+        classes = 'text_line{:d} text'.format(column)
+        attributes = {'fill': 'black', 'font-family': cfg.font,
+                      'font-size': 12}
+        fill = stroke = None
+    txt = styles.resolve(classes, attributes)
+    return (fill, stroke, _cairo_color(txt['fill'], attributes['fill']),
+            _cairo_font(txt, attributes))
+
+
+def _cairo_rounded_rect(ctx, x, y, width, height, radius):
+    """Add a rounded rectangle path (like <rect rx= ry=>) to a context."""
+    ctx.new_sub_path()
+    ctx.arc(x + width - radius, y + radius, radius, -pi / 2, 0)
+    ctx.arc(x + width - radius, y + height - radius, radius, 0, pi / 2)
+    ctx.arc(x + radius, y + height - radius, radius, pi / 2, pi)
+    ctx.arc(x + radius, y + radius, radius, pi, 3 * pi / 2)
+    ctx.close_path()
+
+
+def _cairo_image(ctx, filename, x, y, width, height):
+    """Draw a PNG scaled to fit and centered in a box (like <image>)."""
+    image = cairo.ImageSurface.create_from_png(filename)
+    scale = min(width / image.get_width(), height / image.get_height())
+    ctx.save()
+    ctx.translate(x + (width - image.get_width() * scale) / 2,
+                  y + (height - image.get_height() * scale) / 2)
+    ctx.scale(scale, scale)
+    ctx.set_source_surface(image, 0, 0)
+    ctx.paint()
+    ctx.restore()
+
+
+def export_layout(layout, filename, cfg=GDConfig(), output_format=None,
+                  stylesheets=None):
+    """Render a Layout straight to a PDF or PNG file with pycairo.
+
+    The tags, text lines and images are drawn with the configured tag
+    colors, font and font size, overridden by the colors, fonts, font
+    sizes, weights and styles of the stylesheets, as in the SVG (see
+    StyleResolver).  Fonts are looked up among the installed system
+    fonts (embedded Google fonts are not used).
+
+    Args:
+        layout: (Layout/list) Layout computed by layout_csv_data(), or a
+            list of page Layouts (see paginate_layout()) saved as a
+            multi-page PDF.
+        filename: (str) PDF or PNG filename.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use ('dpi' sets the PNG resolution and
+            'sink' where the file is saved).
+        output_format: (str Default=None) 'pdf' or 'png'.  If None, the
+            extension of 'filename' is used.
+        stylesheets: (list Default=None) CSS texts of the SVG (see
+            cascade_stylesheets()).  If None, no stylesheet is applied.
+
+    Returns:
+        A str, the filename of the saved file (see save_output()).
+
+    Raises:
+        ImportError: pycairo is not installed.
+        ValueError: Unknown output format, unsupported tag color or
+            several pages for a PNG.
+    """
+    if cairo is None:
+        raise ImportError('PDF and PNG output requires pycairo '
+                          '(pip install pycairo)')
+    if output_format is None:
+        output_format = os.path.splitext(filename)[1][1:].lower()
+    pages = layout if isinstance(layout, list) else [layout]
+    layout = pages[0]
+    if output_format == 'png' and len(pages) > 1:
+        raise ValueError('A PNG holds a single page')
+    # The file is drawn in memory and then saved to the output sink.
+    target = io.BytesIO()
+
+    if output_format == 'pdf':
+        # PDF units are points (1/72 inch), SVG pixels are 1/96 inch.
+        scale = 72 / 96
+        surface = cairo.PDFSurface(target, layout.width * scale,
+                                   layout.height * scale)
+        if cfg.deterministic and hasattr(cairo, 'PDFMetadata'):
+            surface.set_metadata(
+                cairo.PDFMetadata.CREATE_DATE,
+                time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(
+                    int(os.environ.get('SOURCE_DATE_EPOCH', 0)))))
+    elif output_format == 'png':
+        scale = cfg.dpi / 96
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32,
+                                     int(ceil(layout.width * scale)),
+                                     int(ceil(layout.height * scale)))
+    else:
+        raise ValueError('Unknown export format: {!r}'.format(output_format))
+
+    extend_tag_colors(cfg, layout.column_count)
+    styles = StyleResolver(stylesheets or ())
+    resolved = {}
+
+    logger.info('Exporting {}'.format(filename))
+    ctx = cairo.Context(surface)
+    ctx.scale(scale, scale)
+    ctx.set_line_width(1)
+    for page_number, layout in enumerate(pages):
+        if page_number:
+            ctx.show_page()
+            surface.set_size(layout.width * scale, layout.height * scale)
+        for kind, column, x, y, width, height, text in layout:
+            if kind == Layout.IMAGE:
+                _cairo_image(ctx, image_filename(text), x, y, width, height)
+                continue
+            if (kind, column) not in resolved:
+                resolved[kind, column] = _cairo_styles(styles, kind, column,
+                                                       cfg)
+            color_bkg, color_outline, color_txt, font = resolved[kind,
+                                                                 column]
+            if kind == Layout.TAG:
+                _cairo_rounded_rect(ctx, x, y, width, height, 1)
+                if color_bkg is not None:
+                    ctx.set_source_rgb(*color_bkg)
+                    ctx.fill_preserve()
+                if color_outline is not None:
+                    ctx.set_source_rgb(*color_outline)
+                    ctx.stroke_preserve()
+                ctx.new_path()
+                x += cfg.tag_txt_margins[0]
+                y += height - cfg.tag_txt_margins[1]
+            if color_txt is not None:
+                ctx.set_source_rgb(*color_txt)
+                ctx.select_font_face(*font[:3])
+                ctx.set_font_size(font[3])
+                ctx.move_to(x, y)
+                ctx.show_text(text)
+
+    if output_format == 'png':
+        surface.write_to_png(target)
+    surface.finish()
+    filename, size = save_output(filename, bytes_writer(target.getvalue()),
+                                 cfg)
+    if size is None:
+        logger.info('"{}" is unchanged'.format(filename))
+    return filename
+
+
+def referenced_images(records):
+    """Returns the PNG filenames named in the 'Extras' sections.
+
+    Args:
+        records: (iterable) CSV records (see read_csv()).
+    """
+    images = []
+    mode = None
+    for record in records:
+        marker = record_marker(record)
+        if marker == 'EOF':
+            break
+        if marker is not None:
+            mode = marker
+        elif mode == 'Extras':
+            images.extend(image_filename(rec) for rec in record if rec)
+    return images
+
+
+def input_files(csv_filename, filename_root, cfg=GDConfig()):
+    """Returns the files an SVG is rendered from.
+
+    These are the CSV file, 'default.css', '<root>.css', the PNG images
+    named in the 'Extras' sections and the theme stylesheets.
+
+    Args:
+        csv_filename: (str) CSV filename.
+        filename_root: (str) root of the CSV filename.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+
+    Returns:
+        A list of (filename, kind) tuples where 'kind' is 'csv', 'css'
+        or 'image'.  Files that do not exist (yet) are included.
+    """
+    # Parsed as read_csv() does (encoding and delimiter detection).
+    records = _stream_records(open(csv_filename, 'rb'))
+    inputs = [(csv_filename, 'csv'), ('default.css', 'css'),
+              (filename_root + '.css', 'css')]
+    inputs.extend((image, 'image') for image in referenced_images(records))
+    inputs.extend((theme.stylesheet, 'css') for theme in cfg.themes or ()
+                  if theme.stylesheet is not None)
+    return inputs
+
+
+def input_digest(csv_filename, filename_root, cfg=GDConfig()):
+    """Hash everything a rendered SVG depends on.
+
+    The digest covers the CSV file, 'default.css', '<root>.css', the
+    theme stylesheets, the PNG images named in the 'Extras' sections,
+    the configuration options that affect the output, and this script.
+
+    Args:
+        csv_filename: (str) CSV filename.
+        filename_root: (str) root of the CSV filename.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+
+    Returns:
+        A str, the hex digest of the inputs.
+    """
+    digest = hashlib.sha256()
+    digest.update(cfg.fingerprint().encode('utf-8'))
+    inputs = [os.path.abspath(__file__)] + [
+        filename for filename, _ in input_files(csv_filename, filename_root,
+                                                cfg)]
+    for filename in inputs:
+        digest.update(b'\0' + filename.encode('utf-8') + b'\0')
+        try:
+            with open(filename, 'rb') as input_file:
+                digest.update(hashlib.sha256(input_file.read()).digest())
+        except OSError:
+            digest.update(b'missing')
+    return digest.hexdigest()
+
+
+class BuildManifest(object):
+    """Record of the input digest each SVG was last rendered from.
+
+    Attributes:
+        filename: (str) JSON file holding the manifest.
+        entries: (dict) Input digests keyed by SVG filename.
+    """
+
+    def __init__(self, filename='.gd_manifest.json'):
+        """Initializes a BuildManifest object, loading 'filename'.
+
+        A missing or corrupt manifest is treated as empty.
+        """
+        self.filename = filename
+        self.entries = {}
+        try:
+            with open(filename, 'r') as manifest_file:
+                entries = json.load(manifest_file)
+        except OSError:
+            return
+        except ValueError:
+            entries = None
+        if isinstance(entries, dict):
+            self.entries = entries
+        else:
+            logger.warning('Ignoring the invalid build manifest "{}"'.format(
+                filename))
+
+    def output_filename(self, filename):
+        """Returns the filename an output of this build is saved to.
+
+        An existing file is only replaced if the manifest records it,
+        i.e., if an earlier build wrote it.  Otherwise the first
+        '<root>_<#><ext>' variant that is recorded or free is used, so
+        files edited or committed by hand are never overwritten.
+        """
+        return _unique_filename(filename, lambda candidate: (
+            os.path.normpath(candidate) not in self.entries
+            and os.access(candidate, os.F_OK)))
+
+    def is_current(self, svg_root, digest, cfg=GDConfig()):
+        """Returns True if every output of 'svg_root' exists and matches.
+
+        Args:
+            svg_root: (str) root for the output SVG files.
+            digest: (str) Digest of the current inputs.
+            cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+                configuration to use (see output_roots()).
+        """
+        for _, name_root in output_roots(svg_root, cfg):
+            for extension in ['svgz' if cfg.svgz else 'svg'] + cfg.exports:
+                if cfg.page_height is not None and extension != 'pdf':
+                    # The first page stands for the others.
+                    filename = page_root(name_root, 1) + '.' + extension
+                else:
+                    filename = name_root + '.' + extension
+                filename = os.path.normpath(self.output_filename(filename))
+                if (self.entries.get(filename) != digest
+                        or not os.access(filename, os.F_OK)):
+                    return False
+        return True
+
+    def record(self, filenames, digest):
+        """Record that 'filenames' were rendered from 'digest'."""
+        for filename in filenames:
+            self.entries[os.path.normpath(filename)] = digest
+
+    def save(self):
+        """Write the manifest to disk."""
+        tmp_filename = '{}.{}.tmp'.format(self.filename, os.getpid())
+        with open(tmp_filename, 'w') as manifest_file:
+            json.dump(self.entries, manifest_file, indent=1, sort_keys=True)
+        os.replace(tmp_filename, self.filename)
+
+
+class _CountingWriter(io.RawIOBase):
+    """Binary file object wrapper counting the bytes written."""
+
+    def __init__(self, fileobj):
+        super().__init__()
+        self.fileobj = fileobj
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.size += len(data)
+        self.fileobj.write(data)
+        return len(data)
+
+    def flush(self):
+        self.fileobj.flush()
+
+
+class OutputSink(object):
+    """Destination of the files saved by write_svg() and export_layout().
+
+    Subclasses implement save().  A sink is also a context manager that
+    calls close() on exit.
+
+    Attributes:
+        process_safe: (bool) Worker processes may save to (a copy of)
+            the sink directly.  Otherwise batch_create_gd() buffers the
+            files of each job and saves them in the main process.
+    """
+
+    process_safe = False
+
+    def save(self, filename, write, unique=False, if_changed=False):
+        """Save an output file.
+
+        Args:
+            filename: (str) Output filename.
+            write: (callable) Called with a binary file object to write
+                the content to.
+            unique: (bool Default=False) If 'filename' is taken, save
+                '<root>_02<ext>', '<root>_03<ext>', ... instead of
+                replacing it.
+            if_changed: (bool Default=False) Leave an existing output
+                with the same content untouched.
+
+        Returns:
+            A (filename, size) tuple: the filename used and the number of
+            bytes saved (None if the output was unchanged).
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Finish writing (e.g., the archive index)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _unique_filename(filename, taken, start=2):
+    """Returns 'filename' or the first '<root>_<#><ext>' not 'taken'."""
+    if not taken(filename):
+        return filename
+    root, extension = os.path.splitext(filename)
+    i = start
+    while taken('{0}_{1:02d}{2}'.format(root, i, extension)):
+        i += 1
+    return '{0}_{1:02d}{2}'.format(root, i, extension)
+
+
+class FileSink(OutputSink):
+    """Saves each output as a file (the default sink).
+
+    The content is written to a temporary file next to the target and
+    renamed into place, so a reader never sees a partial file.  Unique
+    names are claimed with O_EXCL, so parallel workers writing into the
+    same directory never pick the same '_<#>' name, and the next index
+    to try is remembered for each root.  The indexes are kept for the
+    life of the sink: render_svgs() uses a new FileSink for each call
+    unless GDConfig 'sink' is set, so long running processes (e.g.,
+    --watch) start again from '_02' on every render.
+
+    Attributes:
+        next_index: (dict) Next '_<#>' index to try keyed by filename.
+    """
+
+    process_safe = True
+
+    def __init__(self):
+        """Initializes a FileSink object."""
+        self.next_index = {}
+
+    def _claim(self, filename):
+        """Create an empty '_<#>' variant of 'filename' and returns it."""
+        def taken(candidate):
+            try:
+                os.close(os.open(candidate,
+                                 os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666))
+            except FileExistsError:
+                return True
+            return False
+
+        claimed = _unique_filename(filename, taken,
+                                   self.next_index.get(filename, 2))
+        if claimed != filename:
+            root = os.path.splitext(filename)[0]
+            self.next_index[filename] = int(
+                os.path.splitext(claimed)[0][len(root) + 1:]) + 1
+        return claimed
+
+    def save(self, filename, write, unique=False, if_changed=False):
+        """Save an output file (see OutputSink.save())."""
+        tmp_filename = '{}.{}.{}.tmp'.format(filename, os.getpid(),
+                                             threading.get_ident())
+        tmp_fd = os.open(tmp_filename,
+                         os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            with os.fdopen(tmp_fd, 'wb') as tmp_file:
+                write(tmp_file)
+            size = os.path.getsize(tmp_filename)
+            if unique:
+                filename = self._claim(filename)
+            elif (if_changed and os.path.isfile(filename)
+                  and os.path.getsize(filename) == size
+                  and filecmp.cmp(filename, tmp_filename, shallow=False)):
+                os.remove(tmp_filename)
+                return filename, None
+            os.replace(tmp_filename, filename)
+        except BaseException:
+            if os.access(tmp_filename, os.F_OK):
+                os.remove(tmp_filename)
+            raise
+        return filename, size
+
+
+class StreamSink(OutputSink):
+    """Writes every output to a binary stream, one after the other.
+
+    Attributes:
+        stream: (file) Binary file object (the standard output by
+            default).
+    """
+
+    def __init__(self, stream=None):
+        """Initializes a StreamSink object."""
+        self.stream = stdout.buffer if stream is None else stream
+
+    def save(self, filename, write, unique=False, if_changed=False):
+        """Write an output to the stream (see OutputSink.save())."""
+        counter = _CountingWriter(self.stream)
+        write(counter)
+        self.stream.flush()
+        return filename, counter.size
+
+
+class BufferSink(OutputSink):
+    """Keeps the outputs in memory.
+
+    Attributes:
+        files: (dict) Output bytes keyed by filename, in the order they
+            were saved.
+    """
+
+    def __init__(self):
+        """Initializes an empty BufferSink object."""
+        self.files = {}
+
+    def save(self, filename, write, unique=False, if_changed=False):
+        """Keep an output in memory (see OutputSink.save())."""
+        buffer = io.BytesIO()
+        write(buffer)
+        data = buffer.getvalue()
+        if unique:
+            filename = _unique_filename(filename, self.files.__contains__)
+        elif if_changed and self.files.get(filename) == data:
+            return filename, None
+        self.files[filename] = data
+        return filename, len(data)
+
+
+class ArchiveSink(OutputSink):
+    """Adds every output to a tar or zip archive (e.g., for a batch).
+
+    The archive type follows the extension of its filename: '.zip',
+    '.tar', '.tar.gz' (or '.tgz'), '.tar.bz2' or '.tar.xz'.
+
+    Attributes:
+        filename: (str) Archive filename.
+        mtime: (int) Modification time given to the entries.
+        names: (set) Names of the entries added so far.
+    """
+
+    def __init__(self, filename, mtime=None):
+        """Creates the archive.
+
+        Args:
+            filename: (str) Archive filename.
+            mtime: (int Default=None) Modification time of the entries
+                (e.g., 0 for reproducible archives).  If None, the
+                current time is used.
+        """
+        self.filename = filename
+        self.mtime = int(time.time()) if mtime is None else mtime
+        self.names = set()
+        lower = filename.lower()
+        if lower.endswith('.zip'):
+            self.archive = zipfile.ZipFile(filename, 'w',
+                                           zipfile.ZIP_DEFLATED)
+        else:
+            mode = 'w'
+            for extensions, compression in ((('.tar.gz', '.tgz'), 'gz'),
+                                            (('.tar.bz2',), 'bz2'),
+                                            (('.tar.xz',), 'xz')):
+                if lower.endswith(extensions):
+                    mode = 'w:' + compression
+            self.archive = tarfile.open(filename, mode)
+
+    def save(self, filename, write, unique=False, if_changed=False):
+        """Add an output to the archive (see OutputSink.save())."""
+        buffer = io.BytesIO()
+        write(buffer)
+        data = buffer.getvalue()
+        name = os.path.normpath(filename).lstrip(os.sep)
+        if unique:
+            name = _unique_filename(name, self.names.__contains__)
+        self.names.add(name)
+        if isinstance(self.archive, zipfile.ZipFile):
+            info = zipfile.ZipInfo(name, time.gmtime(
+                max(self.mtime, 315532800))[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            self.archive.writestr(info, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = self.mtime
+            info.mode = 0o644
+            self.archive.addfile(info, io.BytesIO(data))
+        return name, len(data)
+
+    def close(self):
+        """Write the archive index and close the archive."""
+        self.archive.close()
+
+
+def bytes_writer(data):
+    """Returns a 'write' callable for OutputSink.save() writing 'data'."""
+    return lambda out_file: out_file.write(data)
+
+
+def incremental_build(cfg, csv_filename=None):
+    """Returns True if 'cfg.incremental' can be applied.
+
+    Incremental builds hash the CSV file and check the outputs on disk,
+    so they are disabled (with a warning) for the standard input and for
+    sinks that do not save files (e.g., an archive rewritten every run).
+
+    Args:
+        cfg: (GDConfig) Graphical Datasheet configuration to use.
+        csv_filename: (str Default=None) CSV filename ('-' for the
+            standard input).
+    """
+    if not cfg.incremental:
+        return False
+    if csv_filename == '-':
+        reason = 'the CSV data is read from the standard input'
+    elif cfg.sink is not None and not isinstance(cfg.sink, FileSink):
+        reason = 'the output is not saved to files'
+    else:
+        return True
+    logger.warning('Incremental build disabled: {}'.format(reason))
+    return False
+
+
+def save_output(filename, write, cfg=GDConfig()):
+    """Saves an output file (SVG, PDF or PNG) to the output sink.
+
+    Unless 'cfg.overwrite' is set, an existing file is kept and
+    '<root>_02<ext>', '<root>_03<ext>', ... is saved instead.  An
+    incremental build replaces the files written by earlier builds (see
+    BuildManifest.output_filename()).  If 'cfg.deterministic' is set, a
+    replaced file is only rewritten if its content changed.
+
+    Args:
+        filename: (str) Output filename.
+        write: (callable) Called with a binary file object to write the
+            content to (see OutputSink.save()).
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use ('cfg.sink' selects where the file is
+            saved; if None, a new FileSink saves it).
+
+    Returns:
+        A (filename, size) tuple (see OutputSink.save()).
+    """
+    sink = FileSink() if cfg.sink is None else cfg.sink
+    unique = not cfg.overwrite
+    if unique and cfg.incremental and isinstance(sink, FileSink):
+        filename = BuildManifest(cfg.manifest).output_filename(filename)
+        unique = False
+    return sink.save(filename, write, unique, cfg.deterministic)
+
+
+def save_svg(write, name_root, cfg=GDConfig()):
+    """Saves an SVG document to the output sink (see save_output()).
+
+    Args:
+        write: (callable) Called with a binary file object to write the
+            UTF-8 encoded SVG to (see OutputSink.save()).
+        name_root: (str) root for the output SVG file.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.  'cfg.svgz' compresses the SVG.
+
+    Returns:
+        A str, the filename of the saved SVG.
+    """
+    def write_svgz(svg_file):
+        # A zero mtime keeps the compressed bytes reproducible.
+        with gzip.GzipFile(filename='', mode='wb',
+                           compresslevel=cfg.svgz_level, fileobj=svg_file,
+                           mtime=0) as svgz_file:
+            write(svgz_file)
+
+    filename, size = save_output(
+        name_root + ('.svgz' if cfg.svgz else '.svg'),
+        write_svgz if cfg.svgz else write, cfg)
+    if size is None:
+        logger.info('"{}" is unchanged'.format(filename))
+        return filename
+    logger.info('End of File, the output is located at {}'.format(filename))
+    if cfg.profiler is not None:
+        cfg.profiler.count('bytes_written', size)
+    return filename
+
+
+def write_svg(dwg, name_root, cfg=GDConfig()):
+    """Saves the SVG to the current directory
+
+    Args:
+        dwg: (svg.drawing.Drawing) A svgwrite Drawing to save to disk.
+        name_root: (str) root for the output SVG file.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use (see save_svg()).
+
+    Returns:
+        A str, the filename of the saved SVG.
+    """
+    def write(svg_file):
+        text_file = io.TextIOWrapper(svg_file, encoding='utf-8')
+        dwg.write(text_file, pretty=cfg.pretty)
+        text_file.flush()
+        text_file.detach()
+
+    return save_svg(write, name_root, cfg)
+
+
+def find_csv_files(target):
+    """Discover the CSV files named by a directory, glob or filename.
+
+    Args:
+        target: (str) A directory (searched recursively), a glob pattern
+            (e.g., 'Datasheets/SAM*/*.csv') or a CSV filename.
+
+    Returns:
+        A sorted list of CSV filenames.
+    """
+    if os.path.isdir(target):
+        found = []
+        for dirpath, _, filenames in os.walk(target):
+            found.extend(os.path.join(dirpath, filename)
+                         for filename in filenames
+                         if filename.lower().endswith('.csv'))
+        return sorted(found)
+
+    return sorted(filename for filename in glob.glob(target)
+                  if filename.lower().endswith('.csv'))
+
+
+def is_batch_target(target):
+    """Returns True if 'target' is a directory or a glob pattern."""
+    return os.path.isdir(target) or any(char in target for char in '*?[')
+
+
+def output_roots(svg_root, cfg=GDConfig()):
+    """Returns the SVG filename roots saved for 'svg_root'.
 
-            elif rec and mode == 'Left':
-                tag_space = cfg.tag_size[0] + cfg.tag_margins[0]
-                x_start = ribbon_width - tag_space - (label_index * tag_space)
-                y_add = add_tag(dwg, i, rec, (x_start, cursor), cfg)
-                label_index += 1
+    Args:
+        svg_root: (str) root for the output SVG file.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
 
-            elif rec and mode == 'Text':
-                cursor += add_text(dwg, i, rec, cursor, cfg)
+    Returns:
+        A list of (theme, filename root) tuples.  The theme is None if
+        no themes are configured.
+    """
+    if not cfg.themes:
+        return [(None, svg_root)]
+    return [(theme, '{}_{}'.format(svg_root, theme.name))
+            for theme in cfg.themes]
 
-            elif rec and mode == 'Extras':
-                found_image = add_images(dwg, i, record[i], cursor, cfg)
-                if found_image != 0:
-                    y_add = found_image
-                    image_index += 1
 
-        cursor += y_add
-        if mode == 'Extras' and images_width < image_index * cfg.image_size[0]:
-            images_width = image_index * cfg.image_size[0]
+# StylePayload shared by the _page_job() calls of a PagePool worker.
+_PAGE_JOB = {}
 
-    min_width = ribbon_width if ribbon_width > images_width else images_width
-    width = min_width if cfg.document_size[0] is None else cfg.document_size[0]
-    height = cursor if cfg.document_size[1] is None else cfg.document_size[1]
-    dwg.update({'width': str(width), 'height': str(height)})
 
+def _init_page_job(payload):
+    """Worker process initializer of PagePool."""
+    _PAGE_JOB['payload'] = payload
+
+
+def _page_job(page, filename_root, cfg, theme):
+    """Worker process entry point of PagePool."""
+    return render_svg_bytes(page, filename_root, cfg, _PAGE_JOB['payload'],
+                            theme)
+
+
+class PagePool(object):
+    """Worker processes rendering the pages of paginated sheets.
+
+    A PagePool is started once per run and shared by every sheet and
+    theme rendered with the same fonts and stylesheets, which are sent
+    once to each worker.
+        e.g., `with PagePool(payload, cfg.page_workers) as pool:`
+              `    render_svgs(layout, root, root, cfg, payload, pool)`
+
+    Attributes:
+        payload: (StylePayload) Fonts and stylesheets of the workers.
+    """
+
+    def __init__(self, payload, workers=None):
+        """Initializes a PagePool (the workers start with the first map()).
+
+        Args:
+            payload: (StylePayload) Fonts and stylesheets used by every
+                page.
+            workers: (int Default=None) Number of worker processes.  If
+                None, the number of CPUs is used.
+        """
+        self.payload = payload
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_page_job,
+            initargs=(payload,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Wait for the pending pages and stop the workers."""
+        self._executor.shutdown()
+
+    def map(self, pages, filename_root, cfg=GDConfig(), theme=None):
+        """Returns an iterator of the SVG bytes of each page, in order.
+
+        (See render_svg_bytes() for the arguments.)
+        """
+        return self._executor.map(
+            _page_job, pages, itertools.repeat(filename_root),
+            itertools.repeat(cfg), itertools.repeat(theme))
 
-def write_svg(dwg, name_root, cfg=GDConfig()):
-    """Saves the SVG to the current directory
+
+def render_pages(pages, filename_root, name_root, cfg=GDConfig(),
+                 payload=None, theme=None, pool=None):
+    """Render page Layouts to an SVG per page, in parallel.
+
+    The layout of each page is fixed by paginate_layout(), so the pages
+    are rendered independently by the worker processes of a PagePool.
+    The SVGs are saved (in page order) by the current process.
 
     Args:
-        dwg: (svg.drawing.Drawing) A svgwrite Drawing to save to disk.
-        name_root: (str) root for the output SVG file.
+        pages: (list) Page Layouts (see paginate_layout()).
+        filename_root: (str) root of the CSV file (used to find its
+            stylesheet).
+        name_root: (str) root for the output files ('<root>_p01.svg',
+            ..., '<root>.pdf', '<root>_p01.png', ...).
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+        payload: (StylePayload Default=None) Previously fetched fonts
+            and stylesheets (see embed_style()).
+        theme: (Theme Default=None) Theme to render.
+        pool: (PagePool Default=None) Pool of the run.  If None (or if
+            its payload is not 'payload'), a PagePool of
+            'cfg.page_workers' workers is started for these pages.  If
+            'cfg.page_workers' is 1, the pages are rendered in the
+            current process.
+
+    Returns:
+        A list of the saved filenames: the SVG of each page followed by
+        the exported PDF and PNG files (see GDConfig 'exports').
+    """
+    if payload is None:
+        payload = fetch_style(cfg)
+    theme_cfg = cfg if theme is None else theme.configure(cfg)
+    # The profiler and the sink stay in this process.
+    job_cfg = copy.copy(cfg)
+    job_cfg.profiler = None
+    job_cfg.sink = None
+    filenames = []
+    with contextlib.ExitStack() as stack:
+        if cfg.page_workers == 1 or len(pages) == 1:
+            rendered = (render_svg_bytes(page, filename_root, job_cfg,
+                                         payload, theme) for page in pages)
+        else:
+            if pool is None or pool.payload is not payload:
+                pool = stack.enter_context(PagePool(payload,
+                                                    cfg.page_workers))
+            rendered = pool.map(pages, filename_root, job_cfg, theme)
+        for number in range(1, len(pages) + 1):
+            with profile_stage(cfg, 'render'):
+                data = next(rendered)
+            with profile_stage(cfg, 'write_svg'):
+                filenames.append(save_svg(bytes_writer(data),
+                                          page_root(name_root, number),
+                                          theme_cfg))
+
+    stylesheets = (cascade_stylesheets(filename_root, theme_cfg, payload,
+                                       theme)
+                   if theme_cfg.exports else None)
+    for output_format in theme_cfg.exports:
+        with profile_stage(cfg, 'export_' + output_format):
+            if output_format == 'pdf':
+                filenames.append(export_layout(
+                    pages, name_root + '.pdf', theme_cfg, output_format,
+                    stylesheets))
+                continue
+            for number, page in enumerate(pages, 1):
+                filenames.append(export_layout(
+                    page, '{}.{}'.format(page_root(name_root, number),
+                                         output_format),
+                    theme_cfg, output_format, stylesheets))
+    return filenames
+
+
+def render_svgs(layout, filename_root, svg_root, cfg=GDConfig(),
+                payload=None, pool=None):
+    """Render a Layout to an SVG file for each configured theme.
+
+    Args:
+        layout: (Layout) Layout computed by layout_csv_data().
+        filename_root: (str) root of the CSV file (used to find its
+            stylesheet).
+        svg_root: (str) root for the output SVG files.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+        payload: (StylePayload/StyleFetch Default=None) Previously
+            fetched fonts and stylesheets (see embed_style()), or a
+            StyleFetch that is joined before the first SVG is written.
+        pool: (PagePool Default=None) Pool rendering the pages.  If None,
+            a single PagePool is started for every theme (see
+            render_pages()).
+
+    Returns:
+        A list of the saved filenames: each SVG followed by its exported
+        PDF and PNG files (see GDConfig 'exports').  If 'cfg.page_height'
+        is set, the layout is split into pages (see render_pages()).
+    """
+    if payload is None:
+        payload = StyleFetch(cfg)
+    if isinstance(payload, StyleFetch):
+        with profile_stage(cfg, 'fetch_style'):
+            payload = payload.result()
+    if cfg.sink is None:
+        # The '_<#>' indexes of the FileSink only last for this call.
+        cfg = copy.copy(cfg)
+        cfg.sink = FileSink()
+
+    filenames = []
+    if cfg.page_height is not None:
+        pages = paginate_layout(layout, cfg.page_height, cfg)
+        logger.info('{} page(s) of {} pixels'.format(len(pages),
+                                                     cfg.page_height))
+        with contextlib.ExitStack() as stack:
+            if pool is None and cfg.page_workers != 1 and len(pages) > 1:
+                pool = stack.enter_context(PagePool(payload,
+                                                    cfg.page_workers))
+            for theme, name_root in output_roots(svg_root, cfg):
+                filenames.extend(render_pages(pages, filename_root,
+                                              name_root, cfg, payload,
+                                              theme, pool))
+        return filenames
+
+    chars = layout.chars() if cfg.subset_fonts else None
+    for theme, name_root in output_roots(svg_root, cfg):
+        theme_cfg = cfg if theme is None else theme.configure(cfg)
+        extend_tag_colors(theme_cfg, layout.column_count)
+        dwg = new_drawing(name_root + '.svg', theme_cfg)
+        with profile_stage(cfg, 'embed_style'):
+            embed_style(dwg, filename_root, theme_cfg, payload, theme,
+                        chars)
+        with profile_stage(cfg, 'render'):
+            render_layout(dwg, layout, theme_cfg, payload.images)
+        with profile_stage(cfg, 'write_svg'):
+            svg_filename = write_svg(dwg, name_root, theme_cfg)
+        filenames.append(svg_filename)
+        stylesheets = (cascade_stylesheets(filename_root, theme_cfg, payload,
+                                           theme)
+                       if theme_cfg.exports else None)
+        for output_format in theme_cfg.exports:
+            with profile_stage(cfg, 'export_' + output_format):
+                filenames.append(export_layout(
+                    layout, '{}.{}'.format(os.path.splitext(svg_filename)[0],
+                                           output_format),
+                    theme_cfg, output_format, stylesheets))
+    return filenames
+
+
+class _ByteCounter(object):
+    """Text file stand-in that counts the UTF-8 bytes written to it."""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text.encode('utf-8'))
+
+
+def svg_size(layout, filename_root, cfg=GDConfig(), payload=None,
+             theme=None, style_mode=None):
+    """Returns the size in bytes of the compact SVG of a Layout.
+
+    The SVG is rendered with the streaming backend and is not saved.
+
+    Args:
+        layout: (Layout) Layout computed by layout_csv_data().
+        filename_root: (str) root of the CSV file.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+        payload: (StylePayload Default=None) Previously fetched fonts
+            and stylesheets (see embed_style()).
+        theme: (Theme Default=None) Theme to render.
+        style_mode: (str Default=None) Style mode to use instead of
+            'cfg.style_mode'.
+    """
+    size_cfg = copy.copy(cfg)
+    size_cfg.backend = 'stream'
+    if style_mode is not None:
+        size_cfg.style_mode = style_mode
+    dwg = new_drawing(filename_root + '.svg', size_cfg)
+    embed_style(dwg, filename_root, size_cfg, payload, theme,
+                layout.chars() if cfg.subset_fonts else None)
+    render_layout(dwg, layout, size_cfg,
+                  None if payload is None else payload.images)
+    counter = _ByteCounter()
+    dwg.write(counter)
+    return counter.size
+
+
+def render_csv_file(csv_filename, cfg=GDConfig(), payload=None,
+                    pool=None):
+    """Load, process, and save a single CSV file without prompting.
+
+    Args:
+        csv_filename: (str) CSV filename to render.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+        payload: (StylePayload Default=None) Previously fetched fonts
+            and stylesheets (see embed_style()).  If None, they are
+            fetched while the CSV file is laid out.
+        pool: (PagePool Default=None) Pool rendering the pages (see
+            render_svgs()).
+
+    Returns:
+        A list of the saved filenames (see render_svgs()).
+    """
+    if payload is None:
+        payload = StyleFetch(cfg)
+    with profile_stage(cfg, 'layout'):
+        filename_root, records = read_csv(csv_filename)
+        layout = layout_csv_data(records, cfg)
+    if cfg.profiler is not None:
+        cfg.profiler.count_layout(layout)
+    return render_svgs(layout, filename_root, filename_root, cfg, payload,
+                       pool)
+
+
+def _batch_job(csv_filename, cfg, payload, pool=None):
+    """Worker process entry point for batch_create_gd().
+
+    Returns:
+        A (csv_filename, svg_filenames, seconds, error, profile, files)
+        tuple.  Either 'svg_filenames' or 'error' is None.  If
+        'cfg.profiler' is set, the job is profiled with a new Profiler
+        and 'profile' is its report() (otherwise it is None).  If
+        'cfg.sink' is a BufferSink, the job saves to a new BufferSink and
+        'files' are its files (otherwise it is None).
+    """
+    start = time.perf_counter()
+    if cfg.profiler is not None or isinstance(cfg.sink, BufferSink):
+        cfg = copy.copy(cfg)
+        if cfg.profiler is not None:
+            cfg.profiler = Profiler()
+        if isinstance(cfg.sink, BufferSink):
+            cfg.sink = BufferSink()
+    try:
+        svg_filenames = render_csv_file(csv_filename, cfg, payload, pool)
+        error = None
+    except Exception as exc:  # pylint: disable=broad-except
+        svg_filenames = None
+        error = '{}: {}'.format(type(exc).__name__, exc)
+    return (csv_filename, svg_filenames, time.perf_counter() - start, error,
+            None if cfg.profiler is None else cfg.profiler.report(),
+            cfg.sink.files if isinstance(cfg.sink, BufferSink) else None)
+
+
+def print_batch_summary(results, elapsed, up_to_date=()):
+    """Print per-file timings and failures of a batch run.
+
+    Args:
+        results: (list) (csv_filename, svg_filenames, seconds, error,
+            profile) tuples returned by the batch jobs.
+        elapsed: (float) Wall time of the whole batch in seconds.
+        up_to_date: (list Default=()) CSV filenames that were skipped
+            because their SVG is up-to-date.
+    """
+    failures = [result for result in results if result[3] is not None]
+    logger.info('-' * 79)
+    for csv_filename, _, seconds, error, _ in results:
+        logger.info('{:>8.3f}s  {:<6s} {}'.format(
+            seconds, 'FAIL' if error else 'ok', csv_filename))
+    for csv_filename in up_to_date:
+        logger.info('{:>9s}  {:<6s} {}'.format('-', 'skip', csv_filename))
+    logger.info('-' * 79)
+    logger.info('{} file(s) rendered, {} up-to-date, {} failed in '
+                '{:.3f}s'.format(len(results) - len(failures),
+                                 len(up_to_date), len(failures), elapsed))
+    for csv_filename, _, _, error, _ in failures:
+        logger.error('  {}: {}'.format(csv_filename, error))
+
+
+def batch_create_gd(targets, cfg=GDConfig(), workers=None):
+    """Render every CSV file found in 'targets' using a process pool.
+
+    The Google fonts and 'default.css' are fetched once and shared by
+    all of the jobs.  Each SVG is saved next to its CSV file.  If
+    'cfg.incremental' is set, only the CSV files whose inputs changed
+    since the last run are rendered (see incremental_build()).  If
+    'cfg.validate' is set, the CSV files with validation errors are
+    rejected before the fonts are fetched.
+
+    Args:
+        targets: (str/list) Directories, glob patterns or CSV filenames.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+        workers: (int Default=None) Number of worker processes.  If None,
+            the number of CPUs is used.  If 1, the files are rendered in
+            the current process.
+
+    Returns:
+        A list of (csv_filename, svg_filenames, seconds, error, profile)
+        tuples in the order the CSV files were found (up-to-date files
+        are not included).  The profiles of the jobs are also added to
+        'cfg.profiler'.
+    """
+    if isinstance(targets, str):
+        targets = [targets]
+
+    csv_filenames = []
+    for target in targets:
+        for csv_filename in find_csv_files(target):
+            if csv_filename not in csv_filenames:
+                csv_filenames.append(csv_filename)
+
+    start = time.perf_counter()
+    up_to_date = []
+    incremental = incremental_build(cfg)
+    if incremental:
+        manifest = BuildManifest(cfg.manifest)
+        digests = {}
+        for csv_filename in csv_filenames:
+            filename_root = csv_filename[0:-4]
+            digests[csv_filename] = input_digest(csv_filename, filename_root,
+                                                 cfg)
+            if manifest.is_current(filename_root, digests[csv_filename],
+                                   cfg):
+                up_to_date.append(csv_filename)
+        csv_filenames = [csv_filename for csv_filename in csv_filenames
+                         if csv_filename not in up_to_date]
+
+    rejected = {}
+    if cfg.validate:
+        for csv_filename in csv_filenames:
+            errors = log_diagnostics(validate_csv(csv_filename, cfg))
+            if errors:
+                rejected[csv_filename] = (
+                    csv_filename, None, 0.0,
+                    '{} validation error(s)'.format(errors),
+                    None if cfg.profiler is None else Profiler().report())
+        found = csv_filenames
+        csv_filenames = [csv_filename for csv_filename in csv_filenames
+                         if csv_filename not in rejected]
+
+    results = []
+    if csv_filenames:
+        with profile_stage(cfg, 'fetch_style'):
+            payload = fetch_style(cfg)
+        if cfg.autofit_tags:
+            # Load the font metrics before the worker processes start.
+            text_measurer(cfg)
+        if cfg.embed_images:
+            # Encode every image once here rather than once per worker.
+            for csv_filename in csv_filenames:
+                payload.images.prefetch(
+                    [filename for filename, kind in input_files(
+                        csv_filename, csv_filename[0:-4], cfg)
+                     if kind == 'image'], cfg)
+        job_cfg = cfg
+        if cfg.profiler is not None:
+            # The profiler hooks may not be picklable; each job reports
+            # to its own Profiler and the reports are merged below.
+            job_cfg = copy.copy(cfg)
+            job_cfg.profiler = Profiler()
+        if cfg.sink is not None and not cfg.sink.process_safe:
+            # Each job saves to memory; the files are passed on below.
+            job_cfg = copy.copy(job_cfg)
+            job_cfg.sink = BufferSink()
+        if workers == 1 or len(csv_filenames) == 1:
+            with contextlib.ExitStack() as stack:
+                pool = None
+                if cfg.page_height is not None and cfg.page_workers != 1:
+                    # One pool renders the pages of every file.
+                    pool = stack.enter_context(PagePool(payload,
+                                                        cfg.page_workers))
+                results = [_batch_job(csv_filename, job_cfg, payload, pool)
+                           for csv_filename in csv_filenames]
+        else:
+            # The files are rendered in parallel rather than their pages,
+            # so no worker starts a pool of its own.
+            job_cfg = copy.copy(job_cfg)
+            job_cfg.page_workers = 1
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(
+                    _batch_job,
+                    csv_filenames,
+                    [job_cfg] * len(csv_filenames),
+                    [payload] * len(csv_filenames)))
+        if cfg.profiler is not None:
+            for result in results:
+                cfg.profiler.merge(result[4])
+        for result in results:
+            for filename, data in (result[5] or {}).items():
+                cfg.sink.save(filename, bytes_writer(data))
+        results = [result[:5] for result in results]
+    elif not up_to_date and not rejected:
+        logger.warning('No CSV files found in {}'.format(', '.join(targets)))
+    if rejected:
+        rendered = iter(results)
+        results = [rejected[csv_filename] if csv_filename in rejected
+                   else next(rendered) for csv_filename in found]
+
+    if incremental:
+        for csv_filename, svg_filenames, _, error, _ in results:
+            if error is None:
+                manifest.record(svg_filenames, digests[csv_filename])
+        manifest.save()
+
+    print_batch_summary(results, time.perf_counter() - start, up_to_date)
+    return results
+
+
+def _file_stamp(filename):
+    """Returns the (mtime, size) of a file, or None if it is missing."""
+    try:
+        stat_result = os.stat(filename)
+    except OSError:
+        return None
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+class WatchedSheet(object):
+    """A CSV file re-rendered by watch() when one of its inputs changes.
+
+    Attributes:
+        csv_filename: (str) CSV filename.
+        filename_root: (str) root of the CSV filename.
+        svg_root: (str) root for the output SVG files.
+        stamps: (dict) (mtime, size) of each input file keyed by
+            filename (None for missing files).
+        kinds: (dict) Kind of each input file (see input_files()).
+        layout: (Layout) Layout of the last render (None until the CSV
+            has been laid out).
+    """
+
+    def __init__(self, csv_filename, svg_root=None):
+        """Initializes a WatchedSheet object."""
+        self.csv_filename = csv_filename
+        self.filename_root = csv_filename[0:-4]
+        self.svg_root = self.filename_root if svg_root is None else svg_root
+        self.stamps = {}
+        self.kinds = {csv_filename: 'csv'}
+        self.layout = None
+
+    def scan(self, cfg=GDConfig()):
+        """Look up the input files of the CSV and record their stamps."""
+        if os.access(self.csv_filename, os.R_OK):
+            self.kinds = dict(input_files(self.csv_filename,
+                                          self.filename_root, cfg))
+        self.stamps = {filename: _file_stamp(filename)
+                       for filename in self.kinds}
+
+    def changed(self):
+        """Returns the input files that changed since the last check."""
+        changed = []
+        for filename in self.kinds:
+            stamp = _file_stamp(filename)
+            if stamp != self.stamps.get(filename):
+                self.stamps[filename] = stamp
+                changed.append(filename)
+        return changed
+
+    def render(self, changed, cfg=GDConfig(), payload=None):
+        """Render the SVGs, laying the CSV out again only if needed.
+
+        Stylesheet changes reuse the previous Layout.  CSV and image
+        changes (an image appearing or disappearing changes the layout)
+        lay the CSV out again.
+
+        Args:
+            changed: (list) Changed input files (see changed()).
+            cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+                configuration to use.
+            payload: (StylePayload Default=None) Previously fetched
+                fonts and stylesheets.  Changed stylesheets are read
+                again.
+
+        Returns:
+            A list of the saved filenames (see render_svgs()).
+        """
+        for filename in changed:
+            if self.kinds[filename] == 'css' and payload is not None:
+                payload.stylesheets.pop(filename, None)
+                if filename == 'default.css' and not cfg.link_stylesheet:
+                    if payload.read_stylesheet(filename) is None:
+                        del payload.stylesheets[filename]
+
+        if self.layout is None or any(self.kinds[filename] != 'css'
+                                      for filename in changed):
+            self.scan(cfg)
+            with open(self.csv_filename, 'rb') as csv_file:
+                self.layout = layout_csv_data(_stream_records(csv_file), cfg)
+        return render_svgs(self.layout, self.filename_root, self.svg_root,
+                           cfg, payload)
+
+
+def watch(csv_filenames, cfg=GDConfig(), svg_root=None, interval=0.05,
+          debounce=0.1):
+    """Re-render CSV files whenever they or their inputs change.
+
+    The CSV files, '<root>.css', 'default.css', the theme stylesheets
+    and the images named in 'Extras' sections are polled every
+    'interval' seconds.  Once a change has settled for 'debounce'
+    seconds (editors often write a file in several steps), only the
+    affected sheets are rendered again, overwriting their SVGs in
+    place.  The fonts and 'default.css' are fetched once, and the
+    layout of a sheet is reused when only a stylesheet changed.  Runs
+    until interrupted (Ctrl+C).
+
+    Args:
+        csv_filenames: (list) CSV filenames to watch.
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use ('overwrite' is always set).
+        svg_root: (str Default=None) root for the output SVG files of a
+            single CSV file.  If None, the root of each CSV filename is
+            used.
+        interval: (float Default=0.05) Seconds between polls.
+        debounce: (float Default=0.1) Seconds without further changes
+            before rendering.
+    """
+    cfg = copy.copy(cfg)
+    cfg.overwrite = True
+    payload = fetch_style(cfg)
+    sheets = [WatchedSheet(csv_filename,
+                           svg_root if len(csv_filenames) == 1 else None)
+              for csv_filename in csv_filenames]
+    pending = {}
+    for sheet in sheets:
+        sheet.scan(cfg)
+        pending[sheet] = []
+
+    logger.info('Watching {} CSV file(s) for changes (Ctrl+C to stop)'.format(
+        len(sheets)))
+    last_change = 0
+    try:
+        while True:
+            for sheet in sheets:
+                changed = sheet.changed()
+                if changed:
+                    pending.setdefault(sheet, []).extend(changed)
+                    last_change = time.perf_counter()
+
+            if pending and time.perf_counter() - last_change >= debounce:
+                for sheet, changed in pending.items():
+                    if not os.access(sheet.csv_filename, os.R_OK):
+                        continue
+                    start = time.perf_counter()
+                    try:
+                        sheet.render(changed, cfg, payload)
+                    except Exception as exc:  # pylint: disable=broad-except
+                        logger.error('Failed to render {}: {}: {}'.format(
+                            sheet.csv_filename, type(exc).__name__, exc))
+                    else:
+                        logger.info('Rendered {} in {:.3f}s'.format(
+                            sheet.csv_filename, time.perf_counter() - start))
+                pending = {}
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def write_layout_svg(layout, fileobj, filename_root='stdin', cfg=GDConfig(),
+                     payload=None, theme=None):
+    """Render a Layout to a file object (nothing is saved to disk).
+
+    Args:
+        layout: (Layout) Layout computed by layout_csv_data().
+        fileobj: (file) File object opened in text mode or in binary
+            mode (the SVG is UTF-8 encoded), e.g., an io.StringIO.
+        filename_root: (str Default='stdin') root of the CSV file (used
+            to find its stylesheet).
+        cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
+            configuration to use.
+        payload: (StylePayload/StyleFetch Default=None) Previously
+            fetched fonts and stylesheets (see embed_style()), or a
+            StyleFetch to join.
+        theme: (Theme Default=None) Theme to render.
+    """
+    if theme is not None:
+        cfg = theme.configure(cfg)
+    if payload is None:
+        payload = fetch_style(cfg)
+    elif isinstance(payload, StyleFetch):
+        payload = payload.result()
+    extend_tag_colors(cfg, layout.column_count)
+    dwg = new_drawing(filename_root + '.svg', cfg)
+    embed_style(dwg, filename_root, cfg, payload, theme,
+                layout.chars() if cfg.subset_fonts else None)
+    render_layout(dwg, layout, cfg, payload.images)
+    if isinstance(fileobj, io.TextIOBase) or hasattr(fileobj, 'encoding'):
+        dwg.write(fileobj, pretty=cfg.pretty)
+    else:
+        svg_file = io.StringIO()
+        dwg.write(svg_file, pretty=cfg.pretty)
+        fileobj.write(svg_file.getvalue().encode('utf-8'))
+
+
+def render_svg_bytes(layout, filename_root='stdin', cfg=GDConfig(),
+                     payload=None, theme=None):
+    """Render a Layout to SVG bytes in memory (nothing is saved).
+
+    Args:
+        (See write_layout_svg())
+
+    Returns:
+        The UTF-8 encoded SVG document (the same bytes write_svg() would
+        save).
+    """
+    svg_file = io.BytesIO()
+    write_layout_svg(layout, svg_file, filename_root, cfg, payload, theme)
+    return svg_file.getvalue()
+
+
+def csv_records(source):
+    """Returns the records of CSV data given in any supported form.
+
+    Args:
+        source: (str/bytes/file/iterable) The contents of a CSV file (as
+            a str or as bytes), a file object opened in binary or text
+            mode, or an iterable of records (lists of fields) or of CSV
+            lines.
+
+    Returns:
+        An iterator of records or CSV lines (see layout_csv_data()).
+    """
+    if isinstance(source, bytes):
+        return _stream_records(io.BufferedReader(io.BytesIO(source)))
+    if isinstance(source, str):
+        return iter_records(io.StringIO(source, newline=''),
+                            sniff_delimiter(source[:4096]))
+    if isinstance(source, io.TextIOBase) or hasattr(source, 'encoding'):
+        return sniff_records(source)
+    if hasattr(source, 'read'):
+        return _stream_records(source, close=False)
+    return iter(source)
+
+
+def render_csv_to(fileobj, source, cfg=GDConfig(), name='stdin',
+                  payload=None, theme=None):
+    """Render CSV data to a file object without touching any files.
+
+    This is the in-memory counterpart of create_gd(): nothing is
+    prompted for or saved, and progress is only reported through the
+    'tagscript' logger.  Fetch the fonts once with fetch_style() (or
+    build a StylePayload) and pass the payload to render any number of
+    sheets without further network or disk access (stylesheets missing
+    from the payload are read from disk once).
+        e.g., `render_csv(open('ProMini.csv', 'rb'), name='ProMini')`
+        e.g., `render_csv([['Name', 'Pin'], ['Right', ''],
+                           ['D13', 'SCK']], payload=StylePayload())`
+
+    Args:
+        fileobj: (file) File object opened in text or binary mode.
+        source: (str/bytes/file/iterable) CSV data (see csv_records()).
         cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
             configuration to use.
+        name: (str Default='stdin') CSV filename root, used to find the
+            '<name>.css' stylesheet.
+        payload: (StylePayload Default=None) Previously fetched fonts
+            and stylesheets.  If None, they are fetched (see StyleFetch)
+            while the CSV data is laid out.
+        theme: (Theme Default=None) Theme to render.
+
+    Raises:
+        ValueError: The CSV data is empty.
+    """
+    if payload is None:
+        payload = StyleFetch(cfg)
+    layout = layout_csv_data(csv_records(source), cfg)
+    write_layout_svg(layout, fileobj, name, cfg, payload, theme)
+
+
+def render_csv(source, cfg=GDConfig(), name='stdin', payload=None,
+               theme=None):
+    """Render CSV data to an SVG str (see render_csv_to())."""
+    svg_file = io.StringIO()
+    render_csv_to(svg_file, source, cfg, name, payload, theme)
+    return svg_file.getvalue()
+
+
+def render_csv_bytes(source, cfg=GDConfig(), name='stdin', payload=None,
+                     theme=None):
+    """Render CSV data to UTF-8 SVG bytes (see render_csv_to())."""
+    svg_file = io.BytesIO()
+    render_csv_to(svg_file, source, cfg, name, payload, theme)
+    return svg_file.getvalue()
+
+
+def _parse_bool(value):
+    """Parse a query string flag ('1', 'true', 'yes', 'on', '0', ...)."""
+    if value.lower() in ('1', 'true', 'yes', 'on'):
+        return True
+    if value.lower() in ('0', 'false', 'no', 'off'):
+        return False
+    raise ValueError('Not a boolean: {!r}'.format(value))
+
+
+def _parse_number(value):
+    """Parse an int (or a float if it is not a whole number).
+
+    Raises:
+        ValueError: Not a number, or not finite ('nan', 'inf').
+    """
+    number = float(value)
+    if not isfinite(number):
+        raise ValueError('Not a finite number: {!r}'.format(value))
+    return int(number) if number.is_integer() else number
+
+
+def _parse_pair(value):
+    """Parse a comma-separated pair of numbers (e.g., '45,12')."""
+    numbers = [_parse_number(number) for number in value.split(',')]
+    if len(numbers) != 2:
+        raise ValueError('Expected two numbers: {!r}'.format(value))
+    return numbers
+
+
+# Largest request body (CSV data) accepted by the render server.
+SERVE_MAX_BYTES = 16 * 1024 * 1024
+
+# GDConfig options that can be overridden by render server requests and
+# the functions parsing their query string values.
+SERVE_OPTIONS = {
+    'font': str,
+    'google_font': str,
+    'font_size': _parse_number,
+    'tag_txt_margins': _parse_pair,
+    'tag_size': _parse_pair,
+    'tag_margins': _parse_pair,
+    'image_size': _parse_pair,
+    'text_line_height': _parse_number,
+    'link_stylesheet': _parse_bool,
+    'pretty': _parse_bool,
+    'backend': str,
+    'style_mode': str,
+    'tag_symbols': _parse_bool,
+}
+
+
+# Most font configurations (other than the base one) whose StylePayloads
+# a render server keeps.
+SERVE_MAX_PAYLOADS = 8
+
+# RenderService shared by the _render_job() calls of a server worker.
+_RENDER_JOB = {}
+
+
+def _init_render_job(service):
+    """Worker process initializer of RenderService."""
+    _RENDER_JOB['service'] = service
+
+
+def _render_job(data, cfg, name, theme):
+    """Worker process entry point of RenderService."""
+    return _RENDER_JOB['service'].render_config(data, cfg, name, theme)
+
+
+class RenderService(object):
+    """Renders CSV data to SVG bytes with warm fonts and stylesheets.
+
+    The Google fonts and 'default.css' are fetched once for each font
+    configuration and shared by every request (see StylePayload).
+    Renders are CPU bound, so they run in worker processes, which start
+    with the StylePayload of the base configuration.  render() may be
+    called from several threads at once.
+        e.g., `with RenderService(cfg) as service:`
+              `    svg = service.render(data, {'style_mode': 'class'})`
+
+    Attributes:
+        cfg: (GDConfig) Base configuration of every render.
+        workers: (int) Number of worker processes.  If 1, the renders
+            run in the calling thread.
+        payloads: (OrderedDict) StylePayloads keyed by (font,
+            google_font, link_stylesheet), at most SERVE_MAX_PAYLOADS
+            besides the one of 'cfg' (the least recently used are
+            dropped first).
+    """
+
+    def __init__(self, cfg=GDConfig(), workers=None):
+        """Initializes a RenderService, fetching the configured fonts.
+
+        Args:
+            cfg: (GDConfig Default=GDConfig()) Base configuration of
+                every render.
+            workers: (int Default=None) Number of worker processes.  If
+                None, the number of CPUs is used.  If 1, the renders run
+                in the calling thread.
+        """
+        self.cfg = cfg
+        self.workers = workers
+        self.payloads = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._base_key = self._payload_key(cfg)
+        self._base_payload = fetch_style(cfg)
+        self._executor = None
+        if workers != 1:
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_render_job,
+                initargs=(self,))
+
+    def __getstate__(self):
+        # Workers get the warm payloads, but neither the lock nor the
+        # pool.
+        state = self.__dict__.copy()
+        del state['_lock']
+        state['_executor'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Wait for the pending renders and stop the workers."""
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    @staticmethod
+    def _payload_key(cfg):
+        return (cfg.font, cfg.google_font, cfg.link_stylesheet)
+
+    def payload(self, cfg):
+        """Returns the (cached) StylePayload of a configuration."""
+        key = self._payload_key(cfg)
+        if key == self._base_key:
+            return self._base_payload
+        with self._lock:
+            if key in self.payloads:
+                self.payloads.move_to_end(key)
+            else:
+                self.payloads[key] = fetch_style(cfg)
+                while len(self.payloads) > SERVE_MAX_PAYLOADS:
+                    self.payloads.popitem(last=False)
+            return self.payloads[key]
+
+    def configure(self, options):
+        """Returns a copy of 'cfg' with request overrides applied.
+
+        Args:
+            options: (dict) Option names and query string values (see
+                SERVE_OPTIONS).
+
+        Raises:
+            ValueError: Unknown option or invalid value.
+        """
+        cfg = copy.copy(self.cfg)
+        for name, value in options.items():
+            if name not in SERVE_OPTIONS:
+                raise ValueError('Unknown option: {!r}'.format(name))
+            setattr(cfg, name, SERVE_OPTIONS[name](value))
+        if cfg.backend not in ('svgwrite', 'stream'):
+            raise ValueError('Unknown backend: {!r}'.format(cfg.backend))
+        if cfg.style_mode not in ('inline', 'class'):
+            raise ValueError('Unknown style_mode: {!r}'.format(
+                cfg.style_mode))
+        return cfg
+
+    def render(self, data, options=None, name='stdin', theme=None):
+        """Render CSV data to SVG bytes.
+
+        Args:
+            data: (bytes) Contents of a CSV file.
+            options: (dict Default=None) GDConfig overrides (see
+                configure()).
+            name: (str Default='stdin') CSV filename root, used to find
+                the '<name>.css' stylesheet.
+            theme: (str Default=None) Name of one of the configured
+                themes to render.
+
+        Returns:
+            The UTF-8 encoded SVG document.
+
+        Raises:
+            ValueError: Invalid options, name or theme, or empty data.
+        """
+        cfg = self.configure(options or {})
+        if os.path.isabs(name) or '..' in name.replace('\\', '/').split('/'):
+            raise ValueError('Invalid name: {!r}'.format(name))
+        selected = None
+        if theme is not None:
+            themes = {item.name: item for item in cfg.themes or []}
+            if theme not in themes:
+                raise ValueError('Unknown theme: {!r}'.format(theme))
+            selected = themes[theme]
+
+        if self._executor is None:
+            return self.render_config(data, cfg, name, selected)
+        return self._executor.submit(_render_job, data, cfg, name,
+                                     selected).result()
+
+    def render_config(self, data, cfg, name='stdin', theme=None):
+        """Render CSV data to SVG bytes in the calling thread.
+
+        Args:
+            data: (bytes) Contents of a CSV file.
+            cfg: (GDConfig) Configuration returned by configure().
+            name: (str Default='stdin') CSV filename root.
+            theme: (Theme Default=None) Theme to render.
+
+        Returns:
+            The UTF-8 encoded SVG document.
+        """
+        return render_csv_bytes(data, cfg, name, self.payload(cfg), theme)
+
+
+class _RenderHandler(BaseHTTPRequestHandler):
+    """HTTP interface of a RenderService (see serve())."""
+
+    def address_string(self):
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return 'unix'
+
+    def _reply(self, status, body, content_type='text/plain; charset=utf-8'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlsplit(self.path).path == '/health':
+            self._reply(200, b'ok\n')
+        else:
+            self._reply(404, b'Not found\n')
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/render':
+            self._reply(404, b'Not found\n')
+            return
+        options = {name: values[-1]
+                   for name, values in parse_qs(url.query).items()}
+        name = options.pop('name', 'stdin')
+        theme = options.pop('theme', None)
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._reply(400, b'Invalid Content-Length\n')
+            return
+        if length > SERVE_MAX_BYTES:
+            self.close_connection = True
+            self._reply(413, 'Request body larger than {} bytes\n'.format(
+                SERVE_MAX_BYTES).encode('utf-8'))
+            return
+        data = self.rfile.read(length)
+        try:
+            svg = self.server.service.render(data, options, name, theme)
+        except (ValueError, OverflowError, csv.Error) as exc:
+            self._reply(400, '{}\n'.format(exc).encode('utf-8'))
+        except Exception:
+            logger.exception('Render of {!r} failed'.format(name))
+            self._reply(500, b'Internal server error\n')
+        else:
+            self._reply(200, svg, 'image/svg+xml')
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn,
+                               socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(address, cfg=GDConfig(), workers=None):
+    """Serve SVG renders over HTTP until interrupted.
+
+    `POST /render` with the contents of a CSV file as the request body
+    returns the SVG (image/svg+xml).  GDConfig options listed in
+    SERVE_OPTIONS can be overridden in the query string, along with
+    'name' (the CSV filename root used to find '<name>.css') and
+    'theme' (one of the configured themes):
+        e.g., `curl --data-binary @ProMini.csv
+               'localhost:8000/render?name=ProMini&style_mode=class'`
+    Invalid requests get a 400 response with the error message, bodies
+    larger than SERVE_MAX_BYTES a 413 response and unexpected errors a
+    500 response.  Each request is handled in its own thread, which
+    hands the render to a pool of worker processes, so renders run in
+    parallel on every core; fonts and stylesheets are fetched once and
+    shared (see RenderService).
+
+    Args:
+        address: (str) '[HOST:]PORT' (HOST defaults to 127.0.0.1) or
+            'unix:PATH' to listen on a Unix domain socket.
+        cfg: (GDConfig Default=GDConfig()) Base configuration of every
+            render.
+        workers: (int Default=None) Number of render worker processes.
+            If None, the number of CPUs is used.  If 1, each request is
+            rendered in its own thread.
     """
-    new_name = name_root
-    if not cfg.overwrite:
-        i = 2
-        while os.access(new_name + '.svg', os.F_OK):
-            new_name = '{0}_{1:02d}'.format(name_root, i)
-            i += 1
+    if address.startswith('unix:'):
+        path = address[5:]
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            os.remove(path)
+        server = _ThreadingUnixHTTPServer(path, _RenderHandler)
+    else:
+        host, _, port = address.rpartition(':')
+        server = _ThreadingHTTPServer((host or '127.0.0.1', int(port)),
+                                      _RenderHandler)
+    server.service = RenderService(cfg, workers)
+    logger.info('Serving Graphical Datasheets on {}'.format(address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.close()
+        if address.startswith('unix:'):
+            os.remove(address[5:])
+
+
+def print_profile(profiler, output_format='table', file=None):
+    """Print the report of a Profiler.
+
+    Args:
+        profiler: (Profiler) Profiler to report (nothing is printed if
+            None).
+        output_format: (str Default='table') 'table' or 'json'.  If None,
+            nothing is printed.
+        file: (file Default=None) Text file to print to.  If None, the
+            standard error is used, so the report never mixes with an
+            SVG written to the standard output.
+    """
+    if profiler is None or output_format is None:
+        return
+    if file is None:
+        file = stderr
+    if output_format == 'json':
+        print(json.dumps(profiler.report(), indent=1, sort_keys=True),
+              file=file)
+    else:
+        print('-' * 79, file=file)
+        print(profiler.format_table(), file=file)
+
 
-    print('End of File, the output is located at {}.svg'.format(new_name))
-    dwg.saveas(new_name + '.svg', pretty=cfg.pretty)
+def parse_args(args=None):
+    """Parse the command-line arguments.
+
+    Args:
+        args: (list Default=None) Arguments to parse.  If None, the
+            arguments passed to the script are used.
+
+    Returns:
+        An argparse.Namespace.
+    """
+    parser = argparse.ArgumentParser(
+        description='Create a Graphical Datasheet SVG file from a '
+                    'formatted CSV file.')
+    parser.add_argument('source', nargs='?',
+                        help='CSV filename, or a directory/glob pattern '
+                             'to render in batch mode')
+    parser.add_argument('output', nargs='?',
+                        help='SVG filename (single CSV file only), or - '
+                             'for the standard output')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of worker processes used in batch '
+                             'and server mode (default: number of CPUs)')
+    parser.add_argument('--seed-font', action='append', default=[],
+                        metavar='NAME=FILE',
+                        help='pin a local font file as the cached copy of '
+                             'the Google font NAME (may be repeated)')
+    parser.add_argument('--font-timeout', type=float, metavar='SECONDS',
+                        help='time allowed for downloading the Google fonts '
+                             '(default: 30)')
+    parser.add_argument('--backend', choices=('svgwrite', 'stream'),
+                        help='SVG output backend (see GDConfig.backend)')
+    parser.add_argument('--style-mode', choices=('inline', 'class'),
+                        help='write tag styling as attributes (inline) or '
+                             'as a generated stylesheet (class)')
+    parser.add_argument('--tag-symbols', action='store_true',
+                        help='draw tag backgrounds as <use> instances of one '
+                             '<symbol> per column')
+    parser.add_argument('--theme', action='append', default=[],
+                        metavar='NAME[=CSS]',
+                        help='save <root>_NAME.svg styled with the '
+                             'stylesheet CSS instead of <root>.svg (may be '
+                             'repeated)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only render SVGs whose CSV, stylesheets, '
+                             'images or configuration changed')
+    parser.add_argument('--pdf', action='store_true',
+                        help='also save a vector PDF next to each SVG '
+                             '(requires pycairo)')
+    parser.add_argument('--png', action='store_true',
+                        help='also save a PNG image next to each SVG '
+                             '(requires pycairo)')
+    parser.add_argument('--embed-images', action='store_true',
+                        help='embed the Extras images as data URIs instead '
+                             'of linking them')
+    parser.add_argument('--downscale-images', action='store_true',
+                        help='embed the Extras images downscaled to their '
+                             'displayed size (requires Pillow)')
+    parser.add_argument('--autofit', action='store_true',
+                        help='widen the tags of each column to fit its '
+                             'widest label')
+    parser.add_argument('--vectorized', action='store_true',
+                        help='compute the tag positions with NumPy '
+                             '(faster for huge pin tables)')
+    parser.add_argument('--svgz', action='store_true',
+                        help='save gzip compressed .svgz files')
+    parser.add_argument('--svgz-level', type=int, choices=range(1, 10),
+                        metavar='LEVEL',
+                        help='gzip compression level of the .svgz files '
+                             '(1-9, default: 9)')
+    parser.add_argument('--archive', metavar='FILENAME',
+                        help='save every file into a .zip, .tar, .tar.gz, '
+                             '.tar.bz2 or .tar.xz archive instead of next '
+                             'to the CSV files')
+    parser.add_argument('--subset-fonts', action='store_true',
+                        help='embed only the glyphs used on each sheet '
+                             '(requires fontTools)')
+    parser.add_argument('--dpi', type=int,
+                        help='resolution of the PNG images (default: 96)')
+    parser.add_argument('--page-height', type=float, metavar='PIXELS',
+                        help='split the sheet into pages of PIXELS height '
+                             '(an SVG per page and a multi-page PDF)')
+    parser.add_argument('--page-workers', type=int, metavar='N',
+                        help='worker processes rendering the pages '
+                             '(default: number of CPUs)')
+    parser.add_argument('--watch', action='store_true',
+                        help='keep running and render the CSV file(s) '
+                             'again whenever they, their stylesheets or '
+                             'images change')
+    parser.add_argument('--serve', metavar='ADDRESS',
+                        help='run a render server on [HOST:]PORT or '
+                             'unix:PATH instead of rendering files')
+    parser.add_argument('--deterministic', action='store_true',
+                        help='give identical bytes for identical inputs: '
+                             'cached fonts only, stable ids, replaced files '
+                             'only rewritten when changed')
+    parser.add_argument('--lint', action='store_true',
+                        help='check the CSV file(s) and report errors and '
+                             'warnings without rendering')
+    parser.add_argument('--validate', action='store_true',
+                        help='check the CSV file(s) first and do not '
+                             'render the files with errors')
+    parser.add_argument('--profile', nargs='?', const='table',
+                        choices=('table', 'json'),
+                        help='print the time spent in each stage and the '
+                             'element, byte and network counters as a '
+                             'table (default) or as JSON')
+    return parser.parse_args(argv[1:] if args is None else args)
 
 
 def create_gd(cfg=GDConfig()):
@@ -508,21 +4995,193 @@ def create_gd(cfg=GDConfig()):
         cfg: (GDConfig Default=GDConfig()) Graphical Datasheet
             configuration to use.
     """
+    options = parse_args()
+    # Progress goes to the standard error if the SVG goes to the output.
+    logging.basicConfig(stream=stderr if options.output == '-' else stdout,
+                        level=logging.INFO, format='%(message)s')
+    # fontTools reports every subset table at INFO level.
+    logging.getLogger('fontTools').setLevel(logging.WARNING)
+    if options.incremental:
+        cfg.incremental = True
+    if options.backend is not None:
+        cfg.backend = options.backend
+    if options.style_mode is not None:
+        cfg.style_mode = options.style_mode
+    if options.tag_symbols:
+        cfg.tag_symbols = True
+    if options.profile is not None and cfg.profiler is None:
+        cfg.profiler = Profiler()
+    for output_format in ('pdf', 'png'):
+        if (getattr(options, output_format)
+                and output_format not in cfg.exports):
+            cfg.exports.append(output_format)
+    if options.dpi is not None:
+        cfg.dpi = options.dpi
+    if options.page_height is not None:
+        # Whole pixels keep integer layouts integer.
+        cfg.page_height = (int(options.page_height)
+                           if options.page_height.is_integer()
+                           else options.page_height)
+    if options.page_workers is not None:
+        cfg.page_workers = options.page_workers
+    if options.autofit:
+        cfg.autofit_tags = True
+    if options.vectorized:
+        cfg.vectorized_layout = True
+    if options.validate:
+        cfg.validate = True
+    if options.deterministic:
+        cfg.deterministic = True
+    if options.font_timeout is not None:
+        cfg.font_timeout = options.font_timeout
+    if options.subset_fonts:
+        cfg.subset_fonts = True
+    if options.svgz:
+        cfg.svgz = True
+    if options.svgz_level is not None:
+        cfg.svgz_level = options.svgz_level
+    if options.output == '-':
+        cfg.sink = StreamSink()
+    if options.embed_images or options.downscale_images:
+        cfg.embed_images = True
+    if options.downscale_images:
+        cfg.downscale_images = True
+    if cfg.downscale_images and Image is None:
+        logger.error('Downscaling images requires Pillow '
+                     '(pip install Pillow)')
+        sys_exit(1)
+    if cfg.subset_fonts and font_subset is None:
+        logger.error('Font subsetting requires fontTools '
+                     '(pip install fonttools)')
+        sys_exit(1)
+    if cfg.vectorized_layout and np is None:
+        logger.error('The vectorized layout requires NumPy '
+                     '(pip install numpy)')
+        sys_exit(1)
+    if cfg.exports and cairo is None:
+        logger.error('PDF and PNG output requires pycairo '
+                     '(pip install pycairo)')
+        sys_exit(1)
+    if options.theme:
+        cfg.themes = list(cfg.themes or [])
+        for theme in options.theme:
+            name, _, stylesheet = theme.partition('=')
+            cfg.themes.append(Theme(name, stylesheet=stylesheet or None))
+
+    if options.seed_font:
+        cache = FontCache.from_config(cfg)
+        if cache is None:
+            logger.error('The font cache is disabled; fonts were not seeded.')
+            sys_exit(1)
+        for seed in options.seed_font:
+            name, _, filename = seed.partition('=')
+            logger.info('Seeding "{}" from "{}"'.format(name, filename))
+            cache.seed(name, filename)
+        if options.source is None and options.serve is None:
+            return
+
+    if options.serve is not None:
+        serve(options.serve, cfg, options.workers)
+        return
+
+    if options.lint:
+        if options.source is None:
+            logger.error('--lint needs a CSV filename, directory or glob '
+                         'pattern')
+            sys_exit(1)
+        csv_filenames = (find_csv_files(options.source)
+                         if is_batch_target(options.source)
+                         else [options.source])
+        errors = sum(log_diagnostics(validate_csv(csv_filename, cfg))
+                     for csv_filename in csv_filenames)
+        logger.info('{} file(s) checked, {} error(s)'.format(
+            len(csv_filenames), errors))
+        if errors:
+            sys_exit(1)
+        return
+
+    if options.watch:
+        if options.source is None or options.source == '-':
+            logger.error('--watch needs a CSV filename, directory or glob '
+                         'pattern')
+            sys_exit(1)
+        if is_batch_target(options.source):
+            watch(find_csv_files(options.source), cfg)
+        elif (options.output is not None
+              and options.output.lower().endswith('.svg')):
+            watch([options.source], cfg, options.output[0:-4])
+        else:
+            watch([options.source], cfg)
+        return
+
+    if options.archive is not None:
+        cfg.sink = ArchiveSink(options.archive, int(os.environ.get(
+            'SOURCE_DATE_EPOCH', 0)) if cfg.deterministic else None)
+
+    if options.source is not None and is_batch_target(options.source):
+        try:
+            results = batch_create_gd(options.source, cfg, options.workers)
+        finally:
+            if options.archive is not None:
+                cfg.sink.close()
+        print_profile(cfg.profiler, options.profile)
+        if any(result[3] is not None for result in results):
+            sys_exit(1)
+        return
+
     infile = None
     outfile_root = None
-    if len(argv) in (2, 3) and argv[1].lower().endswith('.csv'):
-        infile = argv[1] if len(argv[1]) > 4 else None
+    if options.source is not None and options.source.lower().endswith('.csv'):
+        infile = options.source if len(options.source) > 4 else None
+    elif options.source == '-':
+        infile = '-'
+
+    if options.output is not None and options.output.lower().endswith('.svg'):
+        if len(options.output) > 4:
+            outfile_root = options.output[0:-4]
+    elif (options.output is not None
+          and options.output.lower().endswith('.svgz')):
+        if len(options.output) > 5:
+            outfile_root = options.output[0:-5]
+        cfg.svgz = True
 
-    if len(argv) == 3 and argv[2].lower().endswith('.svg'):
-        outfile_root = argv[2][0:-4] if len(argv[2]) > 4 else None
+    if cfg.validate and infile not in (None, '-'):
+        if log_diagnostics(validate_csv(infile, cfg)):
+            logger.error('"{}" was not rendered'.format(infile))
+            sys_exit(1)
 
-    filename_root, lines = read_csv(infile)
-    dwg = Drawing(filename=filename_root + '.svg')
+    filename_root, records = read_csv(infile)
     svg_root = outfile_root if outfile_root is not None else filename_root
 
-    embed_style(dwg, filename_root, cfg)
-    process_csv_data(dwg, lines, cfg)
-    write_svg(dwg, svg_root, cfg)
+    incremental = incremental_build(cfg, infile)
+    if incremental:
+        manifest = BuildManifest(cfg.manifest)
+        csv_filename = infile if infile is not None else filename_root + '.csv'
+        digest = input_digest(csv_filename, filename_root, cfg)
+        if manifest.is_current(svg_root, digest, cfg):
+            logger.info('"{}.{}" is up-to-date'.format(
+                svg_root, 'svgz' if cfg.svgz else 'svg'))
+            if options.archive is not None:
+                cfg.sink.close()
+            return
+
+    try:
+        # The fonts are downloaded while the CSV is laid out.
+        style = StyleFetch(cfg)
+        with profile_stage(cfg, 'layout'):
+            layout = layout_csv_data(records, cfg)
+        if cfg.profiler is not None:
+            cfg.profiler.count_layout(layout)
+        svg_filenames = render_svgs(layout, filename_root, svg_root, cfg,
+                                    style)
+
+        if incremental:
+            manifest.record(svg_filenames, digest)
+            manifest.save()
+    finally:
+        if options.archive is not None:
+            cfg.sink.close()
+    print_profile(cfg.profiler, options.profile)
 
 
 if __name__ == '__main__':
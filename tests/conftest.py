@@ -0,0 +1,125 @@
+"""Shared fixtures of the tagscript.py tests."""
+
+import io
+import os
+import struct
+import sys
+import zlib
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import tagscript  # noqa: E402  pylint: disable=wrong-import-position
+
+
+@pytest.fixture
+def corpus(monkeypatch):
+    """Returns the bundled CSV files, run from the repository directory."""
+    monkeypatch.chdir(REPO_DIR)
+    return tagscript.find_csv_files('Datasheets')
+
+
+@pytest.fixture
+def payload():
+    """Returns a StylePayload with 'default.css' and no fonts (offline)."""
+    style = tagscript.StylePayload()
+    with open(os.path.join(REPO_DIR, 'default.css'), 'r') as css_file:
+        style.stylesheets['default.css'] = css_file.read()
+    return style
+
+
+@pytest.fixture
+def csv_lines():
+    """Returns the lines of a small sheet with every section type."""
+    return [
+        'Name,Func,Port,PWM',
+        'Right,,,',
+        'D0,RX,PD0,',
+        'D1,TX,PD1,',
+        'Left,,,',
+        'D2,,PD2,',
+        'D3,INT1,PD3,PWM',
+        'Top,,,',
+        'A0,,PC0,',
+        'Text,,,',
+        'Logic levels are 5V,,,',
+        'Do not exceed 40mA per pin,,,',
+        'Right,,,',
+        'GND,,,',
+        'EOF,,,',
+    ]
+
+
+def png_bytes(width=2, height=2, color=b'\xff\x00\x00'):
+    """Returns a small RGB PNG image."""
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data)))
+    rows = b''.join(b'\x00' + color * width for _ in range(height))
+    return (tagscript.PNG_SIGNATURE
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0,
+                                         0, 0))
+            + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
+
+
+# Advance widths (in units of a 1000 units per em font) of the glyphs of
+# font_bytes() and the code points mapped to them.
+FONT_GLYPHS = [('.notdef', None, 500), ('space', 0x20, 250),
+               ('A', 0x41, 600), ('B', 0x42, 650), ('yi', 0x4E00, 1000),
+               ('grin', 0x1F600, 1000)]
+
+
+def font_bytes(cmap_formats=(4, 12), flavor=None):
+    """Returns a small TrueType font built with fontTools.
+
+    Args:
+        cmap_formats: (tuple Default=(4, 12)) Formats of the cmap
+            subtables kept (format 4 does not map U+1F600).
+        flavor: (str Default=None) 'woff' for a WOFF file.
+    """
+    from fontTools.fontBuilder import FontBuilder
+    from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+    builder = FontBuilder(1000, isTTF=True)
+    builder.setupGlyphOrder([name for name, _, _ in FONT_GLYPHS])
+    builder.setupCharacterMap({code: name for name, code, _ in FONT_GLYPHS
+                               if code is not None})
+    builder.setupGlyf({name: TTGlyphPen(None).glyph()
+                       for name, _, _ in FONT_GLYPHS})
+    builder.setupHorizontalMetrics({name: (width, 0)
+                                    for name, _, width in FONT_GLYPHS})
+    builder.setupHorizontalHeader(ascent=800, descent=-200)
+    builder.setupNameTable({'familyName': 'Test', 'styleName': 'Regular'})
+    builder.setupOS2()
+    builder.setupPost()
+    cmap = builder.font['cmap']
+    cmap.tables = [table for table in cmap.tables
+                   if table.format in cmap_formats]
+    builder.font.flavor = flavor
+    font_file = io.BytesIO()
+    builder.save(font_file)
+    return font_file.getvalue()
+
+
+@pytest.fixture
+def board(tmp_path, monkeypatch, csv_lines):
+    """Returns a CSV filename in a temporary directory, with an image.
+
+    The directory is the current one and holds 'board.csv' (with an
+    'Extras' section naming 'Images/logo.png'), the image and a copy of
+    'default.css'.
+    """
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('Images')
+    with open(os.path.join('Images', 'logo.png'), 'wb') as png_file:
+        png_file.write(png_bytes())
+    with open(os.path.join(REPO_DIR, 'default.css'), 'r') as css_file:
+        default_css = css_file.read()
+    with open('default.css', 'w') as css_file:
+        css_file.write(default_css)
+    with open('board.csv', 'w') as csv_file:
+        csv_file.write('\n'.join(csv_lines[:-1]
+                                 + ['Extras,,,', 'logo,,,', 'EOF,,,']))
+    return 'board.csv'
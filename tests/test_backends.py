@@ -0,0 +1,37 @@
+"""Tests of the streaming SVG backend against svgwrite."""
+
+import pytest
+
+import tagscript
+from tagscript import GDConfig
+
+
+def render(lines, backend, payload, **options):
+    cfg = GDConfig(backend=backend, pretty=False, font_cache=None, **options)
+    layout = tagscript.layout_csv_data(lines, cfg)
+    return tagscript.render_svg_bytes(layout, 'stdin', cfg, payload)
+
+
+def test_stream_matches_svgwrite_on_corpus(corpus, payload):
+    assert corpus
+    for csv_filename in corpus:
+        lines = list(tagscript.read_csv(csv_filename)[1])
+        assert (render(lines, 'stream', payload)
+                == render(lines, 'svgwrite', payload)), csv_filename
+
+
+@pytest.mark.parametrize('options', [
+    {'style_mode': 'class'},
+    {'tag_size': (45.5, 12), 'tag_margins': (3, 2.5)},
+    {'tag_symbols': True},
+])
+def test_stream_matches_svgwrite(csv_lines, payload, options):
+    assert (render(csv_lines, 'stream', payload, **options)
+            == render(csv_lines, 'svgwrite', payload, **options))
+
+
+def test_stream_escapes_like_svgwrite(csv_lines, payload):
+    lines = csv_lines[:-1] + ['Text,,,', '"<a & \'b\'> ""c""",,,', 'EOF,,,']
+    svg = render(lines, 'stream', payload)
+    assert svg == render(lines, 'svgwrite', payload)
+    assert b'&lt;a &amp;' in svg
@@ -0,0 +1,46 @@
+"""Tests of the CSV parsing (delimiters and the files a sheet uses)."""
+
+import io
+
+import tagscript
+
+SHEET = ['Name;Func', 'Right;', 'D0;RX', 'Extras;', 'logo;', 'EOF;']
+
+
+def write_sheet(tmp_path, lines, encoding='utf-8'):
+    csv_filename = str(tmp_path / 'board.csv')
+    with open(csv_filename, 'w', encoding=encoding, newline='') as csv_file:
+        csv_file.write('\r\n'.join(lines) + '\r\n')
+    return csv_filename
+
+
+def test_input_files_of_semicolon_sheet(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    csv_filename = write_sheet(tmp_path, SHEET)
+    records = list(tagscript.read_csv(csv_filename)[1])
+    assert records[-1] == ['logo', '']
+    inputs = tagscript.input_files(csv_filename, csv_filename[:-4])
+    assert (tagscript.image_filename('logo'), 'image') in inputs
+
+
+def test_input_files_of_tab_sheet(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    lines = [line.replace(';', '\t') for line in SHEET]
+    csv_filename = write_sheet(tmp_path, lines, 'utf-16')
+    inputs = tagscript.input_files(csv_filename, csv_filename[:-4])
+    assert (tagscript.image_filename('logo'), 'image') in inputs
+
+
+def test_csv_records_sniffs_every_source():
+    text = '\n'.join(SHEET) + '\n'
+    expected = [['Name', 'Func'], ['Right', ''], ['D0', 'RX'],
+                ['Extras', ''], ['logo', '']]
+    for source in (text, text.encode('utf-8'), io.StringIO(text),
+                   io.BytesIO(text.encode('utf-8'))):
+        assert list(tagscript.csv_records(source)) == expected, source
+
+
+def test_layout_of_semicolon_lines():
+    lines = ['Name;Func', 'Right;', 'D0;RX', 'EOF;']
+    layout = tagscript.layout_csv_data(lines)
+    assert [text for *_, text in layout] == ['Name', 'Func', 'D0', 'RX']
@@ -0,0 +1,58 @@
+"""Tests of the reproducible output (GDConfig.deterministic)."""
+
+import re
+import threading
+
+from svgwrite.utils import AutoID
+
+import tagscript
+from tagscript import GDConfig
+
+
+def render(csv_lines, cfg, payload):
+    return tagscript.render_svg_bytes(
+        tagscript.layout_csv_data(csv_lines, cfg), 'stdin', cfg, payload)
+
+
+def test_renders_are_identical(csv_lines, payload):
+    cfg = GDConfig(deterministic=True, font_cache=None)
+    assert render(csv_lines, cfg, payload) == render(csv_lines, cfg, payload)
+
+
+def test_ids_are_named(csv_lines, payload):
+    cfg = GDConfig(deterministic=True, font_cache=None, tag_symbols=True)
+    AutoID(1)
+    svg = render(csv_lines, cfg, payload)
+    assert re.findall(rb'id="([^"]*)"', svg)
+    assert not re.search(rb'id="id\d+"', svg)
+    # svgwrite's process-wide counter is never used.
+    assert AutoID.next_id() == 'id1'
+
+
+def test_concurrent_renders_are_identical(csv_lines, payload):
+    cfg = GDConfig(deterministic=True, font_cache=None, tag_symbols=True)
+    expected = render(csv_lines, cfg, payload)
+    results = []
+
+    def worker():
+        for _ in range(20):
+            results.append(render(csv_lines, cfg, payload))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [expected] * 80
+
+
+def test_existing_files_are_kept(csv_lines, payload, tmp_path):
+    cfg = GDConfig(deterministic=True, font_cache=None)
+    layout = tagscript.layout_csv_data(csv_lines, cfg)
+    root = str(tmp_path / 'board')
+    with open(root + '.svg', 'w') as svg_file:
+        svg_file.write('<svg/>')
+    filenames = tagscript.render_svgs(layout, 'stdin', root, cfg, payload)
+    assert filenames == [root + '_02.svg']
+    with open(root + '.svg', 'r') as svg_file:
+        assert svg_file.read() == '<svg/>'
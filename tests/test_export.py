@@ -0,0 +1,77 @@
+"""Tests of the PDF/PNG export (export_layout()) and its stylesheets."""
+
+import re
+
+import pytest
+
+import tagscript
+from tagscript import GDConfig, Layout, StyleResolver
+
+BOARD_CSS = '.tag1.tag_bkg { fill: #123456; }\n'
+
+
+def test_resolver_follows_the_cascade(payload):
+    styles = StyleResolver([payload.stylesheets['default.css'], BOARD_CSS])
+    attributes = {'fill': '#0072b2', 'stroke': '#0072b2'}
+
+    # default.css overrides the attributes, '<root>.css' overrides both.
+    assert styles.resolve('tag1 tag_bkg', attributes) == {
+        'fill': '#123456', 'stroke': '#ff3333'}
+    assert styles.resolve('text_line0 text', {})['font-weight'] == 'bold'
+    assert 'font-weight' not in styles.resolve('text_line1 text', {})
+    # Rules with more classes win over later rules with fewer.
+    styles = StyleResolver(['.a.b { fill: red; } .b { fill: blue; }'])
+    assert styles.resolve('a b', {})['fill'] == 'red'
+
+
+def test_parse_stylesheet_skips_other_selectors():
+    rules = tagscript.parse_stylesheet(
+        '/* .x { fill: red; } */ svg text { fill: red; }\n'
+        '.text, #id, .tag0.tag_txt { font-size: 9px; stroke: white; }')
+    assert rules == [
+        (frozenset(['text']), {'font-size': '9px', 'stroke': 'white'}),
+        (frozenset(['tag0', 'tag_txt']),
+         {'font-size': '9px', 'stroke': 'white'})]
+
+
+def test_export_applies_the_stylesheets(board, payload, monkeypatch):
+    cairo = pytest.importorskip('cairo')
+    with open('board.css', 'w') as css_file:
+        css_file.write(BOARD_CSS)
+    calls = []
+
+    class RecordingContext(cairo.Context):
+        def select_font_face(self, *args):
+            calls.append(('font',) + args)
+            super().select_font_face(*args)
+
+        def set_source_rgb(self, *args):
+            calls.append(('rgb',) + args)
+            super().set_source_rgb(*args)
+
+        def show_text(self, text):
+            calls.append(('text', text))
+            super().show_text(text)
+
+    monkeypatch.setattr(cairo, 'Context', RecordingContext)
+    cfg = GDConfig(font_cache=None, exports=['pdf'])
+    with open(board, 'r') as csv_file:
+        layout = tagscript.layout_csv_data(csv_file.read().splitlines(), cfg)
+    filenames = tagscript.render_svgs(layout, 'board', 'board', cfg, payload)
+    assert filenames == ['board.svg', 'board.pdf']
+
+    with open('board.pdf', 'rb') as pdf_file:
+        media_box = re.search(rb'/MediaBox \[\s*0 0 ([\d.]+) ([\d.]+)',
+                              pdf_file.read())
+    assert [float(size) for size in media_box.groups()] == pytest.approx(
+        [layout.width * 72 / 96, layout.height * 72 / 96], abs=1)
+    texts = [call[1] for call in calls if call[0] == 'text']
+    assert len(texts) == sum(1 for element in layout
+                             if element[0] != Layout.IMAGE)
+    assert (0x12 / 255, 0x34 / 255, 0x56 / 255) in [
+        call[1:] for call in calls if call[0] == 'rgb']
+    # Text in the first field is bold ('.text_line0' of default.css).
+    fonts = [call for call in calls if call[0] == 'font']
+    assert fonts[texts.index('Logic levels are 5V')][3] == (
+        cairo.FONT_WEIGHT_BOLD)
+    assert fonts[texts.index('D0')][3] == cairo.FONT_WEIGHT_NORMAL
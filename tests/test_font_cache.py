@@ -0,0 +1,83 @@
+"""Tests of the on-disk font cache (FontCache) and --seed-font."""
+
+import os
+
+import pytest
+
+import tagscript
+from tagscript import FontCache, GDConfig
+
+URI = 'https://fonts.googleapis.com/css?family=Test'
+DAY = 24 * 60 * 60
+
+
+class Clock(object):
+    """Stand-in for time.time() that only moves when told to."""
+
+    def __init__(self, now=1000000000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def test_ttl_expiry(tmp_path, clock):
+    cache = FontCache(str(tmp_path), ttl=DAY, clock=clock)
+    cache.put('Test', URI, b'FONT', 'font/ttf')
+    clock.now += DAY - 1
+    assert cache.get('Test', URI) == (b'FONT', 'font/ttf')
+    clock.now += 2
+    assert cache.get('Test', URI) is None
+    # An expired font is still used when the network is unavailable...
+    assert cache.get('Test', URI, ignore_ttl=True) == (b'FONT', 'font/ttf')
+    # ... until the next eviction removes it.
+    cache.evict()
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_lru_eviction(tmp_path, clock):
+    cache = FontCache(str(tmp_path), max_bytes=10, clock=clock)
+    for name in ('A', 'B'):
+        cache.put(name, URI, b'12345', 'font/ttf')
+        clock.now += 1
+    # Reading 'A' makes 'B' the least recently used font.
+    assert cache.get('A', URI) is not None
+    clock.now += 1
+    cache.put('C', URI, b'12345', 'font/ttf')
+    assert [cache.get(name, URI) is not None
+            for name in ('A', 'B', 'C')] == [True, False, True]
+
+
+def test_pinned_fonts_are_kept(tmp_path, clock):
+    font_filename = str(tmp_path / 'test.ttf')
+    with open(font_filename, 'wb') as font_file:
+        font_file.write(b'PINNED')
+    cache = FontCache(str(tmp_path / 'cache'), ttl=DAY, max_bytes=10,
+                      clock=clock)
+    cache.seed('Test', font_filename)
+    clock.now += 2 * DAY
+    cache.put('Other', URI, b'1234567890', 'font/ttf')
+    assert cache.get('Test', tagscript.google_font_uri('Test')) == (
+        b'PINNED', 'application/x-font-ttf')
+    assert cache.get('Other', URI) is None
+
+
+def test_seed_font_option(tmp_path, monkeypatch):
+    font_filename = str(tmp_path / 'test.woff')
+    with open(font_filename, 'wb') as font_file:
+        font_file.write(b'SEEDED')
+    cache_dir = str(tmp_path / 'cache')
+    monkeypatch.setattr(tagscript, 'argv', [
+        'tagscript.py', '--seed-font', 'Test Font=' + font_filename])
+    tagscript.create_gd(GDConfig(font_cache=cache_dir))
+
+    cache = FontCache(cache_dir, ttl=-1)
+    data, mimetype = tagscript.fetch_google_font('Test Font', cache,
+                                                 offline=True)
+    assert data == b'SEEDED'
+    assert 'woff' in mimetype
@@ -0,0 +1,59 @@
+"""Tests of the font file parser (FontMetrics) used by 'autofit_tags'."""
+
+import io
+
+import pytest
+
+import tagscript
+from conftest import FONT_GLYPHS, font_bytes
+
+TEXT = ' AB一\U0001f600Z'
+
+pytest.importorskip('fontTools')
+
+
+def fonttools_advance(data, char):
+    """Returns the advance width of 'char' in ems read by fontTools."""
+    from fontTools.ttLib import TTFont
+
+    font = TTFont(io.BytesIO(data))
+    glyph = font.getBestCmap().get(ord(char), '.notdef')
+    return font['hmtx'][glyph][0] / font['head'].unitsPerEm
+
+
+@pytest.mark.parametrize('cmap_formats', [(4, 12), (12,)])
+@pytest.mark.parametrize('flavor', [None, 'woff'])
+def test_advances_match_fonttools(cmap_formats, flavor):
+    data = font_bytes(cmap_formats, flavor)
+    metrics = tagscript.FontMetrics(data)
+    assert metrics.units_per_em == 1000
+    # Trailing glyphs of equal width share the last 'hmtx' entry.
+    assert len(metrics.advances) < len(FONT_GLYPHS)
+    for char in TEXT:
+        assert metrics.advance(char) == fonttools_advance(data, char)
+
+
+def test_format_4_cmap():
+    metrics = tagscript.FontMetrics(font_bytes((4,)))
+    assert [metrics.advance(char) for char in ' AB一'] == [
+        0.25, 0.6, 0.65, 1.0]
+    # Format 4 only maps the BMP.
+    assert metrics.advance('\U0001f600') == 0.5
+
+
+def test_missing_glyph_uses_notdef():
+    metrics = tagscript.FontMetrics(font_bytes())
+    assert metrics.advance('Z') == 0.5
+    assert metrics.advance('é') == 0.5
+
+
+@pytest.mark.parametrize('data', [
+    b'',
+    b'not a font',
+    font_bytes()[:40],
+    font_bytes(flavor='woff')[:100],
+    font_bytes(cmap_formats=()),
+])
+def test_malformed_font(data):
+    with pytest.raises(ValueError):
+        tagscript.FontMetrics(data)
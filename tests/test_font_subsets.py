@@ -0,0 +1,45 @@
+"""Tests of the embedded font subsets (GDConfig 'subset_fonts')."""
+
+import base64
+import io
+import re
+
+import pytest
+
+import tagscript
+from conftest import font_bytes
+from tagscript import GDConfig
+
+pytest.importorskip('fontTools')
+
+LINES = ['Name,Func', 'Right,,', 'AB,A B', 'A,一', 'EOF,,']
+
+
+def cmap(data):
+    """Returns the code points mapped by a font."""
+    from fontTools.ttLib import TTFont
+
+    return set(TTFont(io.BytesIO(data)).getBestCmap())
+
+
+def embedded_cmap(svg):
+    """Returns the code points mapped by the font embedded in an SVG."""
+    return cmap(base64.b64decode(
+        re.search(rb'base64,([^")]+)', svg).group(1)))
+
+
+def test_subset_maps_the_layout_chars(payload):
+    cfg = GDConfig(backend='stream', font='Test', font_cache=None,
+                   subset_fonts=True)
+    data = font_bytes()
+    payload.fonts.append(('Test', data, 'font/ttf'))
+    layout = tagscript.layout_csv_data(LINES, cfg)
+    svg = tagscript.render_svg_bytes(layout, 'stdin', cfg, payload)
+
+    assert embedded_cmap(svg) == {ord(char) for char in layout.chars()
+                                  if ord(char) in cmap(data)}
+    assert embedded_cmap(svg) == {ord(char) for char in ' AB一'}
+    # Sheets using the same characters share the subset.
+    assert len(payload.subsets.subsets) == 1
+    tagscript.render_svg_bytes(layout, 'stdin', cfg, payload)
+    assert len(payload.subsets.subsets) == 1
@@ -0,0 +1,92 @@
+"""Tests of the Google font download timeout and fallbacks.
+
+A local stand-in of the Google fonts server answers the font CSS at
+once and serves the font files of 'Slow' fonts after SLOW_SECONDS.
+"""
+
+import logging
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.error import URLError
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import tagscript
+from tagscript import GDConfig
+
+SLOW_SECONDS = 3
+TIMEOUT = 0.3
+
+
+class _FontHandler(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/css':
+            family = parse_qs(url.query)['family'][0].replace(' ', '_')
+            body = ('@font-face {{ src: url(http://{}:{}/font/{}.ttf) }}'
+                    .format(*self.server.server_address, family)
+                    .encode('utf-8'))
+        else:
+            if 'Slow' in url.path:
+                time.sleep(SLOW_SECONDS)
+            body = b'FONT' + url.path.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def font_server(monkeypatch):
+    """Points google_font_uri() at a local stand-in font server."""
+    httpd = tagscript._ThreadingHTTPServer(('127.0.0.1', 0), _FontHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(
+        tagscript, 'google_font_uri',
+        lambda name: 'http://{}:{}/css?family={}'.format(
+            *httpd.server_address, name.replace(' ', '+')))
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_google_font(font_server):
+    data, _ = tagscript.fetch_google_font('Fast Font', timeout=TIMEOUT)
+    assert data == b'FONT/font/Fast_Font.ttf'
+
+
+def test_fetch_google_font_timeout(font_server):
+    start = time.monotonic()
+    with pytest.raises((URLError, socket.timeout)):
+        tagscript.fetch_google_font('Slow Font', timeout=TIMEOUT)
+    assert time.monotonic() - start < SLOW_SECONDS
+
+
+def test_fetch_google_font_uses_expired_copy(font_server, tmp_path):
+    tagscript.FontCache(str(tmp_path)).put(
+        'Slow Font', tagscript.google_font_uri('Slow Font'), b'CACHED',
+        'font/ttf')
+    expired = tagscript.FontCache(str(tmp_path), ttl=-1)
+    data, _ = tagscript.fetch_google_font('Slow Font', expired,
+                                          timeout=TIMEOUT)
+    assert data == b'CACHED'
+
+
+def test_style_fetch_deadline(font_server, caplog):
+    cfg = GDConfig(font='Fast Font', google_font='Slow Font',
+                   font_cache=None, font_timeout=TIMEOUT)
+    cfg.default_google_fonts = {'Fast Font'}
+    start = time.monotonic()
+    with caplog.at_level(logging.WARNING):
+        payload = tagscript.StyleFetch(cfg).result()
+    assert time.monotonic() - start < SLOW_SECONDS
+    assert [font[0] for font in payload.fonts] == ['Fast Font']
+    assert 'unable to embed "Slow Font"' in caplog.text
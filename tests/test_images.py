@@ -0,0 +1,63 @@
+"""Tests of the embedded 'Extras' images (ImageCache)."""
+
+import base64
+import builtins
+import logging
+import shutil
+
+import pytest
+
+import tagscript
+from conftest import png_bytes
+from tagscript import GDConfig
+
+
+def render(board, cfg, payload):
+    with open(board, 'r') as csv_file:
+        layout = tagscript.layout_csv_data(csv_file.read().splitlines(), cfg)
+    return tagscript.render_svg_bytes(layout, 'board', cfg,
+                                      payload).decode('utf-8')
+
+
+def test_embed_png(board, payload):
+    cfg = GDConfig(backend='stream', font_cache=None, embed_images=True)
+    uri = 'data:image/png;base64,' + base64.b64encode(
+        png_bytes()).decode('ascii')
+    svg = render(board, cfg, payload)
+    assert uri in svg
+    assert 'Images/logo.png' not in svg
+
+
+def test_cache_reuses_the_encoded_image(board, monkeypatch):
+    opened = []
+
+    def counting_open(filename, *args, **kwargs):
+        opened.append(filename)
+        return builtins.open(filename, *args, **kwargs)
+
+    monkeypatch.setattr(tagscript, 'open', counting_open, raising=False)
+    shutil.copy('Images/logo.png', 'Images/copy.png')
+    cache = tagscript.ImageCache()
+    uri = cache.data_uri('Images/logo.png')
+    assert opened == ['Images/logo.png']
+    assert cache.data_uri('Images/logo.png') == uri
+    assert opened == ['Images/logo.png']
+    # An identical file is hashed but shares the encoded image.
+    assert cache.data_uri('Images/copy.png') == uri
+    assert len(cache.uris) == 1
+
+
+def test_downscale_skipped_without_pillow(board, payload, monkeypatch,
+                                          caplog):
+    monkeypatch.setattr(tagscript, 'Image', None)
+    monkeypatch.setattr(tagscript, '_LOGGED_WARNINGS', set())
+    with pytest.raises(ImportError):
+        tagscript.downscale_png(png_bytes(), (1, 1))
+
+    cfg = GDConfig(backend='stream', font_cache=None, embed_images=True,
+                   downscale_images=True, image_size=[1, 1])
+    with caplog.at_level(logging.WARNING):
+        svg = render(board, cfg, payload)
+        render(board, cfg, payload)
+    assert base64.b64encode(png_bytes()).decode('ascii') in svg
+    assert caplog.text.count('without downscaling') == 1
@@ -0,0 +1,79 @@
+"""Tests of the incremental builds (BuildManifest)."""
+
+import os
+
+import pytest
+
+import tagscript
+from tagscript import GDConfig
+
+
+@pytest.fixture
+def cfg():
+    """Returns an offline configuration building incrementally."""
+    return GDConfig(font='Arial', font_cache=None, incremental=True,
+                    manifest='manifest.json')
+
+
+def build(cfg):
+    """Build the current directory and returns the rendered SVGs."""
+    results = tagscript.batch_create_gd('.', cfg, workers=1)
+    assert all(result[3] is None for result in results)
+    return [os.path.normpath(filename) for result in results
+            for filename in result[1]]
+
+
+def test_second_run_is_skipped(board, cfg):
+    assert build(cfg) == ['board.svg']
+    assert build(cfg) == []
+
+
+@pytest.mark.parametrize('changed', ['board.csv', 'Images/logo.png',
+                                     'board.css', 'default.css'])
+def test_input_change_renders_again(board, cfg, changed):
+    build(cfg)
+    with open(changed, 'ab') as changed_file:
+        changed_file.write(b'\n')
+    assert build(cfg) == ['board.svg']
+    assert build(cfg) == []
+
+
+def test_config_change_renders_again(board, cfg):
+    build(cfg)
+    cfg.font_size = cfg.font_size + 1
+    assert build(cfg) == ['board.svg']
+    # Build-neutral options do not invalidate the outputs.
+    cfg.font_cache_ttl = 10
+    assert build(cfg) == []
+
+
+def test_deleted_output_renders_again(board, cfg):
+    build(cfg)
+    os.remove('board.svg')
+    assert build(cfg) == ['board.svg']
+
+
+@pytest.mark.parametrize('content', [None, 'not json', '[1, 2]'])
+def test_missing_or_corrupt_manifest(board, cfg, content):
+    build(cfg)
+    if content is None:
+        os.remove('manifest.json')
+    else:
+        with open('manifest.json', 'w') as manifest_file:
+            manifest_file.write(content)
+    # The SVG is no longer known to be ours, so it is kept.
+    assert build(cfg) == ['board_02.svg']
+    assert build(cfg) == []
+
+
+def test_files_not_written_by_a_build_are_kept(board, cfg):
+    with open('board.svg', 'w') as svg_file:
+        svg_file.write('<svg>edited by hand</svg>')
+    assert build(cfg) == ['board_02.svg']
+    assert build(cfg) == []
+    with open('board.csv', 'a') as csv_file:
+        csv_file.write('\n')
+    # Our own output is replaced in place, the edited file is kept.
+    assert build(cfg) == ['board_02.svg']
+    with open('board.svg', 'r') as svg_file:
+        assert svg_file.read() == '<svg>edited by hand</svg>'
@@ -0,0 +1,42 @@
+"""Tests of the NumPy-vectorized layout against the scalar layout."""
+
+import pytest
+
+import tagscript
+from tagscript import GDConfig
+
+pytest.importorskip('numpy')
+
+
+def layouts(lines, **options):
+    """Returns the scalar and the vectorized Layout of CSV lines."""
+    return [tagscript.layout_csv_data(
+        lines, GDConfig(font_cache=None, vectorized_layout=vectorized,
+                        **options))
+            for vectorized in (False, True)]
+
+
+def summary(layout):
+    return (list(layout), [type(y) for y in layout.ys], layout.sections,
+            layout.width, layout.height, layout.xs.typecode)
+
+
+def test_vectorized_matches_scalar_on_corpus(corpus):
+    for csv_filename in corpus:
+        lines = list(tagscript.read_csv(csv_filename)[1])
+        scalar, vectorized = layouts(lines)
+        assert summary(vectorized) == summary(scalar), csv_filename
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'tag_size': (45.5, 12)},
+    {'tag_margins': (3, 2.5)},
+])
+def test_vectorized_matches_scalar_across_blocks(csv_lines, monkeypatch,
+                                                 options):
+    # Small blocks so the rows of a section span several blocks.
+    monkeypatch.setattr(tagscript, 'VECTOR_BLOCK_ROWS', 2)
+    lines = [csv_lines[0]] + csv_lines[1:-1] * 5 + ['EOF,,,']
+    scalar, vectorized = layouts(lines, **options)
+    assert summary(vectorized) == summary(scalar)
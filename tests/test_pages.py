@@ -0,0 +1,73 @@
+"""Tests of the pagination (paginate_layout()) and the page workers."""
+
+import pytest
+
+import tagscript
+from tagscript import GDConfig, Layout, Theme
+
+PAGE_HEIGHT = 300
+
+
+@pytest.fixture
+def layout(csv_lines):
+    """Returns the Layout of the sample sheet repeated 20 times."""
+    body = csv_lines[1:-1] * 20
+    return tagscript.layout_csv_data([csv_lines[0]] + body + ['EOF,,,'],
+                                     GDConfig())
+
+
+def texts(layout):
+    return [layout.strings[i] for i in layout.text_ids]
+
+
+def test_pages_hold_every_element_in_order(layout):
+    pages = tagscript.paginate_layout(layout, PAGE_HEIGHT)
+    assert len(pages) > 1
+    assert sum(len(page) for page in pages) == len(layout)
+    assert sum((texts(page) for page in pages), []) == texts(layout)
+
+
+def test_elements_fit_on_their_page(layout):
+    for page in tagscript.paginate_layout(layout, PAGE_HEIGHT):
+        assert page.height == PAGE_HEIGHT
+        for kind, _, _, y, _, height, _ in page:
+            if kind == Layout.TEXT:
+                assert y - height >= 0
+            else:
+                assert 0 <= y and y + height <= PAGE_HEIGHT
+
+
+def test_rows_are_not_cut(layout):
+    pages = tagscript.paginate_layout(layout, PAGE_HEIGHT)
+    end = 0
+    for page in pages[:-1]:
+        end += len(page)
+        assert layout.ys[end - 1] != layout.ys[end]
+
+
+def test_page_pool_matches_serial_render(layout, payload):
+    cfg = GDConfig(font_cache=None)
+    pages = tagscript.paginate_layout(layout, PAGE_HEIGHT, cfg)
+    with tagscript.PagePool(payload, 2) as pool:
+        rendered = list(pool.map(pages, 'stdin', cfg))
+    assert rendered == [tagscript.render_svg_bytes(page, 'stdin', cfg,
+                                                   payload)
+                        for page in pages]
+
+
+def test_one_pool_per_run(layout, payload, monkeypatch, tmp_path):
+    started = []
+
+    class CountingPool(tagscript.PagePool):
+        def __init__(self, *args, **kwargs):
+            started.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(tagscript, 'PagePool', CountingPool)
+    cfg = GDConfig(font_cache=None, page_height=PAGE_HEIGHT, page_workers=2,
+                   themes=[Theme('a'), Theme('b')], overwrite=True)
+    filenames = tagscript.render_svgs(layout, 'stdin', str(tmp_path / 's'),
+                                      cfg, payload)
+    assert len(started) == 1
+    pages = len(tagscript.paginate_layout(layout, PAGE_HEIGHT, cfg))
+    assert len(filenames) == 2 * pages
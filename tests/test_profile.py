@@ -0,0 +1,15 @@
+"""Tests of the --profile report."""
+
+import io
+import json
+
+import tagscript
+
+
+def test_report_goes_to_stderr(capsys, monkeypatch):
+    monkeypatch.setattr(tagscript, 'stderr', io.StringIO())
+    profiler = tagscript.Profiler()
+    profiler.count('bytes_written', 10)
+    tagscript.print_profile(profiler, 'json')
+    assert capsys.readouterr().out == ''
+    assert json.loads(tagscript.stderr.getvalue()) == profiler.report()
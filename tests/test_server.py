@@ -0,0 +1,93 @@
+"""Tests of the render server (RenderService and serve())."""
+
+import http.client
+import threading
+
+import pytest
+
+import tagscript
+
+
+@pytest.fixture
+def server(monkeypatch, payload):
+    """Returns the port of a render server running in a thread."""
+    monkeypatch.setattr(tagscript, 'fetch_style', lambda cfg: payload)
+    httpd = tagscript._ThreadingHTTPServer(('127.0.0.1', 0),
+                                           tagscript._RenderHandler)
+    httpd.service = tagscript.RenderService(tagscript.GDConfig(), workers=1)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def post(port, query, body, headers=None):
+    """POST 'body' to /render and returns (status, response body)."""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request('POST', '/render?' + query, body, headers or {})
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize('value', ['nan', 'inf', '-inf', '1e400'])
+def test_parse_number_rejects_non_finite(value):
+    with pytest.raises(ValueError):
+        tagscript._parse_number(value)
+
+
+def test_render(server, csv_lines):
+    status, body = post(server, 'name=test',
+                        '\n'.join(csv_lines).encode('utf-8'))
+    assert status == 200
+    assert body.startswith(b'<?xml')
+
+
+@pytest.mark.parametrize('query', ['tag_size=nan,5', 'tag_size=1e308,5',
+                                   'font_size=inf', 'backend=cairo'])
+def test_invalid_options(server, csv_lines, query):
+    status, _ = post(server, query, '\n'.join(csv_lines).encode('utf-8'))
+    assert status == 400
+
+
+def test_body_too_large(server):
+    status, _ = post(server, 'name=test', b'',
+                     {'Content-Length': str(tagscript.SERVE_MAX_BYTES + 1)})
+    assert status == 413
+
+
+def test_unexpected_error(server, monkeypatch, csv_lines):
+    def fail(*args):
+        raise KeyError('boom')
+    monkeypatch.setattr(tagscript, 'render_csv_bytes', fail)
+    status, body = post(server, 'name=test',
+                        '\n'.join(csv_lines).encode('utf-8'))
+    assert status == 500
+    assert b'boom' not in body
+
+
+def test_worker_processes(monkeypatch, payload, csv_lines):
+    monkeypatch.setattr(tagscript, 'fetch_style', lambda cfg: payload)
+    data = '\n'.join(csv_lines).encode('utf-8')
+    options = {'backend': 'stream', 'style_mode': 'class'}
+    expected = tagscript.RenderService(tagscript.GDConfig(),
+                                       workers=1).render(data, options)
+    with tagscript.RenderService(tagscript.GDConfig(), workers=2) as service:
+        assert service.render(data, options) == expected
+        with pytest.raises(ValueError):
+            service.render(b'')
+
+
+def test_stylesheet_cache_is_bounded(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(tagscript.StylePayload, 'max_stylesheets', 2)
+    payload = tagscript.StylePayload(stylesheets={'default.css': 'a {}'})
+    for name in ('a', 'b', 'a', 'c', 'd'):
+        payload.read_stylesheet(name + '.css')
+    assert sorted(payload.stylesheets) == ['c.css', 'd.css', 'default.css']
+    payload.read_stylesheet('default.css')
+    payload.read_stylesheet('e.css')
+    assert payload.stylesheets['default.css'] == 'a {}'
@@ -0,0 +1,83 @@
+"""Tests of the output sinks (FileSink, ArchiveSink) and .svgz output."""
+
+import gzip
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+import tagscript
+from tagscript import GDConfig
+
+
+def test_unique_names(tmp_path):
+    filename = str(tmp_path / 'board.svg')
+    sink = tagscript.FileSink()
+    saved = [sink.save(filename, tagscript.bytes_writer(b'<svg/>'),
+                       unique=True)[0] for _ in range(3)]
+    assert saved == [filename, str(tmp_path / 'board_02.svg'),
+                     str(tmp_path / 'board_03.svg')]
+    # A name claimed by another writer is skipped.
+    open(str(tmp_path / 'board_04.svg'), 'w').close()
+    assert sink.save(filename, tagscript.bytes_writer(b''),
+                     unique=True)[0] == str(tmp_path / 'board_05.svg')
+
+
+def test_indexes_only_last_one_render(csv_lines, payload, tmp_path):
+    cfg = GDConfig(font_cache=None)
+    layout = tagscript.layout_csv_data(csv_lines, cfg)
+    root = str(tmp_path / 'board')
+    for _ in range(3):
+        tagscript.render_svgs(layout, 'stdin', root, cfg, payload)
+    os.remove(root + '_02.svg')
+    # A new render takes the free '_02' name again.
+    assert tagscript.render_svgs(layout, 'stdin', root, cfg,
+                                 payload) == [root + '_02.svg']
+
+
+def test_partial_write_leaves_no_file(tmp_path):
+    def write(out_file):
+        out_file.write(b'<svg>')
+        raise OSError('disk full')
+
+    filename = str(tmp_path / 'board.svg')
+    with pytest.raises(OSError):
+        tagscript.FileSink().save(filename, write)
+    assert os.listdir(str(tmp_path)) == []
+
+    with open(filename, 'wb') as svg_file:
+        svg_file.write(b'<svg/>')
+    with pytest.raises(OSError):
+        tagscript.FileSink().save(filename, write)
+    assert os.listdir(str(tmp_path)) == ['board.svg']
+    with open(filename, 'rb') as svg_file:
+        assert svg_file.read() == b'<svg/>'
+
+
+@pytest.mark.parametrize('archive', ['run.zip', 'run.tar.gz'])
+def test_archive_member_names(tmp_path, archive):
+    filename = str(tmp_path / archive)
+    with tagscript.ArchiveSink(filename, mtime=0) as sink:
+        for name in ('Datasheets/board.svg', 'Datasheets/board.svg',
+                     '/abs/board.svg', 'Datasheets/./other.svg'):
+            sink.save(name, tagscript.bytes_writer(b'<svg/>'), unique=True)
+    if archive.endswith('.zip'):
+        with zipfile.ZipFile(filename) as zip_file:
+            names = zip_file.namelist()
+    else:
+        with tarfile.open(filename) as tar_file:
+            names = tar_file.getnames()
+    assert names == ['Datasheets/board.svg', 'Datasheets/board_02.svg',
+                     'abs/board.svg', 'Datasheets/other.svg']
+
+
+def test_svgz_output(csv_lines, payload, tmp_path):
+    cfg = GDConfig(font_cache=None, svgz=True, svgz_level=1)
+    layout = tagscript.layout_csv_data(csv_lines, cfg)
+    root = str(tmp_path / 'board')
+    assert tagscript.render_svgs(layout, 'stdin', root, cfg,
+                                 payload) == [root + '.svgz']
+    with gzip.open(root + '.svgz', 'rb') as svgz_file:
+        assert svgz_file.read() == tagscript.render_svg_bytes(
+            layout, 'stdin', cfg, payload)
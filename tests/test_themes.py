@@ -0,0 +1,94 @@
+"""Tests of the tag color themes and the class styling mode."""
+
+import re
+
+import tagscript
+from tagscript import GDConfig, Theme
+
+STYLE_RE = re.compile(r'<style[^>]*>(.*?)</style>', re.DOTALL)
+COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+
+
+def cascaded(svg, selector, prop):
+    """Returns the last value of 'prop' set by a 'selector' rule.
+
+    The <style> elements are read in document order, so the value is the
+    one applied by the CSS cascade to rules of equal specificity.
+    """
+    value = None
+    for style in STYLE_RE.findall(svg):
+        style = COMMENT_RE.sub('', style.replace('<![CDATA[', ''))
+        for rule in re.finditer(r'([^{}]+)\{([^}]*)\}', style):
+            selectors = [part.strip() for part in rule.group(1).split(',')]
+            if selector not in selectors:
+                continue
+            for declaration in rule.group(2).split(';'):
+                name, _, setting = declaration.partition(':')
+                if name.strip() == prop:
+                    value = setting.strip()
+    return value
+
+
+def render(csv_lines, cfg, payload, theme=None):
+    layout = tagscript.layout_csv_data(csv_lines, cfg)
+    return tagscript.render_svg_bytes(layout, 'stdin', cfg, payload,
+                                      theme).decode('utf-8')
+
+
+def test_theme_colors_override_default_css(csv_lines, payload):
+    cfg = GDConfig(backend='stream', font_cache=None)
+    default_svg = render(csv_lines, cfg, payload)
+    theme = Theme('colorblind', tag_colors=[None, '#d55e00'])
+    theme_svg = render(csv_lines, cfg, payload, theme)
+
+    assert cascaded(default_svg, '.tag1.tag_bkg', 'fill') == '#ff3333'
+    assert cascaded(theme_svg, '.tag1.tag_bkg', 'fill') == '#d55e00'
+    assert cascaded(theme_svg, '.tag1.tag_bkg', 'stroke') == '#d55e00'
+
+
+def test_theme_without_colors_keeps_default_css(csv_lines, payload):
+    cfg = GDConfig(backend='stream', font_cache=None)
+    svg = render(csv_lines, cfg, payload, Theme('print'))
+    assert cascaded(svg, '.tag1.tag_bkg', 'fill') == '#ff3333'
+
+
+def test_class_mode_colors_come_before_default_css(csv_lines, payload):
+    cfg = GDConfig(backend='stream', font_cache=None, style_mode='class',
+                   tag_colors=[None, ['#0072b2', '#000000', 'white']])
+    svg = render(csv_lines, cfg, payload)
+
+    # Like the inline attributes, the colors give way to 'default.css'.
+    assert cascaded(svg, '.tag1.tag_bkg', 'fill') == '#ff3333'
+    assert cascaded(svg, '.tag1.tag_txt', 'fill') == 'white'
+    assert cascaded(svg, '.text', 'font-family').startswith('Roboto')
+
+
+def test_style_modes_resolve_the_same_fill(csv_lines, payload, tmp_path):
+    root = str(tmp_path / 'board')
+    with open(root + '.css', 'w') as css_file:
+        css_file.write('.tag1.tag_bkg { fill: #123456; }\n')
+    fills = []
+    for style_mode in ('inline', 'class'):
+        cfg = GDConfig(backend='stream', font_cache=None,
+                       style_mode=style_mode)
+        layout = tagscript.layout_csv_data(csv_lines, cfg)
+        svg = tagscript.render_svg_bytes(layout, root, cfg,
+                                         payload).decode('utf-8')
+        # Any rule overrides the fill attribute of the inline mode.
+        attribute = re.search(r'class="tag1 tag_bkg"[^>]*fill="([^"]*)"|'
+                              r'fill="([^"]*)"[^>]*class="tag1 tag_bkg"', svg)
+        fill = cascaded(svg, '.tag1.tag_bkg', 'fill')
+        if fill is None and attribute:
+            fill = attribute.group(1) or attribute.group(2)
+        fills.append(fill)
+    assert fills == ['#123456', '#123456']
+
+
+def test_linked_class_mode_only_embeds_custom_colors(csv_lines, payload):
+    cfg = GDConfig(backend='stream', font_cache=None, style_mode='class',
+                   link_stylesheet=True,
+                   tag_colors=[None, ['#0072b2', '#000000', 'white']])
+    svg = render(csv_lines, cfg, payload)
+
+    assert cascaded(svg, '.tag1.tag_bkg', 'fill') == '#0072b2'
+    assert cascaded(svg, '.tag0.tag_bkg', 'fill') is None
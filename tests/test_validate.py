@@ -0,0 +1,12 @@
+"""Tests of the CSV checks (validate_lines())."""
+
+import tagscript
+
+
+def test_missing_extras_image_is_a_warning(csv_lines):
+    lines = csv_lines[:-1] + ['Extras,,,', 'NoSuchImage,,,', 'EOF,,,']
+    diagnostics = [diagnostic for diagnostic
+                   in tagscript.validate_lines(lines, 'test.csv')
+                   if 'NoSuchImage' in diagnostic.message]
+    assert len(diagnostics) == 1
+    assert diagnostics[0].severity == tagscript.Diagnostic.WARNING